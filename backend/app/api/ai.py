@@ -1,6 +1,9 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.services.ollama_service import OllamaService
+from typing import AsyncIterator, Dict, Optional
+from app.services.ollama_service import ConversationNotFoundError, OllamaService
 
 router = APIRouter()
 ollama_service = OllamaService()
@@ -14,13 +17,20 @@ class PositionExplanationRequest(BaseModel):
     fen: str
     opening_system: str
 
+class ConversationRequest(BaseModel):
+    opening_system: str = "general"
+    fen: Optional[str] = None
+
+class FollowUpRequest(BaseModel):
+    question: str
+
 @router.post("/ask")
 async def ask_question(request: QuestionRequest):
     """Ask the AI assistant a question about chess openings"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
     try:
-        if not ollama_service.is_available():
-            raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
-        
         response = await ollama_service.answer_opening_question(
             request.question, 
             request.opening_system
@@ -33,10 +43,10 @@ async def ask_question(request: QuestionRequest):
 @router.post("/explain-position")
 async def explain_position(request: PositionExplanationRequest):
     """Get an AI explanation of a chess position"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
     try:
-        if not ollama_service.is_available():
-            raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
-        
         explanation = await ollama_service.explain_position(
             request.fen,
             request.opening_system
@@ -46,8 +56,88 @@ async def explain_position(request: PositionExplanationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _event_stream(updates: AsyncIterator[Dict]) -> StreamingResponse:
+    # Starlette cancels this generator when the client disconnects, which
+    # closes the Ollama stream and stops generation
+    async def events():
+        try:
+            async for update in updates:
+                event = "done" if update.get("done") else "token"
+                yield f"event: {event}\ndata: {json.dumps(update)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            await updates.aclose()
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """Server-Sent Events variant of /ask that forwards tokens as they are generated"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
+    return _event_stream(ollama_service.stream_opening_answer(request.question, request.opening_system))
+
+@router.post("/explain-position/stream")
+async def explain_position_stream(request: PositionExplanationRequest):
+    """Server-Sent Events variant of /explain-position"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
+    return _event_stream(ollama_service.stream_position_explanation(request.fen, request.opening_system))
+
+@router.post("/conversations")
+async def start_conversation(request: ConversationRequest):
+    """Start a conversation about a system or position; follow-ups reuse Ollama's context"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
+    conversation = ollama_service.start_conversation(request.opening_system, request.fen)
+    return {"conversation_id": conversation.id}
+
+@router.post("/conversations/{conversation_id}/ask")
+async def ask_in_conversation(conversation_id: str, request: FollowUpRequest):
+    """Ask the next question of a conversation"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
+    try:
+        return await ollama_service.ask_in_conversation(conversation_id, request.question)
+    except ConversationNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/conversations/{conversation_id}/ask/stream")
+async def ask_in_conversation_stream(conversation_id: str, request: FollowUpRequest):
+    """Server-Sent Events variant of /conversations/{id}/ask"""
+    if not ollama_service.is_available():
+        raise HTTPException(status_code=503, detail="AI assistant is currently unavailable")
+    
+    try:
+        # Checked here: once streaming has started the status code is already sent
+        ollama_service.get_conversation(conversation_id)
+    except ConversationNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _event_stream(ollama_service.stream_in_conversation(conversation_id, request.question))
+
+@router.delete("/conversations/{conversation_id}")
+async def end_conversation(conversation_id: str):
+    try:
+        ollama_service.end_conversation(conversation_id)
+        return {"deleted": True}
+    except ConversationNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.get("/status")
 async def ai_status():
     """Check if the AI assistant is available"""
     available = ollama_service.is_available()
-    return {"available": available}
\ No newline at end of file
+    return {
+        "available": available,
+        "cache": ollama_service.response_cache.stats(),
+        "single_flight": ollama_service.inflight.stats(),
+        "conversations": ollama_service.conversations.stats()
+    }
\ No newline at end of file
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+import math
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import chess
 import chess.engine
+from app.core.config import settings
+from app.services.analysis_cache import position_key
 from app.services.chess_service import ChessService
+from app.services.position_index import position_search
+from app.services.precompute import PrecomputeJob
+from app.services.scheduler import EngineOverloadedError
+from app.utils.http_cache import IMMUTABLE, conditional_response, encode, etag_for, not_modified
 
 router = APIRouter()
 chess_service = ChessService()
+precompute_job = PrecomputeJob(chess_service)
 
 class MoveRequest(BaseModel):
     fen: str
@@ -14,13 +24,41 @@ class MoveRequest(BaseModel):
 
 class AnalysisRequest(BaseModel):
     fen: str
-    depth: int = 15
+    depth: int = Field(15, ge=1)
+    multipv: int = Field(1, ge=1, le=10)
+    nodes: Optional[int] = Field(None, ge=1)  # Optional node budget
+    time: Optional[float] = Field(None, gt=0)  # Optional time budget in seconds
+
+class BatchAnalysisRequest(BaseModel):
+    pgn: Optional[str] = None  # Either a PGN ...
+    fen: Optional[str] = None  # ... or a start position (default: initial position)
+    moves: List[str] = []  # plus moves in SAN or UCI
+    depth: int = Field(12, ge=1)
+
+class AnalysisLine(BaseModel):
+    evaluation: float
+    mate_in: Optional[int]
+    principal_variation: List[str]
+
+class BookMoveStats(BaseModel):
+    move: str
+    san: str
+    weight: int
+    games: int
+    white_wins: int
+    draws: int
+    black_wins: int
+    systems: List[str] = []
 
 class AnalysisResponse(BaseModel):
     evaluation: float
     best_move: Optional[str]
     principal_variation: List[str]
     mate_in: Optional[int]
+    depth: int
+    lines: List[AnalysisLine]
+    book: bool = False  # True when answered from the opening book instead of an engine
+    book_moves: Optional[List[BookMoveStats]] = None  # Book moves of an engine-analyzed theory position
 
 @router.post("/validate-move")
 async def validate_move(request: MoveRequest):
@@ -30,18 +68,191 @@ async def validate_move(request: MoveRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/move")
+async def play_move(request: MoveRequest):
+    """Validate and apply a move; returns the new FEN, its legal moves and the move's SAN"""
+    try:
+        return chess_service.play_move(request.fen, request.move)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _overloaded(e: EngineOverloadedError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e),
+                         headers={"Retry-After": str(math.ceil(e.retry_after))})
+
 @router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_position(request: AnalysisRequest):
+async def analyze_position(request: AnalysisRequest, http_request: Request):
     try:
-        analysis = await chess_service.analyze_position(request.fen, request.depth)
+        analysis = await chess_service.analyze_position(
+            request.fen,
+            request.depth,
+            multipv=request.multipv,
+            nodes=request.nodes,
+            time=request.time,
+            client=http_request.client.host if http_request.client else None
+        )
         return analysis
+    except EngineOverloadedError as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/analyze", response_model=AnalysisResponse)
+async def get_analysis(http_request: Request, fen: str, depth: int = Query(15, ge=1),
+                       multipv: int = Query(1, ge=1, le=10)):
+    """Cacheable analysis: an engine result for a (FEN, depth, MultiPV) never changes.
+    
+    Complete engine results are served as immutable with an ETag derived from the
+    position and depth, so a revalidating client gets a 304 without any lookup.
+    """
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    depth = min(depth, settings.analysis_max_depth)
+    key_etag = etag_for(f"{position_key(board)}:{depth}:{multipv}".encode())
+    if not_modified(http_request, key_etag):
+        return conditional_response(http_request, b"", key_etag, IMMUTABLE)
+    try:
+        analysis = await chess_service.analyze_position(
+            fen, depth, multipv=multipv,
+            client=http_request.client.host if http_request.client else None
+        )
+    except EngineOverloadedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body, content_etag = encode(analysis)
+    if analysis.get("book") or analysis.get("book_moves"):
+        # The book can be swapped between deployments
+        return conditional_response(http_request, body, content_etag, f"public, max-age={settings.catalog_max_age}")
+    if analysis["depth"] < depth:
+        # Cut short by the deadline: a later request may well search deeper
+        return conditional_response(http_request, body, content_etag, "no-store")
+    return conditional_response(http_request, body, key_etag, IMMUTABLE)
+
+@router.get("/similar")
+async def similar_positions(fen: str, k: int = Query(5, ge=1, le=50)):
+    """Known positions nearest to ``fen`` (lesson and master-game positions) with what is known about them.
+    
+    Each comes with its stored analysis or, failing that, the book's, so the
+    analysis panel can show nearby evaluations without starting a search.
+    """
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if position_search.stale:
+        await asyncio.to_thread(position_search.refresh)
+    positions = position_search.similar(board, k)
+    # Zobrist keys don't survive JSON numbers, so they stay internal
+    keys = [position.pop("key") for position in positions]
+    analyses = await chess_service.analysis_cache.lookup_keys(keys)
+    for position, key in zip(positions, keys):
+        analysis = analyses.get(key) or chess_service.opening_book.book_analysis(chess.Board(position["fen"]), 1)
+        position["analysis"] = {
+            **{field: analysis.get(field) for field in ("evaluation", "best_move", "mate_in", "depth")},
+            # Engine results carry no book flag
+            "book": analysis.get("book", False)
+        } if analysis else None
+    return {"positions": positions}
+
+@router.post("/analyze-batch")
+async def analyze_batch(request: BatchAnalysisRequest, http_request: Request):
+    """Analyze every ply of a game or lesson line in one request"""
+    try:
+        return await chess_service.analyze_game(
+            pgn=request.pgn,
+            fen=request.fen,
+            moves=request.moves,
+            depth=request.depth,
+            client=http_request.client.host if http_request.client else None
+        )
+    except EngineOverloadedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.websocket("/analyze/ws")
+async def analyze_stream(websocket: WebSocket):
+    """Stream engine updates for the latest position sent by the client.
+    
+    Client messages: ``{"type": "analyze", "fen": ..., "depth": ..., "multipv": ...}``
+    starts a search (stopping any running one) and ``{"type": "stop"}`` stops it.
+    Server messages are ``info`` updates, a final ``result`` and ``error``.
+    """
+    await websocket.accept()
+    search: Optional[asyncio.Task] = None
+    client = websocket.client.host if websocket.client else None
+    
+    async def run(request: AnalysisRequest):
+        stream = chess_service.stream_analysis(request.fen, request.depth, request.multipv, client=client)
+        try:
+            async for update in stream:
+                await websocket.send_json(update)
+        except EngineOverloadedError as e:
+            await websocket.send_json({"type": "error", "detail": str(e), "retry_after": math.ceil(e.retry_after)})
+        except Exception as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+        finally:
+            # Stops the engine search right away when this task is cancelled
+            await stream.aclose()
+    
+    async def cancel_search():
+        if search is None:
+            return
+        search.cancel()
+        try:
+            await search
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # e.g. the error frame itself could not be sent; the loop below notices a closed socket
+            print(f"Warning: analysis stream failed: {e}")
+    
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            await cancel_search()
+            if message.get("type") == "stop":
+                continue
+            try:
+                request = AnalysisRequest(**message)
+            except Exception as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            search = asyncio.create_task(run(request))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await cancel_search()
+
 @router.get("/legal-moves/{fen}")
 async def get_legal_moves(fen: str):
     try:
         moves = chess_service.get_legal_moves(fen)
         return {"moves": moves}
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/engine-status")
+async def engine_status():
+    """Ping the pooled engines and report how many are alive, plus the scheduler queue"""
+    return {**await chess_service.engine_pool.health_check(), "scheduler": chess_service.scheduler.stats()}
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """Hit/miss counters and memory use of the analysis cache"""
+    return {**chess_service.analysis_cache.stats(), "single_flight": chess_service.inflight.stats()}
+
+@router.get("/precompute-status")
+async def precompute_status():
+    """Progress of the background lesson precompute job"""
+    return precompute_job.progress()
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
-from app.services.opening_service import OpeningService
-from pydantic import BaseModel
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+import chess
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.services.opening_book import opening_book
+from app.services.opening_service import OpeningService, catalog_cache
+from app.services.structure import classify_boards
+from app.utils.http_cache import cached_json, conditional_response, encode
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 
@@ -17,36 +23,86 @@ class LessonRequest(BaseModel):
     system: str  # "stonewall", "torre", "colle"
     lesson_id: int
 
+class ClassifyRequest(BaseModel):
+    fens: List[str] = Field(..., min_length=1, max_length=10000)
+
+def _catalog_cache_control() -> str:
+    return f"public, max-age={settings.catalog_max_age}"
+
+# Catalog responses are identical for every client: the encoded body and its
+# ETag are cached alongside the catalog and dropped with it on any write
+
+def _load_with_db(load: Callable[[OpeningService], Any]) -> Any:
+    with SessionLocal() as db:
+        return load(OpeningService(db))
+
+async def _catalog_response(key: Hashable, load: Callable[[OpeningService], Any]) -> Any:
+    # Hits are served on the event loop; only a miss opens a session, in the threadpool
+    value = catalog_cache.peek(key)
+    if value is None:
+        value = await asyncio.to_thread(catalog_cache.get, key, lambda: _load_with_db(load))
+    return value
+
 @router.get("/systems")
-async def get_opening_systems():
-    return {
-        "systems": [
-            {
-                "name": "Stonewall Attack",
-                "description": "Aggressive pawn structure with f4, e3, d4, c3",
-                "key_moves": ["d4", "e3", "f4", "c3", "Bd3"],
-                "starting_fen": "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1"
-            },
-            {
-                "name": "Torre Attack",
-                "description": "Flexible system with Bg5 and piece development",
-                "key_moves": ["d4", "Nf3", "Bg5", "e3", "Bd3"],
-                "starting_fen": "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1"
-            },
-            {
-                "name": "Colle System",
-                "description": "Solid setup with e3, Bd3, Nbd2 for central control",
-                "key_moves": ["d4", "Nf3", "e3", "Bd3", "Nbd2"],
-                "starting_fen": "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1"
-            }
-        ]
-    }
+async def get_opening_systems(request: Request):
+    body, etag = await _catalog_response(("response", "systems"),
+                                         lambda service: encode({"systems": service.get_systems()}))
+    return conditional_response(request, body, etag, _catalog_cache_control())
 
 @router.get("/lessons/{system}")
-async def get_lessons(system: str, db: Session = Depends(get_db)):
-    opening_service = OpeningService(db)
+async def get_lessons(system: str, request: Request):
     try:
-        lessons = opening_service.get_lessons_for_system(system)
-        return {"lessons": lessons}
+        body, etag = await _catalog_response(
+            ("response", "lessons", system.lower()),
+            lambda service: encode({"lessons": service.get_lessons_for_system(system)})
+        )
+        return conditional_response(request, body, etag, _catalog_cache_control())
     except Exception as e:
-        raise HTTPException(status_code=404, detail=f"System '{system}' not found")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=f"System '{system}' not found")
+
+def _encode_lesson(service: OpeningService, system: str, lesson_id: int) -> Optional[Tuple[bytes, str]]:
+    lesson = service.get_lesson_details(system, lesson_id)
+    if lesson is None:
+        return None
+    return encode({"lesson": lesson, "positions": service.get_lesson_positions(system, lesson_id)})
+
+@router.get("/lessons/{system}/{lesson_id}")
+async def get_lesson(system: str, lesson_id: int, request: Request):
+    response = await _catalog_response(("response", "lesson", system.lower(), lesson_id),
+                                       lambda service: _encode_lesson(service, system, lesson_id))
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"Lesson {lesson_id} not found in '{system}'")
+    body, etag = response
+    return conditional_response(request, body, etag, _catalog_cache_control())
+
+@router.get("/book")
+async def get_book_moves(fen: str, request: Request):
+    """Book moves for a position from the in-memory opening book"""
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    moves = opening_book.lookup(board)
+    return cached_json(request, {"in_book": bool(moves), "moves": moves}, _catalog_cache_control())
+
+@router.get("/explorer")
+async def get_explorer_moves(fen: str, request: Request, limit: int = 20, db: Session = Depends(get_db)):
+    """Move statistics from imported master games (see app.commands.import_pgn)"""
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # An import can change the numbers at any time, so clients always revalidate
+    return cached_json(request, {"fen": board.fen(), "moves": OpeningService(db).get_explorer_moves(board, limit)},
+                       "no-cache")
+
+@router.post("/classify")
+def classify_positions(request: ClassifyRequest):
+    """System (stonewall, torre, colle or null) and missing typical setup pieces for each position"""
+    boards = []
+    for fen in request.fens:
+        try:
+            boards.append(chess.Board(fen))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid FEN '{fen}': {e}")
+    return {"positions": [{"fen": fen, **result} for fen, result in zip(request.fens, classify_boards(boards))]}
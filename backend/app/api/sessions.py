@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.api.chess import _overloaded, chess_service
+from app.core.database import get_db
+from app.services.opening_service import OpeningService
+from app.services.scheduler import EngineOverloadedError
+from app.services.session_service import SessionManager, SessionNotFoundError
+
+router = APIRouter()
+session_manager = SessionManager(chess_service)
+
+class CreateSessionRequest(BaseModel):
+    system: Optional[str] = None  # Start from a lesson's starting_fen ...
+    lesson_id: Optional[int] = None
+    fen: Optional[str] = None  # ... or from any position (default: initial position)
+
+class SessionMoveRequest(BaseModel):
+    move: str  # UCI or SAN
+
+class SessionAnalysisRequest(BaseModel):
+    depth: int = Field(15, ge=1)
+    multipv: int = Field(1, ge=1, le=10)
+
+@router.post("")
+async def create_session(request: CreateSessionRequest, db: Session = Depends(get_db)):
+    fen = request.fen
+    if request.system is not None and request.lesson_id is not None:
+        lesson = OpeningService(db).get_lesson_details(request.system, request.lesson_id)
+        if lesson is None:
+            raise HTTPException(status_code=404, detail=f"Lesson {request.lesson_id} not found in '{request.system}'")
+        fen = lesson["starting_fen"]
+    try:
+        session = await session_manager.create(fen) if fen else await session_manager.create()
+        return session.state()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stats")
+async def session_stats():
+    return session_manager.stats()
+
+@router.get("/{session_id}")
+async def get_session(session_id: str):
+    try:
+        return session_manager.get(session_id).state()
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/{session_id}/moves")
+async def push_move(session_id: str, request: SessionMoveRequest):
+    try:
+        return session_manager.push_move(session_id, request.move)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{session_id}/undo")
+async def undo_move(session_id: str):
+    try:
+        return session_manager.undo(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/{session_id}/analyze")
+async def analyze_session(session_id: str, request: SessionAnalysisRequest, http_request: Request):
+    """Analyze the current position on the session's own engine, reusing its hash"""
+    try:
+        return await session_manager.analyze(session_id, request.depth, request.multipv,
+                                             client=http_request.client.host if http_request.client else None)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except EngineOverloadedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{session_id}")
+async def delete_session(session_id: str):
+    try:
+        await session_manager.delete(session_id)
+        return {"deleted": True}
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
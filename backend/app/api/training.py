@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.database import get_db
+from app.services.training_service import TrainingService
+
+router = APIRouter()
+
+class EnrollRequest(BaseModel):
+    system: str  # "stonewall", "torre", "colle"
+    plies: int = Field(16, ge=1, le=40)
+
+class DrillAnswer(BaseModel):
+    card_id: int
+    move: Optional[str] = None  # UCI or SAN of the move played ...
+    grade: Optional[int] = Field(None, ge=0, le=5)  # ... or an explicit SM-2 grade
+
+class AnswerBatch(BaseModel):
+    answers: List[DrillAnswer] = Field(..., min_length=1, max_length=500)
+
+# Plain ``def`` endpoints: FastAPI runs them in its threadpool, so database
+# work doesn't block the event loop that serves analysis and streaming
+
+@router.post("/{user_id}/enroll")
+def enroll(user_id: str, request: EnrollRequest, db: Session = Depends(get_db)):
+    """Create drill cards for every book position of a system"""
+    try:
+        added = TrainingService(db).enroll(user_id, request.system, request.plies)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"added": added}
+
+@router.get("/{user_id}/due")
+def due_cards(user_id: str, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """Cards due for review, most overdue first"""
+    return {"cards": TrainingService(db).next_due(user_id, limit)}
+
+@router.post("/{user_id}/answers")
+def record_answers(user_id: str, batch: AnswerBatch, db: Session = Depends(get_db)):
+    """Grade a batch of drill answers and reschedule their cards"""
+    try:
+        results = TrainingService(db).record_answers(user_id, [answer.model_dump() for answer in batch.answers])
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return {"results": results}
+
+@router.get("/{user_id}/stats")
+def training_stats(user_id: str, db: Session = Depends(get_db)):
+    return TrainingService(db).stats(user_id)
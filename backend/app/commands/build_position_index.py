@@ -0,0 +1,76 @@
+"""Build the master-game index used to find positions similar to a student's.
+
+Usage: python -m app.commands.build_position_index games.pgn [--output DIR] [--workers N]
+                                                             [--chunk-mb MB] [--max-plies N] [--min-rating ELO]
+
+Every distinct position of the games reaching a Stonewall, Torre or Colle
+structure is indexed, as in the opening explorer. The index is written to
+POSITION_INDEX_PATH and memory-mapped by the API when it starts.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from app.core.config import settings
+from app.services.pgn_import import find_chunks
+from app.services.position_index import PositionIndex, distinct, game_positions
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the similar-position index from PGN games")
+    parser.add_argument("path", help="PGN file, may be several GB")
+    parser.add_argument("--output", default=settings.position_index_path, help="Index directory")
+    parser.add_argument("--workers", type=int, default=settings.pgn_import_workers,
+                        help="Parser processes (0 = one per CPU core)")
+    parser.add_argument("--chunk-mb", type=int, default=settings.pgn_import_chunk_mb,
+                        help="Size of the slice each parser process works on")
+    parser.add_argument("--max-plies", type=int, default=settings.pgn_import_max_plies,
+                        help="Opening plies of each game indexed")
+    parser.add_argument("--min-rating", type=int, default=0, help="Skip games where either player is rated lower")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    path = os.path.abspath(args.path)
+    chunks = find_chunks(path, args.chunk_mb * 1024 * 1024)
+    if not chunks:
+        sys.exit(f"No games in {args.path}")
+    workers = args.workers or os.cpu_count() or 1
+    parts = []
+    done = 0
+    with ProcessPoolExecutor(workers) as pool:
+        queue = iter(chunks)
+        running = set()
+
+        def submit():
+            # Two chunks per worker, as in the PGN import, so finished parts never pile up unmerged
+            for start, end in queue:
+                running.add(pool.submit(game_positions, path, start, end, args.max_plies, args.min_rating))
+                if len(running) >= workers * 2:
+                    return
+
+        submit()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                running.remove(future)
+                parts.append(future.result())
+                done += 1
+            if len(parts) >= 16:
+                # Transpositions repeat across chunks; merge early to bound memory
+                parts = [distinct(*(np.concatenate(column) for column in zip(*parts)))]
+            positions = sum(len(keys) for _, _, keys in parts)
+            print(f"{done}/{len(chunks)} chunks, about {positions} distinct positions")
+            submit()
+
+    planes, flags, keys = distinct(*(np.concatenate(column) for column in zip(*parts)))
+    if not len(keys):
+        sys.exit(f"No Stonewall, Torre or Colle positions found in {args.path}; nothing written")
+    parsed = time.monotonic() - started
+    index = PositionIndex.build(planes, flags, keys)
+    index.save(args.output)
+    print(f"Done: {len(index)} positions in {len(index.centroids)} clusters written to {args.output} "
+          f"(parsed in {parsed:.1f}s, indexed in {time.monotonic() - started - parsed:.1f}s)")
+
+if __name__ == "__main__":
+    main()
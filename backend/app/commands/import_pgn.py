@@ -0,0 +1,42 @@
+"""Import master games from a PGN file into the opening explorer.
+
+Usage: python -m app.commands.import_pgn games.pgn [--workers N] [--chunk-mb MB]
+                                                   [--max-plies N] [--min-rating ELO]
+
+Only games reaching a Stonewall, Torre or Colle structure are counted. The
+file is parsed in parallel chunks with bounded memory; interrupt at any time
+and rerun the same command to resume with the chunks not yet imported.
+"""
+import argparse
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.services.pgn_import import PgnImporter
+
+def report(progress):
+    eta = f"{progress['eta']:.0f}s" if progress["eta"] is not None else "?"
+    print(f"{progress['chunks_done']}/{progress['chunks']} chunks, {progress['games']} games read, "
+          f"{progress['matched']} in a system ({progress['mb_per_second']:.1f} MB/s), ETA {eta}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Import PGN games into the opening explorer")
+    parser.add_argument("path", help="PGN file, may be several GB")
+    parser.add_argument("--workers", type=int, default=settings.pgn_import_workers,
+                        help="Parser processes (0 = one per CPU core)")
+    parser.add_argument("--chunk-mb", type=int, default=settings.pgn_import_chunk_mb,
+                        help="Size of the slice each parser process works on")
+    parser.add_argument("--max-plies", type=int, default=settings.pgn_import_max_plies,
+                        help="Opening plies of each game counted in the explorer")
+    parser.add_argument("--min-rating", type=int, default=0, help="Skip games where either player is rated lower")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        importer = PgnImporter(db, workers=args.workers, chunk_mb=args.chunk_mb,
+                               max_plies=args.max_plies, min_rating=args.min_rating)
+        result = importer.run(args.path, progress=report)
+    print(f"Done: {result['games']} games read, {result['matched']} in a system, {result['rows']} move rows "
+          f"merged from {result['chunks'] - result['resumed_chunks']} chunks "
+          f"({result['resumed_chunks']} already imported) in {result['elapsed']:.1f}s")
+
+if __name__ == "__main__":
+    main()
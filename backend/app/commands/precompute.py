@@ -0,0 +1,51 @@
+"""Precompute engine analysis for every lesson and book position.
+
+Usage: python -m app.commands.precompute [--plies N] [--depth D]
+
+Results are stored in the analysis_cache table, which /api/chess/analyze
+checks before starting a search. Interrupt at any time; the next run skips
+positions that are already stored.
+"""
+import argparse
+import asyncio
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.commands.seed import seed_catalog
+from app.services.analysis_cache import AnalysisCache
+from app.services.chess_service import ChessService
+from app.services.opening_book import opening_book
+from app.services.precompute import PrecomputeJob
+
+async def run(plies: int, depth: int):
+    opening_book.load()
+    chess_service = ChessService(analysis_cache=AnalysisCache(persist=True))
+    job = PrecomputeJob(chess_service, plies=plies, depth=depth)
+    task = asyncio.create_task(job.run())
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=5)
+            progress = job.progress()
+            if progress.get("total"):
+                eta = f"{progress['eta']:.0f}s" if progress["eta"] is not None else "?"
+                print(f"{progress['done']}/{progress['total']} positions "
+                      f"({progress['skipped']} already stored, {progress['failed']} failed), ETA {eta}")
+        return task.result()
+    finally:
+        await chess_service.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute analysis for lesson positions")
+    parser.add_argument("--plies", type=int, default=settings.precompute_plies,
+                        help="How far to walk past each lesson's starting position")
+    parser.add_argument("--depth", type=int, default=settings.precompute_depth, help="Engine search depth")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed_catalog(db)
+    result = asyncio.run(run(args.plies, args.depth))
+    print(f"Done: {result['done'] - result['skipped'] - result['failed']} analyzed, "
+          f"{result['skipped']} already stored, {result['failed']} failed in {result['elapsed']:.1f}s")
+
+if __name__ == "__main__":
+    main()
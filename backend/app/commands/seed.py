@@ -0,0 +1,55 @@
+"""Seed the opening systems and lessons tables.
+
+Usage: python -m app.commands.seed [--reset]
+"""
+import argparse
+from sqlalchemy.orm import Session
+from app.core.database import Base, SessionLocal, engine
+from app.data.catalog import LESSONS, SYSTEMS
+from app.models.opening import Lesson, LessonPosition, System
+from app.services.opening_service import bump_catalog_version, catalog_cache
+
+def seed_catalog(db: Session, reset: bool = False) -> bool:
+    """Insert the bundled catalog; returns False if it was already seeded"""
+    if reset:
+        db.query(LessonPosition).delete()
+        db.query(Lesson).delete()
+        db.query(System).delete()
+    elif db.query(System).first() is not None:
+        return False
+
+    for data in SYSTEMS:
+        system = System(**data)
+        for lesson_data in LESSONS.get(data["slug"], []):
+            lesson = Lesson(
+                lesson_number=lesson_data["id"],
+                title=lesson_data["title"],
+                description=lesson_data["description"],
+                starting_fen=lesson_data["starting_fen"],
+                key_moves=lesson_data["key_moves"],
+                objectives=lesson_data["objectives"]
+            )
+            lesson.positions.append(LessonPosition(ply=0, fen=lesson_data["starting_fen"],
+                                                   comment=lesson_data["description"]))
+            system.lessons.append(lesson)
+        db.add(system)
+    # Running workers notice the new version on their next catalog sync
+    version = bump_catalog_version(db)
+    db.commit()
+    catalog_cache.invalidate(version)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the lesson catalog")
+    parser.add_argument("--reset", action="store_true", help="Delete existing systems and lessons first")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if seed_catalog(db, reset=args.reset):
+            print(f"Seeded {len(SYSTEMS)} systems and {sum(map(len, LESSONS.values()))} lessons")
+        else:
+            print("Catalog already seeded (use --reset to reseed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Run the API with several worker processes.
+
+Usage: python -m app.commands.serve [--workers N] [--host H] [--port P]
+
+Creates and seeds the database once before the workers start, so they don't
+race each other on first boot. Each worker then sizes its engine pool to its
+share of the CPU cores, and all of them read and write the analysis and AI
+caches in the shared database.
+"""
+import argparse
+import os
+import uvicorn
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.commands.seed import seed_catalog
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=max(settings.workers, 1))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.workers > 1 and settings.database_url.startswith("sqlite:///:memory:"):
+        parser.error("an in-memory database can't be shared between workers")
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed_catalog(db)
+
+    # Workers are fresh interpreters that read their settings from the environment
+    os.environ["WORKERS"] = str(args.workers)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
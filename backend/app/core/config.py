@@ -3,11 +3,59 @@ from typing import Optional
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./chess_trainer.db"
+    sqlite_busy_timeout_ms: int = 5000  # How long a worker waits on another worker's SQLite write lock
+    workers: int = 1  # Server processes (see app.commands.serve); per-core engine budgets are split between them
     stockfish_path: Optional[str] = None  # Will use default stockfish installation
+    engine_pool_size: int = 0  # 0 = one engine process per CPU core, shared out between workers
+    engine_threads: int = 1  # UCI "Threads" option for each pooled engine
+    engine_hash_mb: int = 64  # UCI "Hash" option for each pooled engine
+    engine_health_timeout: float = 5.0  # Seconds to wait for an engine to answer a ping
+    analysis_max_depth: int = 30  # Deeper requests are clamped to this depth, whoever sends them
+    analysis_max_nodes: int = 50000000  # Node budget cap for any single search, whoever sends it
+    interactive_deadline: float = 10.0  # Seconds an interactive analysis may queue and search
+    batch_deadline: float = 120.0  # Seconds a game review may queue and search
+    scheduler_max_queue: int = 64  # Queued searches (at or above a request's priority) before 429
+    scheduler_max_per_client: int = 4  # Queued plus running searches per client address
+    analysis_cache_max_mb: int = 64  # Memory cap for the in-process analysis LRU
+    analysis_cache_persist: bool = True  # Write analysis results through to the database
+    session_max_count: int = 10000  # Game sessions kept in memory before the LRU one is dropped
+    session_max_engines: int = 4  # Sessions that may hold a dedicated engine at once; their searches share the pool's scheduler slots
+    session_idle_ttl: float = 1800.0  # Seconds of inactivity before a session expires
+    prewarm_on_startup: bool = False  # Spawn the engine pool during startup instead of on the first analysis
+    precompute_on_startup: bool = False  # Warm lesson analysis in the background when the API starts
+    precompute_plies: int = 4  # Plies walked past each lesson's starting position
+    precompute_depth: int = 18  # Engine depth stored for precomputed positions
+    board_cache_size: int = 4096  # Parsed positions kept for move validation
+    opening_book_path: Optional[str] = None  # PGN repertoire or Polyglot .bin; defaults to the bundled repertoire
+    pgn_import_workers: int = 0  # Parser processes for app.commands.import_pgn; 0 = one per CPU core
+    pgn_import_chunk_mb: int = 16  # Size of the PGN slices handed to each parser process
+    pgn_import_max_plies: int = 24  # Opening plies of each game counted in the explorer
+    catalog_max_age: int = 300  # Seconds clients may reuse catalog and book responses before revalidating
+    catalog_sync_interval: float = 5.0  # Seconds between checks for catalog changes made by another process
+    gzip_min_bytes: int = 1000  # Smaller responses are sent uncompressed
+    position_index_path: str = "./position_index"  # Memory-mapped master-game positions from app.commands.build_position_index
+    position_index_probes: int = 8  # Clusters scored per similar-position query; more is slower but closer to exact
+    position_search_max_distance: int = 10  # Similar lesson positions further away than this are left out of AI prompts
+    retrieval_index_path: str = "./retrieval_index.npz"  # Embedded lesson snippets for AI prompts, rebuilt when the catalog changes
+    retrieval_top_k: int = 4  # Lesson snippets considered for each AI prompt
+    retrieval_token_budget: int = 300  # Prompt tokens the selected snippets may use
+    retrieval_min_score: float = 0.05  # Cosine similarity below which a snippet is left out
     ollama_url: str = "http://localhost:11434"
     ollama_model: str = "llama2"
+    ollama_timeout: float = 120.0  # Seconds to wait for a generation
+    ollama_max_connections: int = 8  # Size of the pooled HTTP client
+    ollama_health_interval: float = 15.0  # Seconds between background availability checks
+    ollama_health_timeout: float = 2.0  # Seconds before an availability check counts as down
+    ollama_cache_size: int = 1024  # Cached AI responses
+    ollama_cache_ttl: float = 3600.0  # Seconds before a cached AI response expires
+    ollama_cache_persist: bool = True  # Share cached AI responses between workers through the database
+    ollama_keep_alive: str = "30m"  # How long Ollama keeps the model loaded after a request; "-1m" = until Ollama restarts
+    ollama_preload: bool = True  # Load the model when the app starts instead of on the first question
+    ollama_conversation_max_count: int = 256  # Conversations kept in memory for follow-up questions
+    ollama_conversation_ttl: float = 1800.0  # Seconds an unused conversation is kept
+    ollama_conversation_max_context: int = 2048  # Context tokens after which a conversation starts over; keep below the model's num_ctx
     
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
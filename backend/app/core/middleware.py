@@ -0,0 +1,79 @@
+import time
+from typing import Dict
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from app.utils.metrics import metrics
+
+http_requests = metrics.counter("http_requests_total", "HTTP requests by route, method and status",
+                                ("method", "route", "status"))
+http_latency = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route",
+                                 ("method", "route"))
+http_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests currently being served",
+                               ("method",))
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency, status and in-flight counts.
+
+    Routes are labelled by their path template (``/api/openings/lessons/{system}``),
+    not the raw URL, so the number of series stays bounded. Streaming responses
+    are timed until their last chunk is sent.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._templates: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+        started = time.perf_counter()
+        # The route is only known once the router has matched, so in-flight
+        # requests are counted per method
+        http_in_flight.inc(labels=(method,))
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec(labels=(method,))
+            route = self._route(scope)
+            http_latency.observe(time.perf_counter() - started, (method, route))
+            http_requests.inc(labels=(method, route, status))
+
+    def _route(self, scope) -> str:
+        # Starlette's router writes the matched endpoint into the shared scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = next((route.path for route in scope["app"].routes
+                             if getattr(route, "endpoint", None) is endpoint), "unmatched")
+            self._templates[endpoint] = template
+        return template
+
+def _is_event_stream(scope) -> bool:
+    # Decided from the request, before any response header is seen: every SSE
+    # route ends in /stream, and EventSource clients ask for text/event-stream
+    return (scope["path"].endswith("/stream")
+            or "text/event-stream" in Headers(scope=scope).get("Accept", ""))
+
+class CompressionMiddleware(GZipMiddleware):
+    """Gzip for clients that accept it, except for server-sent event streams.
+
+    Events must reach the client as they are produced, not whenever a gzip
+    block fills up, so those requests bypass compression entirely.
+    """
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and _is_event_stream(scope):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+class Startup:
+    """Runs the app's startup steps concurrently in the background and tracks readiness.
+
+    The server starts answering liveness checks immediately; ``ready`` turns true
+    once every required step has succeeded. Optional steps (the AI assistant,
+    say) are reported but don't hold readiness back, whether slow or failed.
+    """
+    def __init__(self, imported_seconds: Optional[float] = None):
+        self.imported_seconds = imported_seconds
+        self.steps: Dict[str, Dict] = {}
+        self.required: Dict[str, bool] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self, steps: Dict[str, Callable[[], Awaitable]], optional=(),
+              then: Optional[Callable[[], Awaitable]] = None):
+        """Launch every step at once; ``then`` runs afterwards if the app became ready"""
+        self.started_at, self.ready_at, self.finished_at = time.perf_counter(), None, None
+        self.steps = {name: {"ok": None} for name in steps}
+        self.required = {name: name not in optional for name in steps}
+        self.task = asyncio.create_task(self._run(steps, then))
+
+    async def _run(self, steps: Dict[str, Callable[[], Awaitable]], then: Optional[Callable[[], Awaitable]]):
+        await asyncio.gather(*(self._step(name, step) for name, step in steps.items()))
+        self.finished_at = time.perf_counter()
+        if then is not None and self.ready:
+            await then()
+
+    async def _step(self, name: str, step: Callable[[], Awaitable]):
+        started = time.perf_counter()
+        try:
+            await step()
+            self.steps[name] = {"ok": True, "seconds": time.perf_counter() - started}
+            if self.ready_at is None and self.ready:
+                self.ready_at = time.perf_counter()
+        except Exception as e:
+            print(f"Warning: startup step '{name}' failed: {e}")
+            self.steps[name] = {"ok": False, "seconds": time.perf_counter() - started, "error": str(e)}
+
+    @property
+    def ready(self) -> bool:
+        # Optional steps still running don't hold readiness back either
+        return bool(self.steps) and all(
+            self.steps[name]["ok"] for name, required in self.required.items() if required
+        )
+
+    async def wait(self) -> bool:
+        """Wait for every startup step to finish; returns whether the app is ready"""
+        if self.task is not None:
+            await asyncio.shield(self.task)
+        return self.ready
+
+    async def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "import_seconds": self.imported_seconds,
+            "ready_seconds": self.ready_at - self.started_at if self.ready_at is not None else None,
+            "startup_seconds": self.finished_at - self.started_at if self.finished_at is not None else None,
+            "steps": self.steps
+        }
+
+    def timings(self) -> Dict:
+        """Seconds per finished step, for /metrics"""
+        return {
+            "import_seconds": self.imported_seconds or 0.0,
+            "ready_seconds": self.ready_at - self.started_at if self.ready_at is not None else 0.0,
+            "seconds": self.finished_at - self.started_at if self.finished_at is not None else 0.0,
+            "step_seconds": {name: step["seconds"] for name, step in self.steps.items() if "seconds" in step},
+            "ready": int(self.ready)
+        }
@@ -1,12 +1,91 @@
+import time
+# Start of the import-time measurement reported by /ready
+_import_started = time.perf_counter()
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import chess, openings, ai
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from app.api import chess, openings, ai, sessions, training
 from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.core.middleware import CompressionMiddleware, MetricsMiddleware
+from app.core.startup import Startup
+from app.commands.seed import seed_catalog
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+from app.services.opening_book import opening_book
+from app.services.opening_service import catalog_cache
+from app.services.position_index import position_search
+from app.services.retrieval import retrieval_index
+from app.utils.metrics import metrics
+
+startup = Startup(imported_seconds=time.perf_counter() - _import_started)
+
+def prepare_database():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed_catalog(db)
+        catalog_cache.sync(db)
+
+def sync_catalog():
+    with SessionLocal() as db:
+        catalog_cache.sync(db)
+
+async def watch_catalog():
+    # Another worker or a seed run may change the catalog; its version row tells us when
+    while True:
+        await asyncio.sleep(settings.catalog_sync_interval)
+        try:
+            await asyncio.to_thread(sync_catalog)
+        except Exception as e:
+            print(f"Warning: could not check the catalog version: {e}")
+
+async def after_ready():
+    app.state.catalog_watch = asyncio.create_task(watch_catalog())
+    if settings.precompute_on_startup:
+        app.state.precompute = asyncio.create_task(chess.precompute_job.run())
+    try:
+        # Loads the embedded lesson catalog from disk, or embeds it if the catalog changed
+        await asyncio.to_thread(retrieval_index.refresh)
+    except Exception as e:
+        print(f"Warning: could not build the lesson retrieval index: {e}")
+    try:
+        # Indexes the lesson positions and memory-maps the master-game index if one was built
+        await asyncio.to_thread(position_search.refresh)
+    except Exception as e:
+        print(f"Warning: could not build the similar-position index: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing slow happens before the server accepts connections: the steps run
+    # concurrently in the background and /ready reports when they are done
+    app.state.precompute = None
+    app.state.catalog_watch = None
+    await sessions.session_manager.start()
+    steps = {
+        "database": lambda: asyncio.to_thread(prepare_database),
+        "opening_book": lambda: asyncio.to_thread(opening_book.load),
+        "ai": ai.ollama_service.start,
+    }
+    if settings.prewarm_on_startup:
+        steps["engines"] = chess.chess_service.prewarm
+    startup.start(steps, optional=("ai",), then=after_ready)
+    yield
+    await startup.cancel()
+    if app.state.precompute is not None:
+        app.state.precompute.cancel()
+    if app.state.catalog_watch is not None:
+        app.state.catalog_watch.cancel()
+    await sessions.session_manager.close()
+    await chess.chess_service.close()
+    await ai.ollama_service.close()
 
 app = FastAPI(
     title="Chess Opening Trainer API",
     description="Backend API for the Interactive Chess Opening Systems Trainer",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -16,11 +95,50 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Level 6 is nearly as small as 9 for JSON at a fraction of the CPU
+app.add_middleware(CompressionMiddleware, minimum_size=settings.gzip_min_bytes, compresslevel=6)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(chess.router, prefix="/api/chess", tags=["chess"])
 app.include_router(openings.router, prefix="/api/openings", tags=["openings"])
 app.include_router(ai.router, prefix="/api/ai", tags=["ai"])
+app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
+app.include_router(training.router, prefix="/api/training", tags=["training"])
+
+# Counters the services already keep are read at scrape time
+metrics.collect("chess_analysis_cache", "Analysis cache counters", chess.chess_service.analysis_cache.stats)
+metrics.collect("chess_analysis_single_flight", "Coalesced analysis requests", chess.chess_service.inflight.stats)
+metrics.collect("chess_board_cache", "Parsed board cache counters",
+                lambda: chess.chess_service.board_entry.cache_info()._asdict())
+metrics.collect("chess_engine_pool", "Engine pool size and restarts",
+                lambda: {"size": chess.chess_service.engine_pool.size,
+                         "restarts": chess.chess_service.engine_pool.restarts})
+metrics.collect("chess_scheduler", "Engine scheduler queue and admission counters",
+                chess.chess_service.scheduler.stats)
+metrics.collect("ai_response_cache", "AI response cache counters", ai.ollama_service.response_cache.stats)
+metrics.collect("ai_single_flight", "Coalesced AI requests", ai.ollama_service.inflight.stats)
+metrics.collect("position_search", "Positions searchable for similarity", position_search.stats)
+metrics.collect("ai_conversations", "AI conversations kept for follow-up questions", ai.ollama_service.conversations.stats)
+metrics.collect("ai", "AI assistant availability", lambda: {"available": int(ai.ollama_service.available)})
+metrics.collect("game_sessions", "Game session counts", sessions.session_manager.stats)
+metrics.collect("precompute", "Lesson precompute progress", chess.precompute_job.progress)
+metrics.collect("startup", "Import and startup step durations", startup.timings)
 
 @app.get("/")
 async def root():
-    return {"message": "Chess Opening Trainer API", "version": "1.0.0"}
\ No newline at end of file
+    return {"message": "Chess Opening Trainer API", "version": "1.0.0"}
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving, whether or not startup has finished"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once the database, opening book (and prewarmed engines) are up, 503 before"""
+    return JSONResponse(startup.status(), status_code=200 if startup.ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text-format metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,5 @@
+from app.models.ai import AIResponseCacheEntry
+from app.models.analysis import AnalysisCacheEntry
+from app.models.explorer import ExplorerMove, PgnImport, PgnImportChunk
+from app.models.opening import CatalogVersion, Lesson, LessonPosition, System
+from app.models.training import ReviewAnswer, ReviewCard
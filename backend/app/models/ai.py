@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, Float, String, Text, func
+from app.core.database import Base
+
+class AIResponseCacheEntry(Base):
+    """Cached AI answer shared by every server worker"""
+    __tablename__ = "ai_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 of model, prompt and context
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)  # Unix time
+    created_at = Column(DateTime, server_default=func.now())
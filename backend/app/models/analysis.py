@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, JSON, String, func
+from app.core.database import Base
+
+class AnalysisCacheEntry(Base):
+    """Deepest known engine result for a position, keyed by its Zobrist hash"""
+    __tablename__ = "analysis_cache"
+
+    # Zobrist hashes are unsigned 64-bit; stored shifted into SQLite's signed range
+    position_hash = Column(BigInteger, primary_key=True)
+    fen = Column(String, nullable=False)
+    depth = Column(Integer, nullable=False)
+    multipv = Column(Integer, nullable=False, default=1)
+    result = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,47 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String
+from app.core.database import Base
+
+class ExplorerMove(Base):
+    """Aggregated master-game statistics for one move from one position"""
+    __tablename__ = "explorer_moves"
+    __table_args__ = (
+        Index("ix_explorer_moves_system_games", "system", "games"),
+    )
+
+    # Zobrist hash of the position before the move, signed like analysis_cache
+    position_hash = Column(BigInteger, primary_key=True)
+    move = Column(String(5), primary_key=True)  # UCI
+    system = Column(String, nullable=False)  # System reached by the first imported game with this move
+    games = Column(Integer, nullable=False, default=0)
+    white_wins = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    black_wins = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(BigInteger, nullable=False, default=0)  # Sum of mean player ratings
+    rated_games = Column(Integer, nullable=False, default=0)
+
+class PgnImport(Base):
+    """One import run over a PGN file; chunks already merged are recorded so a rerun resumes"""
+    __tablename__ = "pgn_imports"
+    __table_args__ = (
+        Index("ix_pgn_imports_file", "path", "size", "mtime", "chunk_size", "max_plies", "min_rating", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    max_plies = Column(Integer, nullable=False)
+    min_rating = Column(Integer, nullable=False)
+    chunks = Column(Integer, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+class PgnImportChunk(Base):
+    """A chunk of a PGN file whose statistics are already in explorer_moves"""
+    __tablename__ = "pgn_import_chunks"
+
+    import_id = Column(Integer, ForeignKey("pgn_imports.id"), primary_key=True)
+    offset = Column(BigInteger, primary_key=True)
+    games = Column(Integer, nullable=False)  # Games read from the chunk
+    matched = Column(Integer, nullable=False)  # Games that reached a system
@@ -0,0 +1,57 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, JSON, String, Text
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+class System(Base):
+    """An opening system such as the Stonewall Attack"""
+    __tablename__ = "systems"
+
+    id = Column(Integer, primary_key=True)
+    slug = Column(String, nullable=False, unique=True, index=True)  # "stonewall", "torre", "colle"
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=False)
+    key_moves = Column(JSON, nullable=False)
+    starting_fen = Column(String, nullable=False)
+
+    lessons = relationship("Lesson", back_populates="system", order_by="Lesson.lesson_number")
+
+class Lesson(Base):
+    __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_system_number", "system_id", "lesson_number", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    system_id = Column(Integer, ForeignKey("systems.id"), nullable=False)
+    lesson_number = Column(Integer, nullable=False)  # The lesson id exposed by the API, per system
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=False)
+    starting_fen = Column(String, nullable=False)
+    key_moves = Column(JSON, nullable=False)
+    objectives = Column(JSON, nullable=False)
+
+    system = relationship("System", back_populates="lessons")
+    positions = relationship("LessonPosition", back_populates="lesson", order_by="LessonPosition.ply")
+
+class LessonPosition(Base):
+    """An annotated position inside a lesson"""
+    __tablename__ = "lesson_positions"
+    __table_args__ = (
+        Index("ix_lesson_positions_lesson_ply", "lesson_id", "ply"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
+    ply = Column(Integer, nullable=False)
+    fen = Column(String, nullable=False, index=True)
+    move = Column(String)  # SAN of the move leading here, None for the lesson's starting position
+    comment = Column(Text)
+
+    lesson = relationship("Lesson", back_populates="positions")
+
+class CatalogVersion(Base):
+    """Single row bumped with every catalog write, so other processes can drop their cached catalog"""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
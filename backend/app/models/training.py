@@ -0,0 +1,35 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from app.core.database import Base
+
+class ReviewCard(Base):
+    """One repertoire position a user drills, with its spaced-repetition state"""
+    __tablename__ = "review_cards"
+    __table_args__ = (
+        # Serves "next due cards for this user" as an index range scan
+        Index("ix_review_cards_user_due", "user_id", "due_at"),
+        Index("ix_review_cards_user_system_fen", "user_id", "system", "fen", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    system = Column(String, nullable=False)  # System slug the position belongs to
+    fen = Column(String, nullable=False)
+    expected_move = Column(String, nullable=False)  # UCI of the repertoire move
+    ease = Column(Float, nullable=False, default=2.5)
+    interval_days = Column(Float, nullable=False, default=0.0)
+    repetitions = Column(Integer, nullable=False, default=0)  # Successful reviews in a row
+    lapses = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime, nullable=False)
+    last_reviewed_at = Column(DateTime)
+
+class ReviewAnswer(Base):
+    """Append-only log of drill answers"""
+    __tablename__ = "review_answers"
+
+    id = Column(Integer, primary_key=True)
+    card_id = Column(Integer, ForeignKey("review_cards.id"), nullable=False, index=True)
+    user_id = Column(String, nullable=False)
+    move = Column(String)  # UCI the user played, None when only a grade was sent
+    correct = Column(Boolean, nullable=False)
+    grade = Column(Integer, nullable=False)  # SM-2 quality, 0-5
+    answered_at = Column(DateTime, nullable=False)
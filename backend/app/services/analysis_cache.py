@@ -0,0 +1,136 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import chess
+import chess.polyglot
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.analysis import AnalysisCacheEntry
+
+# Rough per-entry overhead of the dict, tuple and key objects on top of the payload
+_ENTRY_OVERHEAD = 200
+
+def position_key(board: chess.Board) -> int:
+    """Zobrist hash of the position, ignoring the halfmove and fullmove counters"""
+    return chess.polyglot.zobrist_hash(board)
+
+def _to_signed(key: int) -> int:
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+def _supersedes(depth: int, multipv: int, old_depth: int, old_multipv: int) -> bool:
+    # Deeper wins; at equal depth keep whichever result has more lines
+    return depth > old_depth or (depth == old_depth and multipv >= old_multipv)
+
+class AnalysisCache:
+    """LRU cache of analysis results keyed by position.
+
+    A result searched to depth D with MultiPV K answers any request for depth <= D
+    and at most K lines, so only the deepest result per position is kept. Entries
+    are optionally written through to the ``analysis_cache`` table so they survive
+    restarts and are shared by every server worker.
+    """
+    def __init__(self, max_bytes: Optional[int] = None, persist: Optional[bool] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.analysis_cache_max_mb * 1024 * 1024
+        self.persist = settings.analysis_cache_persist if persist is None else persist
+        self._entries: "OrderedDict[int, Tuple[int, int, Dict, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: int, depth: int, multipv: int) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < depth or entry[1] < multipv:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def _store(self, key: int, depth: int, multipv: int, result: Dict):
+        existing = self._entries.get(key)
+        if existing is not None:
+            if not _supersedes(depth, multipv, existing[0], existing[1]):
+                return
+            self._bytes -= existing[3]
+        size = len(json.dumps(result)) + _ENTRY_OVERHEAD
+        self._entries[key] = (depth, multipv, result, size)
+        self._entries.move_to_end(key)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, _, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def _load(self, key: int, depth: int, multipv: int) -> Optional[Tuple[int, int, Dict]]:
+        with SessionLocal() as db:
+            row = db.get(AnalysisCacheEntry, _to_signed(key))
+            if row is None or row.depth < depth or row.multipv < multipv:
+                return None
+            return row.depth, row.multipv, row.result
+
+    def _save(self, key: int, fen: str, depth: int, multipv: int, result: Dict, retry: bool = True):
+        with SessionLocal() as db:
+            row = db.get(AnalysisCacheEntry, _to_signed(key))
+            if row is None:
+                db.add(AnalysisCacheEntry(position_hash=_to_signed(key), fen=fen, depth=depth,
+                                          multipv=multipv, result=result))
+            elif _supersedes(depth, multipv, row.depth, row.multipv):
+                row.fen, row.depth, row.multipv, row.result = fen, depth, multipv, result
+            else:
+                return
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker inserted the position first; compare against its row
+                db.rollback()
+                if retry:
+                    self._save(key, fen, depth, multipv, result, retry=False)
+
+    async def get(self, board: chess.Board, depth: int, multipv: int = 1) -> Optional[Dict]:
+        """Return a stored result searched at least as deep as ``depth`` with enough lines"""
+        key = position_key(board)
+        result = self._lookup(key, depth, multipv)
+        if result is not None:
+            self.hits += 1
+            return result
+        if self.persist:
+            stored = await asyncio.to_thread(self._load, key, depth, multipv)
+            if stored is not None:
+                self.db_hits += 1
+                self._store(key, *stored)
+                return stored[2]
+        self.misses += 1
+        return None
+
+    async def put(self, board: chess.Board, depth: int, multipv: int, result: Dict):
+        key = position_key(board)
+        self._store(key, depth, multipv, result)
+        if self.persist:
+            await asyncio.to_thread(self._save, key, board.fen(), depth, multipv, result)
+
+    async def lookup_keys(self, keys: List[int]) -> Dict[int, Dict]:
+        """Deepest stored result for each position key, at any depth; not counted in the hit rate"""
+        found = {key: self._entries[key][2] for key in keys if key in self._entries}
+        missing = [key for key in keys if key not in found]
+        if missing and self.persist:
+            found.update(await asyncio.to_thread(self._load_keys, missing))
+        return found
+
+    def _load_keys(self, keys: List[int]) -> Dict[int, Dict]:
+        with SessionLocal() as db:
+            rows = db.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.position_hash.in_([_to_signed(key) for key in keys])
+            )
+            return {row.position_hash % (1 << 64): row.result for row in rows}
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.db_hits + self.misses
+        return {
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.db_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -1,69 +1,407 @@
+import asyncio
+import functools
+import io
+import time as clock
+from contextlib import asynccontextmanager
 import chess
 import chess.engine
-from stockfish import Stockfish
-from typing import List, Optional, Dict
+import chess.pgn
+from typing import AsyncIterator, FrozenSet, Hashable, List, NamedTuple, Optional, Dict, Tuple
 from app.core.config import settings
+from app.services.analysis_cache import AnalysisCache, position_key
+from app.services.engine_pool import EnginePool, EngineUnavailableError
+from app.services.opening_book import OpeningBook, opening_book as default_opening_book
+from app.services.scheduler import BATCH, INTERACTIVE, EngineOverloadedError, EngineScheduler, engine_limit
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+
+# Centipawn loss thresholds for classifying the move that was played
+MOVE_QUALITY_THRESHOLDS = [(300, "blunder"), (100, "mistake"), (50, "inaccuracy")]
+# Mate scores are clamped to this many centipawns when comparing evaluations
+MATE_CP = 1000
+
+engine_queue_wait = metrics.histogram("chess_engine_queue_wait_seconds", "Time spent waiting for a free engine")
+engine_search_time = metrics.histogram("chess_engine_search_seconds", "Engine search wall time")
+engine_nodes = metrics.counter("chess_engine_nodes_total", "Nodes searched by the engines")
+engine_nps = metrics.histogram("chess_engine_nodes_per_second", "Engine speed reported per search",
+                               buckets=(1e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7))
+analysis_source = metrics.counter("chess_analysis_total", "Analyses by where the answer came from", ("source",))
+
+class BoardEntry(NamedTuple):
+    """A parsed position and its legal moves; shared between callers, never mutated"""
+    board: chess.Board
+    legal_moves: Tuple[str, ...]
+    legal_set: FrozenSet[str]
 
 class ChessService:
-    def __init__(self):
-        self.stockfish = None
-        self._init_stockfish()
-    
-    def _init_stockfish(self):
-        try:
-            stockfish_path = settings.stockfish_path or "stockfish"
-            self.stockfish = Stockfish(path=stockfish_path)
-        except Exception as e:
-            print(f"Warning: Could not initialize Stockfish: {e}")
-            self.stockfish = None
+    def __init__(self, engine_pool: Optional[EnginePool] = None,
+                 analysis_cache: Optional[AnalysisCache] = None,
+                 opening_book: Optional[OpeningBook] = None):
+        # Engine processes are spawned on first analysis, not at import time
+        self.engine_pool = engine_pool or EnginePool()
+        self.scheduler = EngineScheduler(self.engine_pool)
+        self.analysis_cache = analysis_cache or AnalysisCache()
+        self.opening_book = opening_book or default_opening_book
+        self.inflight = SingleFlight()
+        # Drag-and-drop validates, lists and applies moves on the same few FENs
+        self.board_entry = functools.lru_cache(maxsize=settings.board_cache_size)(_parse_board_entry)
     
     def validate_move(self, fen: str, move: str) -> bool:
         try:
-            board = chess.Board(fen)
-            chess_move = chess.Move.from_uci(move)
-            return chess_move in board.legal_moves
+            return move in self.board_entry(fen).legal_set
         except:
             return False
     
     def get_legal_moves(self, fen: str) -> List[str]:
         try:
-            board = chess.Board(fen)
-            return [move.uci() for move in board.legal_moves]
+            return list(self.board_entry(fen).legal_moves)
         except:
             return []
     
-    async def analyze_position(self, fen: str, depth: int = 15) -> Dict:
-        # Reinitialize Stockfish if needed
-        if not self.stockfish:
-            self._init_stockfish()
+    async def analyze_position(self, fen: str, depth: int = 15, multipv: int = 1,
+                               nodes: Optional[int] = None, time: Optional[float] = None,
+                               client: Optional[Hashable] = None) -> Dict:
+        """Run one engine search and return every candidate line with its full PV"""
+        return await self.analyze_board(_parse_position(fen), depth, multipv, nodes, time, client=client)
+    
+    async def analyze_board(self, board: chess.Board, depth: int = 15, multipv: int = 1,
+                            nodes: Optional[int] = None, time: Optional[float] = None,
+                            engine_pool: Optional[EnginePool] = None, game: object = None,
+                            use_book: bool = True, priority: int = INTERACTIVE,
+                            client: Optional[Hashable] = None) -> Dict:
+        """Analyze a board, optionally on a caller-owned engine.
         
-        if not self.stockfish:
-            raise Exception("Stockfish engine not available")
+        ``engine_pool`` and ``game`` let a game session search on its own engine
+        with the move stack, so the engine keeps its hash between moves. Every
+        search goes through the scheduler with ``priority`` and ``client``.
+        """
+        depth = min(depth, settings.analysis_max_depth)
+        # Stored results (including precomputed lesson positions) beat the book's estimate
+        cached = await self.analysis_cache.get(board, depth, multipv)
+        if cached is not None:
+            analysis_source.inc(labels=("cache",))
+            return self._with_book_moves(_limit_lines(cached, multipv), board, use_book)
+        
+        # Theory positions with game results are answered from the book without touching an engine
+        if use_book:
+            book = self.opening_book.book_analysis(board, multipv)
+            if book is not None:
+                analysis_source.inc(labels=("book",))
+                return book
         
+        analysis_source.inc(labels=("engine",))
+        if engine_pool is not None:
+            analysis = await self._search(board, depth, multipv, nodes, time, engine_pool, game,
+                                          priority=priority, client=client)
+        else:
+            # Identical concurrent requests (a class opening the same lesson) share one search
+            key = (position_key(board), depth, multipv, nodes, time)
+            analysis = await self.inflight.do(key, lambda: self._search(board, depth, multipv, nodes, time,
+                                                                        priority=priority, client=client))
+        return self._with_book_moves(analysis, board, use_book)
+    
+    def _with_book_moves(self, analysis: Dict, board: chess.Board, use_book: bool = True) -> Dict:
+        # Book moves ride along with engine evaluations; they are never cached with them
+        if not use_book:
+            return analysis
+        moves = self.opening_book.lookup(board)
+        return {**analysis, "book_moves": moves} if moves else analysis
+    
+    async def _search(self, board: chess.Board, depth: int, multipv: int,
+                      nodes: Optional[int], time: Optional[float],
+                      engine_pool: Optional[EnginePool] = None, game: object = None,
+                      priority: int = INTERACTIVE, client: Optional[Hashable] = None) -> Dict:
+        if engine_pool is not None:
+            checkout = self._dedicated(engine_pool, priority, client)
+        else:
+            checkout = self.scheduler.acquire(priority, client)
+        queued = clock.perf_counter()
         try:
-            self.stockfish.set_fen_position(fen)
-            evaluation = self.stockfish.get_evaluation()
-            best_move = self.stockfish.get_best_move()
-            
-            # Get principal variation (simplified for now)
-            pv = [best_move] if best_move else []
-            
-            return {
-                "evaluation": evaluation.get("value", 0) / 100.0 if evaluation["type"] == "cp" else 0,
-                "best_move": best_move,
-                "principal_variation": pv,
-                "mate_in": evaluation.get("value") if evaluation.get("type") == "mate" else None
-            }
+            async with checkout as (engine, remaining):
+                started = clock.perf_counter()
+                engine_queue_wait.observe(started - queued)
+                limit = engine_limit(depth, nodes, time, remaining)
+                infos = await engine.analyse(board, limit, multipv=multipv, game=game)
+                engine_search_time.observe(clock.perf_counter() - started)
+        except EngineOverloadedError:
+            raise
+        except EngineUnavailableError:
+            raise Exception("Stockfish engine not available")
         except Exception as e:
             raise Exception(f"Analysis failed: {str(e)}")
+        
+        if infos:
+            _record_search(infos[0])
+        analysis = _build_analysis(infos, depth)
+        await self.analysis_cache.put(board, analysis["depth"], multipv, analysis)
+        return analysis
+    
+    async def stream_analysis(self, fen: str, depth: int = 15, multipv: int = 1,
+                              client: Optional[Hashable] = None) -> AsyncIterator[Dict]:
+        """Yield engine ``info`` updates as the search deepens, then the final result.
+        
+        Closing the generator (e.g. cancelling the consuming task) sends ``stop`` to
+        the engine and returns it to the pool, so no time is spent on stale work.
+        """
+        board = _parse_position(fen)
+        depth = min(depth, settings.analysis_max_depth)
+        
+        cached = await self.analysis_cache.get(board, depth, multipv)
+        if cached is not None:
+            yield {"type": "result", **self._with_book_moves(_limit_lines(cached, multipv), board)}
+            return
+        
+        book = self.opening_book.book_analysis(board, multipv)
+        if book is not None:
+            yield {"type": "result", **book}
+            return
+        
+        queued = clock.perf_counter()
+        try:
+            async with self.scheduler.acquire(INTERACTIVE, client) as (engine, remaining):
+                started = clock.perf_counter()
+                engine_queue_wait.observe(started - queued)
+                limit = engine_limit(depth, None, None, remaining)
+                with await engine.analysis(board, limit, multipv=multipv) as search:
+                    async for info in search:
+                        # Skip currmove/hashfull-only updates that carry no line
+                        if "score" in info and info.get("pv"):
+                            yield _info_update(info)
+                    infos = [info for info in search.multipv if "score" in info]
+                engine_search_time.observe(clock.perf_counter() - started)
+        except EngineUnavailableError:
+            raise Exception("Stockfish engine not available")
+        
+        if infos:
+            _record_search(infos[0])
+        analysis = _build_analysis(infos, depth)
+        await self.analysis_cache.put(board, analysis["depth"], multipv, analysis)
+        yield {"type": "result", **self._with_book_moves(analysis, board)}
+    
+    async def analyze_game(self, pgn: Optional[str] = None, fen: Optional[str] = None,
+                           moves: Optional[List[str]] = None, depth: int = 12,
+                           client: Optional[Hashable] = None) -> Dict:
+        """Analyze every position of a game or lesson line and classify each move.
+        
+        Uncached positions are split into contiguous runs, one per pool engine, so
+        each engine searches consecutive plies and keeps its hash table warm. Runs
+        are scheduled as batch work and share the batch deadline between their plies.
+        """
+        start, line = _parse_line(pgn, fen, moves)
+        depth = min(depth, settings.analysis_max_depth)
+        boards = [start]
+        for move in line:
+            board = boards[-1].copy(stack=False)
+            board.push(move)
+            boards.append(board)
+        
+        results: List[Optional[Dict]] = []
+        for board in boards:
+            if board.is_game_over():
+                results.append(_game_over_analysis(board))
+            else:
+                results.append(await self.analysis_cache.get(board, depth)
+                               or self.opening_book.book_analysis(board))
+        
+        book_moves = [move.uci() in {entry["move"] for entry in self.opening_book.lookup(board)}
+                      for board, move in zip(boards, line)]
+        for i, in_book in enumerate(book_moves):
+            if in_book:
+                continue
+            # A move that leaves the book is scored against engine evaluations on
+            # both sides of it, not against the book's result statistics
+            for j in (i, i + 1):
+                if results[j] is not None and results[j].get("book"):
+                    results[j] = None
+        
+        pending = [i for i, result in enumerate(results) if result is None]
+        runs = min(self.engine_pool.size, len(pending))
+        
+        async def analyze_run(indices: List[int]):
+            async with self.scheduler.acquire(BATCH, client) as (engine, remaining):
+                expires = clock.monotonic() + remaining if remaining is not None else None
+                # The same game token keeps python-chess from sending ucinewgame
+                game = object()
+                for n, i in enumerate(indices):
+                    share = (expires - clock.monotonic()) / (len(indices) - n) if expires is not None else None
+                    started = clock.perf_counter()
+                    infos = await engine.analyse(boards[i], engine_limit(depth, None, None, share), game=game)
+                    engine_search_time.observe(clock.perf_counter() - started)
+                    _record_search(infos)
+                    results[i] = _build_analysis([infos], depth)
+                    await self.analysis_cache.put(boards[i], results[i]["depth"], 1, results[i])
+        
+        try:
+            await asyncio.gather(*(analyze_run(pending[k * len(pending) // runs:(k + 1) * len(pending) // runs])
+                                   for k in range(runs)))
+        except EngineUnavailableError:
+            raise Exception("Stockfish engine not available")
+        
+        plies = []
+        for ply, move in enumerate(line, start=1):
+            before, after = boards[ply - 1], boards[ply]
+            loss = _white_cp(results[ply - 1], before) - _white_cp(results[ply], after)
+            if before.turn == chess.BLACK:
+                loss = -loss
+            best_move = results[ply - 1]["best_move"]
+            in_book = book_moves[ply - 1]
+            if best_move == move.uci() or in_book:
+                loss = 0
+            loss = max(loss, 0)
+            plies.append({
+                "ply": ply,
+                "move": before.san(move),
+                "fen": after.fen(),
+                "evaluation": results[ply]["evaluation"],
+                "mate_in": results[ply]["mate_in"],
+                "best_move": best_move,
+                "centipawn_loss": loss,
+                "classification": "book" if in_book else next(
+                    (label for threshold, label in MOVE_QUALITY_THRESHOLDS if loss >= threshold), None)
+            })
+        
+        return {
+            "starting_fen": start.fen(),
+            "initial_evaluation": results[0]["evaluation"],
+            "plies": plies
+        }
+    
+    @asynccontextmanager
+    async def _dedicated(self, engine_pool: EnginePool, priority: int, client: Optional[Hashable]):
+        # A caller-owned engine still searches in a scheduler slot, so it counts toward the per-core budget
+        async with self.scheduler.reserve(priority, client) as remaining:
+            async with engine_pool.acquire() as engine:
+                yield engine, remaining
+    
+    async def prewarm(self):
+        """Spawn the engine pool now rather than on the first analysis"""
+        await self.engine_pool.start()
+        health = await self.engine_pool.health_check()
+        if not health["alive"]:
+            raise EngineUnavailableError(f"Could not start engine '{self.engine_pool.path}'")
+    
+    async def close(self):
+        await self.engine_pool.close()
     
     def make_move(self, fen: str, move: str) -> Optional[str]:
+        result = self.play_move(fen, move)
+        return result["fen"] if result["valid"] else None
+    
+    def play_move(self, fen: str, move: str) -> Dict:
+        """Validate and apply a move, returning everything the board needs for the next one"""
+        entry = self.board_entry(fen)
+        if move not in entry.legal_set:
+            return {"valid": False, "san": None, **_position_summary(fen, entry)}
+        chess_move = chess.Move.from_uci(move)
+        san = entry.board.san(chess_move)
+        board = entry.board.copy(stack=False)
+        board.push(chess_move)
+        new_fen = board.fen()
+        # Prime the cache: the client's next request is about this position
+        return {"valid": True, "san": san, **_position_summary(new_fen, self.board_entry(new_fen))}
+
+def _record_search(info: chess.engine.InfoDict):
+    # Every MultiPV line reports the same search totals; count them once
+    if "nodes" in info:
+        engine_nodes.inc(info["nodes"])
+    if info.get("nps"):
+        engine_nps.observe(info["nps"])
+
+def _parse_board_entry(fen: str) -> BoardEntry:
+    board = chess.Board(fen)
+    legal_moves = tuple(move.uci() for move in board.legal_moves)
+    return BoardEntry(board, legal_moves, frozenset(legal_moves))
+
+def _position_summary(fen: str, entry: BoardEntry) -> Dict:
+    return {
+        "fen": fen,
+        "legal_moves": list(entry.legal_moves),
+        "is_check": entry.board.is_check(),
+        "is_game_over": not entry.legal_moves or entry.board.is_insufficient_material()
+    }
+
+def _parse_position(fen: str) -> chess.Board:
+    board = chess.Board(fen)
+    # Positions without kings and the like crash UCI engines
+    if not board.is_valid():
+        raise ValueError(f"Invalid position: {fen}")
+    return board
+
+def _parse_line(pgn: Optional[str], fen: Optional[str],
+                moves: Optional[List[str]]) -> Tuple[chess.Board, List[chess.Move]]:
+    if pgn:
+        game = chess.pgn.read_game(io.StringIO(pgn))
+        if game is None:
+            raise ValueError("No game found in PGN")
+        if game.errors:
+            raise ValueError(f"Invalid PGN: {game.errors[0]}")
+        return _parse_position(game.board().fen()), list(game.mainline_moves())
+    
+    board = _parse_position(fen or chess.STARTING_FEN)
+    start = board.copy(stack=False)
+    line = []
+    for move in moves or []:
         try:
-            board = chess.Board(fen)
-            chess_move = chess.Move.from_uci(move)
-            if chess_move in board.legal_moves:
-                board.push(chess_move)
-                return board.fen()
-            return None
-        except:
-            return None
\ No newline at end of file
+            parsed = board.parse_uci(move)
+        except ValueError:
+            parsed = board.parse_san(move)
+        board.push(parsed)
+        line.append(parsed)
+    return start, line
+
+def _game_over_analysis(board: chess.Board) -> Dict:
+    return {
+        "evaluation": 0,
+        "best_move": None,
+        "principal_variation": [],
+        "mate_in": 0 if board.is_checkmate() else None,
+        "depth": 0,
+        "lines": []
+    }
+
+def _white_cp(analysis: Dict, board: chess.Board) -> int:
+    mate_in = analysis["mate_in"]
+    if mate_in is None:
+        return max(-MATE_CP, min(MATE_CP, round(analysis["evaluation"] * 100)))
+    if mate_in == 0:
+        # Mate on the board: the side to move has been mated
+        return -MATE_CP if board.turn == chess.WHITE else MATE_CP
+    return MATE_CP if mate_in > 0 else -MATE_CP
+
+def _line_from_info(info: chess.engine.InfoDict) -> Dict:
+    # Scores are reported from White's point of view, in pawns
+    score = info["score"].white()
+    return {
+        "evaluation": score.score() / 100.0 if not score.is_mate() else 0,
+        "mate_in": score.mate(),
+        "principal_variation": [move.uci() for move in info.get("pv", [])]
+    }
+
+def _info_update(info: chess.engine.InfoDict) -> Dict:
+    return {
+        "type": "info",
+        "multipv": info.get("multipv", 1),
+        "depth": info.get("depth"),
+        "nodes": info.get("nodes"),
+        "nps": info.get("nps"),
+        **_line_from_info(info)
+    }
+
+def _build_analysis(infos: List[chess.engine.InfoDict], depth: int) -> Dict:
+    lines = [_line_from_info(info) for info in infos]
+    # A node or time budget may stop the search before the requested depth
+    reached_depth = min((info.get("depth", depth) for info in infos), default=depth)
+    best = lines[0] if lines else {"evaluation": 0, "mate_in": None, "principal_variation": []}
+    return {
+        "evaluation": best["evaluation"],
+        "best_move": best["principal_variation"][0] if best["principal_variation"] else None,
+        "principal_variation": best["principal_variation"],
+        "mate_in": best["mate_in"],
+        "depth": reached_depth,
+        "lines": lines
+    }
+
+def _limit_lines(analysis: Dict, multipv: int) -> Dict:
+    if len(analysis["lines"]) <= multipv:
+        return analysis
+    return {**analysis, "lines": analysis["lines"][:multipv]}
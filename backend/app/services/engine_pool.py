@@ -0,0 +1,143 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+import chess.engine
+from app.core.config import settings
+
+class EngineUnavailableError(Exception):
+    """Raised when no engine process can be started"""
+
+def default_pool_size() -> int:
+    """This worker's share of the machine: one engine per free core across all workers"""
+    cores = os.cpu_count() or 1
+    return max(1, cores // (max(settings.workers, 1) * max(settings.engine_threads, 1)))
+
+class _EngineSlot:
+    """One pool position; the engine inside may be replaced after a crash"""
+    def __init__(self, index: int):
+        self.index = index
+        self.engine: Optional[chess.engine.UciProtocol] = None
+        self.transport: Optional[asyncio.SubprocessTransport] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.engine is not None and not self.engine.returncode.done()
+
+class EnginePool:
+    """Fixed-size pool of UCI engine subprocesses driven through python-chess' asyncio API.
+
+    Engines are spawned lazily on first checkout so that importing the app never
+    blocks on a subprocess, and each checkout gets exclusive use of one process.
+    """
+    def __init__(self, path: Optional[str] = None, size: Optional[int] = None,
+                 options: Optional[Dict[str, int]] = None):
+        self.path = path or settings.stockfish_path or "stockfish"
+        self.size = size or settings.engine_pool_size or default_pool_size()
+        self.options = options if options is not None else {
+            "Threads": settings.engine_threads,
+            "Hash": settings.engine_hash_mb,
+        }
+        self.restarts = 0
+        self._slots: List[_EngineSlot] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        """Create the slots and spawn every engine concurrently"""
+        if self._idle is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            slots = [_EngineSlot(i) for i in range(self.size)]
+            # A failed spawn leaves the slot empty; it is retried on checkout
+            await asyncio.gather(*(self._spawn(slot) for slot in slots), return_exceptions=True)
+            idle: asyncio.Queue = asyncio.Queue()
+            for slot in slots:
+                idle.put_nowait(slot)
+            self._slots = slots
+            self._idle = idle
+
+    async def _spawn(self, slot: _EngineSlot):
+        transport, engine = await chess.engine.popen_uci(self.path)
+        try:
+            await engine.configure({
+                name: value for name, value in self.options.items() if name in engine.options
+            })
+        except Exception:
+            transport.close()
+            raise
+        slot.transport, slot.engine = transport, engine
+
+    async def _discard(self, slot: _EngineSlot):
+        engine, transport = slot.engine, slot.transport
+        slot.engine = slot.transport = None
+        if engine is None:
+            return
+        try:
+            await asyncio.wait_for(engine.quit(), settings.engine_health_timeout)
+        except Exception:
+            pass
+        finally:
+            transport.close()
+
+    async def _ensure_alive(self, slot: _EngineSlot) -> chess.engine.UciProtocol:
+        if slot.alive:
+            return slot.engine
+        await self._discard(slot)
+        try:
+            await self._spawn(slot)
+        except Exception as e:
+            raise EngineUnavailableError(f"Could not start engine '{self.path}': {e}") from e
+        self.restarts += 1
+        return slot.engine
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[chess.engine.UciProtocol]:
+        """Check out an engine for exclusive use and return it to the pool afterwards"""
+        await self.start()
+        slot = await self._idle.get()
+        try:
+            engine = await self._ensure_alive(slot)
+            try:
+                yield engine
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError, asyncio.TimeoutError):
+                # The process is in an unknown state; replace it on next checkout
+                await self._discard(slot)
+                raise
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def health_check(self) -> Dict[str, int]:
+        """Ping every idle engine and restart the ones that crashed or do not answer"""
+        if self._idle is None:
+            return {"size": self.size, "alive": 0, "restarts": self.restarts}
+        checked = []
+        while not self._idle.empty():
+            checked.append(self._idle.get_nowait())
+        try:
+            for slot in checked:
+                if slot.alive:
+                    try:
+                        await asyncio.wait_for(slot.engine.ping(), settings.engine_health_timeout)
+                        continue
+                    except Exception:
+                        await self._discard(slot)
+                try:
+                    await self._ensure_alive(slot)
+                except EngineUnavailableError:
+                    pass
+        finally:
+            for slot in checked:
+                self._idle.put_nowait(slot)
+        alive = sum(1 for slot in self._slots if slot.alive)
+        return {"size": self.size, "alive": alive, "restarts": self.restarts}
+
+    async def close(self):
+        """Quit all engine processes"""
+        await asyncio.gather(*(self._discard(slot) for slot in self._slots), return_exceptions=True)
+        self._slots = []
+        self._idle = None
@@ -1,72 +1,487 @@
+import asyncio
+import time
+import uuid
+from contextlib import aclosing
+import httpx
 import ollama
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Hashable, Tuple
+import chess
 from app.core.config import settings
+from app.services.response_cache import ResponseCache
+from app.services.position_index import PositionSearch, position_search
+from app.services.retrieval import RetrievalIndex, estimate_tokens, lesson_title, position_text, retrieval_index
+from app.services.structure import SYSTEM_NAMES, classify_board
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+from app.utils.ttl_cache import TTLCache
+
+EXPLAIN_POSITION_PROMPT = "Please explain this chess position, including the key strategic ideas and typical plans for both sides."
+# Short on purpose: grounding comes from the retrieved lesson notes, and every
+# token here is prefilled again for each question
+INSTRUCTOR_PROMPT = ("You are a chess instructor for the Stonewall Attack, Torre System and Colle System. "
+                     "Answer concisely for intermediate players, using the lesson notes when they are relevant.")
+GENERATION_OPTIONS = {
+    'temperature': 0.7,
+    'top_p': 0.9,
+    'num_predict': 500
+}
+
+time_to_first_token = metrics.histogram("ollama_time_to_first_token_seconds", "Model load plus prompt processing time")
+generation_time = metrics.histogram("ollama_generation_seconds", "Total time of an uncached generation")
+tokens_per_second = metrics.histogram("ollama_tokens_per_second", "Generation speed",
+                                      buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250))
+generations = metrics.counter("ollama_generations_total", "Generations by outcome", ("outcome",))
+# "turn" is single (a stateless question), first or follow_up (in a conversation)
+load_time = metrics.histogram("ollama_load_seconds", "Model load time reported by Ollama")
+prefill_time = metrics.histogram("ollama_prefill_seconds", "Prompt evaluation time reported by Ollama", ("turn",))
+prompt_eval_tokens = metrics.histogram("ollama_prompt_eval_tokens", "Prompt tokens evaluated rather than reused from the KV cache",
+                                       ("turn",), buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+
+class ConversationNotFoundError(Exception):
+    """Raised for unknown or expired conversation ids"""
+
+class Conversation:
+    """Follow-up questions about one position or opening system.
+    
+    Keeps the token context Ollama returned with the last answer. Sending it
+    back with the next question lets Ollama reuse the KV cache for everything
+    already said, so a follow-up only prefills the new question and whatever
+    lesson notes weren't sent before.
+    """
+    def __init__(self, opening_system: str, fen: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.opening_system = opening_system
+        self.fen = fen
+        self.context: Optional[List[int]] = None
+        self.notes: set = set()
+        self.turns = 0
+        # Each turn builds on the context of the previous one
+        self.lock = asyncio.Lock()
 
 class OllamaService:
-    def __init__(self):
-        self.client = ollama.Client(host=settings.ollama_url)
+    def __init__(self, retrieval: Optional[RetrievalIndex] = None, positions: Optional[PositionSearch] = None):
+        # Built on start() so that importing the app opens nothing
+        self.client: Optional[ollama.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
         self.model = settings.ollama_model
+        self.retrieval = retrieval or retrieval_index
+        self.positions = positions or position_search
+        self.available = False
+        self.response_cache = ResponseCache()
+        self.inflight = SingleFlight()
+        self.conversations = TTLCache(settings.ollama_conversation_max_count, settings.ollama_conversation_ttl)
+        self._health_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Run a first availability check, keep refreshing it in the background and load the model"""
+        if self.client is None:
+            # One pooled async HTTP client shared by every request; the connection
+            # pool is ours, so it can be closed without ollama.AsyncClient's help
+            self._transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=settings.ollama_max_connections,
+                                    max_keepalive_connections=settings.ollama_max_connections)
+            )
+            self.client = ollama.AsyncClient(
+                host=settings.ollama_url,
+                timeout=httpx.Timeout(settings.ollama_timeout, connect=settings.ollama_health_timeout),
+                transport=self._transport
+            )
+        await self.refresh_availability()
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+        if self.available and settings.ollama_preload:
+            await self.preload()
+    
+    async def preload(self):
+        """Load the model into memory now; a generate call with an empty prompt only loads it"""
+        try:
+            response = await self.client.generate(model=self.model, prompt="", keep_alive=settings.ollama_keep_alive)
+            if response.get('load_duration'):
+                load_time.observe(response['load_duration'] / 1e9)
+        except Exception as e:
+            print(f"Warning: could not preload Ollama model '{self.model}': {e}")
+    
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._transport is not None:
+            # ollama.AsyncClient has no close(); closing the transport drops its connections
+            await self._transport.aclose()
+            self._transport = None
+        self.client = None
+    
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(settings.ollama_health_interval)
+            await self.refresh_availability()
+    
+    async def refresh_availability(self) -> bool:
+        try:
+            await asyncio.wait_for(self.client.list(), settings.ollama_health_timeout)
+            self.available = True
+        except Exception:
+            self.available = False
+        return self.available
     
-    async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
+    async def generate_response(self, prompt: str, context: Optional[str] = None,
+                                fen: Optional[str] = None, opening_system: Optional[str] = None) -> str:
         """Generate a response using Ollama Python library"""
+        key = self._cache_key(prompt, context, fen, opening_system)
+        cached = await self.response_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Identical concurrent questions share one generation
+        return await self.inflight.do(key, lambda: self._generate(key, prompt, context, fen, opening_system))
+    
+    async def _generate(self, key: Tuple[Hashable, ...], prompt: str, context: Optional[str],
+                        fen: Optional[str], opening_system: Optional[str]) -> str:
+        started = time.perf_counter()
         try:
-            full_prompt = self._build_chess_prompt(prompt, context)
+            notes = await self._lesson_notes(prompt, fen, opening_system)
+            full_prompt = self._build_chess_prompt(prompt, _build_context(context, fen, opening_system), notes)
             
-            response = self.client.generate(
-                model=self.model,
-                prompt=full_prompt,
-                stream=False,
-                options={
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'num_predict': 500
-                }
-            )
+            response = await self._request(full_prompt, stream=False)
             
-            return response.get('response', "Sorry, I couldn't generate a response.")
-                
+            _record_generation(response, time.perf_counter() - started, "single")
+            if not response.get('response'):
+                generations.inc(labels=("empty",))
+                return "Sorry, I couldn't generate a response."
+            generations.inc(labels=("ok",))
+            await self.response_cache.set(key, response['response'])
+            return response['response']
+        
         except ollama.ResponseError as e:
+            generations.inc(labels=("error",))
             return f"Ollama error: {str(e)}"
+        except httpx.TransportError as e:
+            generations.inc(labels=("error",))
+            # Don't wait for the next health refresh to stop sending traffic
+            self.available = False
+            return f"An error occurred: {str(e)}"
         except Exception as e:
+            generations.inc(labels=("error",))
             return f"An error occurred: {str(e)}"
     
-    def _build_chess_prompt(self, user_question: str, context: Optional[str] = None) -> str:
-        """Build a chess-specific prompt for the AI"""
-        base_prompt = """You are a chess instructor specializing in opening systems, particularly the Stonewall Attack, Torre System, and Colle System. 
+    async def stream_response(self, prompt: str, context: Optional[str] = None,
+                              fen: Optional[str] = None,
+                              opening_system: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Yield ``{"token": ...}`` chunks as Ollama produces them, then a ``done`` summary.
         
-Your role is to:
-- Explain chess opening principles clearly
-- Analyze positions and suggest improvements
-- Answer questions about opening theory
-- Provide strategic advice for the three opening systems
-- Help students understand typical plans and piece placements
-
-Keep your responses concise but informative, suitable for intermediate chess players learning these opening systems.
-"""
+        Closing the generator closes the HTTP stream, which makes Ollama stop
+        generating, so abandoned requests don't keep the model busy.
+        """
+        started = time.perf_counter()
+        key = self._cache_key(prompt, context, fen, opening_system)
+        cached = await self.response_cache.get(key)
+        if cached is not None:
+            yield {"token": cached}
+            yield {"done": True, "cached": True, "time_to_first_token": time.perf_counter() - started}
+            return
+        
+        notes = await self._lesson_notes(prompt, fen, opening_system)
+        full_prompt = self._build_chess_prompt(prompt, _build_context(context, fen, opening_system), notes)
+        # Closing this generator must close the inner one, and with it the HTTP stream
+        async with aclosing(self._stream_generation(full_prompt, started, "single")) as updates:
+            async for update in updates:
+                if update.get("done"):
+                    text = update.pop("text")
+                    update.pop("context")
+                    if text:
+                        await self.response_cache.set(key, text)
+                yield update
+    
+    async def _stream_generation(self, prompt: str, started: float, turn: str,
+                                 context: Optional[List[int]] = None) -> AsyncIterator[Dict]:
+        """Tokens as Ollama produces them, then a ``done`` summary that also carries
+        the full ``text`` and the ``context`` Ollama returned, for the caller to strip"""
+        stream = await self._request(prompt, stream=True, context=context)
+        
+        tokens = []
+        first_token_at = None
+        final: Dict[str, Any] = {}
+        try:
+            async for chunk in stream:
+                if chunk.get('response'):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens.append(chunk['response'])
+                    yield {"token": chunk['response']}
+                if chunk.get('done'):
+                    # The last chunk has Ollama's timings and the conversation context
+                    final = chunk
+        except httpx.TransportError:
+            self.available = False
+            raise
+        finally:
+            await stream.aclose()
+        
+        finished = time.perf_counter()
+        generations.inc(labels=("ok" if tokens else "empty",))
+        generation_time.observe(finished - started)
+        _record_timings(final, turn)
+        if first_token_at is not None:
+            time_to_first_token.observe(first_token_at - started)
+            if finished > first_token_at:
+                tokens_per_second.observe(len(tokens) / (finished - first_token_at))
+        yield {
+            "done": True,
+            "cached": False,
+            "time_to_first_token": (first_token_at or finished) - started,
+            "total_time": finished - started,
+            "tokens": len(tokens),
+            "tokens_per_second": len(tokens) / (finished - first_token_at) if first_token_at and finished > first_token_at else None,
+            **_timings(final),
+            "text": "".join(tokens),
+            "context": final.get('context')
+        }
+    
+    def _request(self, prompt: str, stream: bool, context: Optional[List[int]] = None):
+        return self.client.generate(
+            model=self.model,
+            prompt=prompt,
+            context=context,
+            stream=stream,
+            # Unloading between questions would make the next one reload the model
+            keep_alive=settings.ollama_keep_alive,
+            options=GENERATION_OPTIONS
+        )
+    
+    def _cache_key(self, prompt: str, context: Optional[str], fen: Optional[str],
+                   opening_system: Optional[str]) -> Tuple[Hashable, ...]:
+        return (
+            self.model,
+            _normalize_text(prompt),
+            _normalize_text(context or ""),
+            # Move counters don't change what there is to explain about a position
+            " ".join(fen.split()[:4]) if fen else None,
+            (opening_system or "").lower()
+        )
+    
+    async def _lesson_notes(self, prompt: str, fen: Optional[str], opening_system: Optional[str]) -> List[str]:
+        """Lesson snippets relevant to the question, within the prompt token budget.
         
+        With a position, the comments of the nearest lesson positions come first:
+        what the lessons already say about an almost identical position beats
+        text that merely shares words with the question.
+        """
+        system, query = _system_and_query(prompt, fen, opening_system)
+        try:
+            if self.retrieval.stale:
+                await asyncio.to_thread(self.retrieval.refresh)
+            notes = await self._similar_position_notes(fen) if fen else []
+            budget = settings.retrieval_token_budget - sum(estimate_tokens(note) for note in notes)
+            return notes + [
+                note for note in self.retrieval.context(query, system, token_budget=max(budget, 0))
+                if not any(note in similar for similar in notes)
+            ]
+        except Exception as e:
+            # Answering without notes beats not answering
+            print(f"Warning: lesson retrieval failed: {e}")
+            return []
+    
+    async def _similar_position_notes(self, fen: str, limit: int = 2) -> List[str]:
+        try:
+            board = chess.Board(fen)
+        except ValueError:
+            return []
+        if self.positions.stale:
+            await asyncio.to_thread(self.positions.refresh)
+        notes = []
+        for neighbour in self.positions.similar(board, k=8, max_distance=settings.position_search_max_distance):
+            lesson = neighbour["lesson"]
+            if lesson is None or not lesson["comment"]:
+                continue
+            title = lesson_title(lesson["title"], lesson["system"], lesson["lesson"])
+            prefix = "This lesson position" if neighbour["distance"] == 0 else "A similar lesson position"
+            notes.append(f"{prefix}: {position_text(title, lesson)}")
+            if len(notes) == limit:
+                break
+        return notes
+    
+    def _build_chess_prompt(self, user_question: str, context: Optional[str] = None,
+                            notes: Optional[List[str]] = None) -> str:
+        """Build a chess-specific prompt for the AI"""
+        # The instructions come first and never change, so Ollama can reuse their
+        # KV cache from the previous request even for unrelated questions
+        parts = [INSTRUCTOR_PROMPT]
+        if notes:
+            parts.append(_format_notes(notes))
         if context:
-            full_prompt = f"{base_prompt}\n\nContext: {context}\n\nQuestion: {user_question}\n\nResponse:"
-        else:
-            full_prompt = f"{base_prompt}\n\nQuestion: {user_question}\n\nResponse:"
+            parts.append(f"Context: {context}")
+        parts.append(f"Question: {user_question}")
+        parts.append("Response:")
+        return "\n\n".join(parts)
+    
+    def _build_follow_up_prompt(self, user_question: str, notes: Optional[List[str]] = None) -> str:
+        """Only what's new in a conversation; the rest is in the context Ollama returned"""
+        parts = [_format_notes(notes)] if notes else []
+        parts.append(f"Question: {user_question}")
+        parts.append("Response:")
+        return "\n\n".join(parts)
+    
+    def start_conversation(self, opening_system: str, fen: Optional[str] = None) -> Conversation:
+        conversation = Conversation(opening_system, fen)
+        self.conversations.set(conversation.id, conversation)
+        return conversation
+    
+    def get_conversation(self, conversation_id: str) -> Conversation:
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            raise ConversationNotFoundError(f"Conversation '{conversation_id}' not found")
+        return conversation
+    
+    def end_conversation(self, conversation_id: str):
+        if self.conversations.pop(conversation_id) is None:
+            raise ConversationNotFoundError(f"Conversation '{conversation_id}' not found")
+    
+    async def ask_in_conversation(self, conversation_id: str, question: str) -> Dict:
+        """Answer the next question of a conversation, continuing from Ollama's returned context.
         
-        return full_prompt
+        Conversation turns skip the response cache: the answer depends on
+        everything said before, not just the question.
+        """
+        conversation = self.get_conversation(conversation_id)
+        async with conversation.lock:
+            started = time.perf_counter()
+            prompt, notes, turn = await self._conversation_turn(conversation, question)
+            try:
+                response = await self._request(prompt, stream=False, context=conversation.context)
+            except httpx.TransportError:
+                generations.inc(labels=("error",))
+                self.available = False
+                raise
+            except Exception:
+                generations.inc(labels=("error",))
+                raise
+            
+            elapsed = time.perf_counter() - started
+            _record_generation(response, elapsed, turn)
+            generations.inc(labels=("ok" if response.get('response') else "empty",))
+            self._advance(conversation, response.get('context'), notes)
+            return {
+                "conversation_id": conversation.id,
+                "turn": conversation.turns,
+                "response": response.get('response') or "Sorry, I couldn't generate a response.",
+                "timings": {**_timings(response), "total_time": elapsed, "tokens": response.get('eval_count')}
+            }
+    
+    async def stream_in_conversation(self, conversation_id: str, question: str) -> AsyncIterator[Dict]:
+        """Streaming variant of ask_in_conversation"""
+        conversation = self.get_conversation(conversation_id)
+        async with conversation.lock:
+            started = time.perf_counter()
+            prompt, notes, turn = await self._conversation_turn(conversation, question)
+            async with aclosing(self._stream_generation(prompt, started, turn, conversation.context)) as updates:
+                async for update in updates:
+                    if update.get("done"):
+                        update.pop("text")
+                        self._advance(conversation, update.pop("context"), notes)
+                        update.update(conversation_id=conversation.id, turn=conversation.turns)
+                    yield update
+    
+    async def _conversation_turn(self, conversation: Conversation, question: str) -> Tuple[str, List[str], str]:
+        """The prompt for the next turn, the lesson notes it adds and the turn label"""
+        notes = [note for note in await self._lesson_notes(question, conversation.fen, conversation.opening_system)
+                 if note not in conversation.notes]
+        if conversation.context is None:
+            context = _build_context(None, conversation.fen, conversation.opening_system)
+            return self._build_chess_prompt(question, context, notes), notes, "first"
+        return self._build_follow_up_prompt(question, notes), notes, "follow_up"
+    
+    def _advance(self, conversation: Conversation, context: Optional[List[int]], notes: List[str]):
+        conversation.turns += 1
+        if context and len(context) <= settings.ollama_conversation_max_context:
+            conversation.context = list(context)
+            conversation.notes.update(notes)
+        else:
+            # Past the model's context window Ollama would silently drop the
+            # oldest tokens, instructions included; start over with the preamble
+            conversation.context = None
+            conversation.notes.clear()
+        # Re-inserting restarts the idle timeout
+        self.conversations.set(conversation.id, conversation)
     
     async def explain_position(self, fen: str, opening_system: str) -> str:
         """Generate an explanation for a specific chess position"""
-        context = f"Chess position (FEN): {fen}\nOpening system: {opening_system}"
-        prompt = "Please explain this chess position, including the key strategic ideas and typical plans for both sides."
-        
-        return await self.generate_response(prompt, context)
+        return await self.generate_response(EXPLAIN_POSITION_PROMPT, fen=fen, opening_system=opening_system)
     
     async def answer_opening_question(self, question: str, opening_system: str) -> str:
         """Answer a specific question about an opening system"""
-        context = f"Opening system: {opening_system}"
-        return await self.generate_response(question, context)
+        return await self.generate_response(question, opening_system=opening_system)
+    
+    def stream_position_explanation(self, fen: str, opening_system: str) -> AsyncIterator[Dict]:
+        """Streaming variant of explain_position"""
+        return self.stream_response(EXPLAIN_POSITION_PROMPT, fen=fen, opening_system=opening_system)
+    
+    def stream_opening_answer(self, question: str, opening_system: str) -> AsyncIterator[Dict]:
+        """Streaming variant of answer_opening_question"""
+        return self.stream_response(question, opening_system=opening_system)
     
     def is_available(self) -> bool:
-        """Check if Ollama service is available"""
+        """Last result of the background availability check"""
+        return self.available
+
+def _build_context(context: Optional[str], fen: Optional[str], opening_system: Optional[str]) -> Optional[str]:
+    parts = []
+    if fen:
+        parts.append(f"Chess position (FEN): {fen}")
+    if opening_system:
+        parts.append(f"Opening system: {opening_system}")
+    if context:
+        parts.append(context)
+    return "\n".join(parts) or None
+
+def _system_and_query(prompt: str, fen: Optional[str], opening_system: Optional[str]) -> Tuple[Optional[str], str]:
+    """The system to draw notes from and the text to search with"""
+    requested = (opening_system or "").lower()
+    system = next((name for name in SYSTEM_NAMES if name and name in requested), None)
+    query = [prompt, requested]
+    if fen:
         try:
-            self.client.list()
-            return True
-        except:
-            return False
\ No newline at end of file
+            # The structure on the board says more than a generic "explain this position"
+            structure = classify_board(chess.Board(fen))
+        except ValueError:
+            structure = {"system": None, "deviations": []}
+        system = system or structure["system"]
+        query += [structure["system"] or "", *(name.replace("_", " ") for name in structure["deviations"])]
+    return system, " ".join(query)
+
+def _format_notes(notes: List[str]) -> str:
+    return "Lesson notes:\n" + "\n".join(f"- {note}" for note in notes)
+
+def _timings(response: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Ollama's own timings of a finished generation, in seconds"""
+    def seconds(field: str) -> Optional[float]:
+        value = response.get(field)
+        return value / 1e9 if value is not None else None
+    
+    return {
+        "load_time": seconds('load_duration'),
+        "prefill_time": seconds('prompt_eval_duration'),
+        "prompt_tokens": response.get('prompt_eval_count'),
+        "generation_time": seconds('eval_duration')
+    }
+
+def _record_timings(response: Dict[str, Any], turn: str):
+    # Durations are in nanoseconds; a prompt served entirely from the KV cache has no eval count
+    if response.get('load_duration'):
+        load_time.observe(response['load_duration'] / 1e9)
+    if response.get('prompt_eval_duration'):
+        prefill_time.observe(response['prompt_eval_duration'] / 1e9, (turn,))
+    if response.get('prompt_eval_count') is not None:
+        prompt_eval_tokens.observe(response['prompt_eval_count'], (turn,))
+
+def _record_generation(response: Dict[str, Any], elapsed: float, turn: str):
+    # Non-streaming responses carry Ollama's own timings, in nanoseconds
+    generation_time.observe(elapsed)
+    _record_timings(response, turn)
+    prefill = (response.get('load_duration') or 0) + (response.get('prompt_eval_duration') or 0)
+    if prefill:
+        time_to_first_token.observe(prefill / 1e9)
+    if response.get('eval_count') and response.get('eval_duration'):
+        tokens_per_second.observe(response['eval_count'] / (response['eval_duration'] / 1e9))
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
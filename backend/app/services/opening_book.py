@@ -0,0 +1,149 @@
+import math
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import chess
+import chess.pgn
+import chess.polyglot
+from app.core.config import settings
+
+DEFAULT_BOOK_PATH = Path(__file__).resolve().parent.parent / "data" / "repertoire.pgn"
+
+class BookMove(NamedTuple):
+    move: str  # UCI; Polyglot castling is stored king-takes-rook and normalized on lookup
+    weight: int
+    white_wins: int = 0
+    draws: int = 0
+    black_wins: int = 0
+    systems: Tuple[str, ...] = ()  # Slugs of the repertoire lines playing this move (PGN ``System`` tag)
+
+class OpeningBook:
+    """In-memory opening book: Zobrist hash -> book moves with weights and results.
+
+    Loaded once from a PGN repertoire (every variation counts) or a Polyglot
+    ``.bin`` file, after which lookups are a single dict access. PGN games with
+    a ``System`` header tag their moves with that system's slug.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.opening_book_path or str(DEFAULT_BOOK_PATH)
+        self._index: Dict[int, List[BookMove]] = {}
+        self.systems: Set[str] = set()  # Systems whose lines are tagged in the book
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def load(self):
+        """(Re)build the index from the configured book file"""
+        if self.path.endswith(".bin"):
+            self._index = _load_polyglot(self.path)
+        else:
+            self._index = _load_pgn(self.path)
+        self.systems = {system for entries in self._index.values() for entry in entries for system in entry.systems}
+
+    def lookup(self, board: chess.Board) -> List[Dict]:
+        """Book moves for the position, most played first"""
+        entries = self._index.get(chess.polyglot.zobrist_hash(board))
+        if not entries:
+            return []
+        moves = []
+        for entry in entries:
+            try:
+                move = board.parse_uci(entry.move)
+            except ValueError:
+                # Hash collision or an entry for a different position
+                continue
+            moves.append({
+                "move": move.uci(),
+                "san": board.san(move),
+                "weight": entry.weight,
+                "games": entry.white_wins + entry.draws + entry.black_wins,
+                "white_wins": entry.white_wins,
+                "draws": entry.draws,
+                "black_wins": entry.black_wins,
+                "systems": list(entry.systems)
+            })
+        return moves
+
+    def book_analysis(self, board: chess.Board, multipv: int = 1) -> Optional[Dict]:
+        """Analysis-shaped answer for a book position, or None when the book can't give one.
+        
+        The evaluation comes from game results, so positions whose top ``multipv``
+        moves have none (a ``Result "*"`` repertoire, a weights-only Polyglot book)
+        or that have fewer book moves than lines requested are left to the engine.
+        """
+        moves = self.lookup(board)
+        if len(moves) < multipv or not all(entry["games"] for entry in moves[:multipv]):
+            return None
+        lines = []
+        for entry in moves[:multipv]:
+            line = [entry["move"]]
+            walk = board.copy(stack=False)
+            walk.push_uci(entry["move"])
+            # Follow the most played continuation while it stays in book
+            while len(line) < 12:
+                continuation = self.lookup(walk)
+                if not continuation:
+                    break
+                line.append(continuation[0]["move"])
+                walk.push_uci(continuation[0]["move"])
+            lines.append({
+                "evaluation": _expected_score_to_pawns(entry),
+                "mate_in": None,
+                "principal_variation": line
+            })
+        return {
+            "evaluation": lines[0]["evaluation"],
+            "best_move": lines[0]["principal_variation"][0],
+            "principal_variation": lines[0]["principal_variation"],
+            "mate_in": None,
+            "depth": 0,
+            "lines": lines,
+            "book": True
+        }
+
+def _expected_score_to_pawns(entry: Dict) -> float:
+    # Logistic inverse of White's expected score
+    score = (entry["white_wins"] + entry["draws"] / 2) / entry["games"]
+    score = min(max(score, 0.01), 0.99)
+    return round(-4 * math.log10(1 / score - 1), 2)
+
+def _load_pgn(path: str) -> Dict[int, List[BookMove]]:
+    counts: Dict[int, Dict[str, list]] = {}
+    with open(path) as pgn:
+        while True:
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                break
+            result = game.headers.get("Result", "*")
+            outcome = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}.get(result)
+            system = game.headers.get("System")
+            nodes = [game]
+            while nodes:
+                node = nodes.pop()
+                if not node.variations:
+                    continue
+                board = node.board()
+                moves = counts.setdefault(chess.polyglot.zobrist_hash(board), {})
+                for child in node.variations:
+                    stats = moves.setdefault(child.move.uci(), [0, 0, 0, 0, set()])
+                    stats[0] += 1
+                    if outcome is not None:
+                        stats[outcome + 1] += 1
+                    if system:
+                        stats[4].add(system.lower())
+                    nodes.append(child)
+    return {
+        key: sorted((BookMove(move, *stats[:4], tuple(sorted(stats[4]))) for move, stats in moves.items()),
+                    key=lambda entry: entry.weight, reverse=True)
+        for key, moves in counts.items()
+    }
+
+def _load_polyglot(path: str) -> Dict[int, List[BookMove]]:
+    index: Dict[int, List[BookMove]] = {}
+    with chess.polyglot.open_reader(path) as reader:
+        for entry in reader:
+            index.setdefault(entry.key, []).append(BookMove(entry.move.uci(), entry.weight))
+    for entries in index.values():
+        entries.sort(key=lambda entry: entry.weight, reverse=True)
+    return index
+
+opening_book = OpeningBook()
@@ -1,74 +1,186 @@
+import threading
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import chess
+from app.models.explorer import ExplorerMove
+from app.models.opening import CatalogVersion, Lesson, LessonPosition, System
+from app.services.analysis_cache import _to_signed, position_key
+
+class CatalogCache:
+    """Process-wide read cache for the lesson catalog.
+
+    Every write bumps ``version``; entries remember the version they were read
+    at, so a stale entry is simply reloaded on the next request. Writes also
+    bump the database's catalog version row, and ``sync`` (run periodically by
+    each worker) invalidates the cache when another process has changed it.
+    """
+    def __init__(self):
+        self.version = 0
+        self.stored_version: Optional[int] = None  # Database catalog version this cache reflects
+        self._entries: Dict[Hashable, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """The current entry for ``key``, or None; never loads"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == self.version:
+            return entry[1]
+        return None
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == self.version:
+            return entry[1]
+        version = self.version
+        value = load()
+        self._entries[key] = (version, value)
+        return value
+
+    def invalidate(self, stored_version: Optional[int] = None):
+        with self._lock:
+            self.version += 1
+            self._entries = {}
+            self.stored_version = stored_version
+
+    def sync(self, db: Session):
+        """Invalidate if the database's catalog version moved since this cache last saw it"""
+        row = db.get(CatalogVersion, 1)
+        stored = row.version if row is not None else 0
+        if stored != self.stored_version:
+            self.invalidate(stored)
+
+def bump_catalog_version(db: Session) -> int:
+    """Increment the catalog version row in ``db``'s transaction; returns the new version"""
+    row = db.get(CatalogVersion, 1)
+    if row is None:
+        row = CatalogVersion(id=1, version=0)
+        db.add(row)
+    row.version += 1
+    return row.version
+
+catalog_cache = CatalogCache()
 
 class OpeningService:
     def __init__(self, db: Session):
         self.db = db
-    
+
+    def get_systems(self) -> List[Dict]:
+        return catalog_cache.get("systems", self._load_systems)
+
     def get_lessons_for_system(self, system: str) -> List[Dict]:
-        # For now, return hardcoded lessons. Later we'll store these in the database
-        lessons_data = {
-            "stonewall": [
-                {
-                    "id": 1,
-                    "title": "Basic Stonewall Formation",
-                    "description": "Learn the fundamental pawn structure",
-                    "starting_fen": "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1",
-                    "key_moves": ["d4", "e3", "f4", "c3"],
-                    "objectives": [
-                        "Establish the pawn chain d4-e3-f4-c3",
-                        "Develop pieces to support the structure",
-                        "Understand typical attacking plans"
-                    ]
-                },
-                {
-                    "id": 2,
-                    "title": "Piece Development in Stonewall",
-                    "description": "Optimal piece placement",
-                    "starting_fen": "rnbqkbnr/pppppppp/8/8/3PP3/5P2/PPP3PP/RNBQKBNR b KQkq - 0 2",
-                    "key_moves": ["Bd3", "Nf3", "Nd2"],
-                    "objectives": [
-                        "Place bishop on d3 for kingside attack",
-                        "Develop knight to f3 for central control",
-                        "Use Nd2 to support the center"
-                    ]
-                }
-            ],
-            "torre": [
-                {
-                    "id": 1,
-                    "title": "Torre Attack Setup",
-                    "description": "Basic Torre system formation",
-                    "starting_fen": "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1",
-                    "key_moves": ["d4", "Nf3", "Bg5", "e3"],
-                    "objectives": [
-                        "Control the center with d4",
-                        "Develop knight to f3",
-                        "Pin opponent's knight with Bg5"
-                    ]
-                }
-            ],
-            "colle": [
-                {
-                    "id": 1,
-                    "title": "Colle System Foundation",
-                    "description": "Solid central setup",
-                    "starting_fen": "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1",
-                    "key_moves": ["d4", "Nf3", "e3", "Bd3", "Nbd2"],
-                    "objectives": [
-                        "Establish solid central control",
-                        "Develop pieces harmoniously",
-                        "Prepare for central breakthrough"
-                    ]
-                }
-            ]
-        }
-        
-        return lessons_data.get(system.lower(), [])
-    
+        slug = system.lower()
+        return catalog_cache.get(("lessons", slug), lambda: self._load_lessons(slug))
+
+    def get_all_lessons(self) -> List[Dict]:
+        """Every lesson of every system, each tagged with its system slug"""
+        return catalog_cache.get("all_lessons", self._load_all_lessons)
+
     def get_lesson_details(self, system: str, lesson_id: int) -> Optional[Dict]:
-        lessons = self.get_lessons_for_system(system)
-        for lesson in lessons:
-            if lesson["id"] == lesson_id:
-                return lesson
-        return None
\ No newline at end of file
+        slug = system.lower()
+        by_id = catalog_cache.get(
+            ("lessons_by_id", slug),
+            lambda: {lesson["id"]: lesson for lesson in self.get_lessons_for_system(slug)}
+        )
+        return by_id.get(lesson_id)
+
+    def get_lesson_positions(self, system: str, lesson_id: int) -> List[Dict]:
+        slug = system.lower()
+        return catalog_cache.get(("positions", slug, lesson_id),
+                                 lambda: self._load_positions(slug, lesson_id))
+
+    def get_explorer_moves(self, board: chess.Board, limit: int = 20) -> List[Dict]:
+        """Master-game statistics for the moves played from a position, most played first"""
+        rows = (
+            self.db.query(ExplorerMove)
+            .filter(ExplorerMove.position_hash == _to_signed(position_key(board)))
+            .order_by(ExplorerMove.games.desc())
+            .limit(limit)
+        )
+        return [
+            {
+                "move": row.move,
+                "san": board.san(chess.Move.from_uci(row.move)),
+                "system": row.system,
+                "games": row.games,
+                "white_wins": row.white_wins,
+                "draws": row.draws,
+                "black_wins": row.black_wins,
+                "average_rating": round(row.rating_sum / row.rated_games) if row.rated_games else None
+            }
+            for row in rows
+        ]
+
+    def add_system(self, slug: str, name: str, description: str, key_moves: List[str],
+                   starting_fen: str) -> System:
+        system = System(slug=slug.lower(), name=name, description=description,
+                        key_moves=key_moves, starting_fen=starting_fen)
+        self.db.add(system)
+        self._commit()
+        return system
+
+    def add_lesson(self, system: str, lesson_id: int, title: str, description: str,
+                   starting_fen: str, key_moves: List[str], objectives: List[str]) -> Lesson:
+        owner = self.db.query(System).filter(System.slug == system.lower()).one()
+        lesson = Lesson(system=owner, lesson_number=lesson_id, title=title, description=description,
+                        starting_fen=starting_fen, key_moves=key_moves, objectives=objectives)
+        # Every lesson starts with its own position annotated
+        lesson.positions.append(LessonPosition(ply=0, fen=starting_fen, comment=description))
+        self.db.add(lesson)
+        self._commit()
+        return lesson
+
+    def _commit(self):
+        version = bump_catalog_version(self.db)
+        self.db.commit()
+        catalog_cache.invalidate(version)
+
+    def _load_systems(self) -> List[Dict]:
+        return [
+            {
+                "name": system.name,
+                "description": system.description,
+                "key_moves": system.key_moves,
+                "starting_fen": system.starting_fen
+            }
+            for system in self.db.query(System).order_by(System.id)
+        ]
+
+    def _load_lessons(self, slug: str) -> List[Dict]:
+        lessons = (
+            self.db.query(Lesson)
+            .join(System)
+            .filter(System.slug == slug)
+            .order_by(Lesson.lesson_number)
+        )
+        return [
+            {
+                "id": lesson.lesson_number,
+                "title": lesson.title,
+                "description": lesson.description,
+                "starting_fen": lesson.starting_fen,
+                "key_moves": lesson.key_moves,
+                "objectives": lesson.objectives
+            }
+            for lesson in lessons
+        ]
+
+    def _load_all_lessons(self) -> List[Dict]:
+        slugs = [slug for (slug,) in self.db.query(System.slug).order_by(System.id)]
+        return [
+            {"system": slug, **lesson}
+            for slug in slugs
+            for lesson in self.get_lessons_for_system(slug)
+        ]
+
+    def _load_positions(self, slug: str, lesson_id: int) -> List[Dict]:
+        positions = (
+            self.db.query(LessonPosition)
+            .join(Lesson)
+            .join(System)
+            .filter(System.slug == slug, Lesson.lesson_number == lesson_id)
+            .order_by(LessonPosition.ply)
+        )
+        return [
+            {"ply": position.ply, "fen": position.fen, "move": position.move, "comment": position.comment}
+            for position in positions
+        ]
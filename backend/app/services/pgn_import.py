@@ -0,0 +1,267 @@
+import io
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import chess
+import chess.pgn
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.explorer import ExplorerMove, PgnImport, PgnImportChunk
+from app.services.analysis_cache import _to_signed, position_key
+from app.services.structure import NONE, SYSTEM_NAMES, board_planes, classify_array
+
+GAME_START = b"[Event "
+RESULTS = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+COUNTERS = ("games", "white_wins", "draws", "black_wins", "rating_sum", "rated_games")
+
+# (position hash, UCI move) -> [system, games, white wins, draws, black wins, rating sum, rated games]
+ChunkStats = Dict[Tuple[int, str], List[int]]
+
+def find_chunks(path: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split a PGN file into ``(start, end)`` byte ranges that each begin at a game.
+
+    Only the bytes around each boundary are read, so this is cheap even for
+    multi-GB files. A game is assumed to start with its ``[Event`` tag.
+    """
+    size = os.path.getsize(path)
+    chunks = []
+    start = 0
+    with open(path, "rb") as f:
+        while start < size:
+            f.seek(start + chunk_size)
+            if start + chunk_size < size:
+                f.readline()  # Skip the partial line we landed in
+            end = size
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if line.startswith(GAME_START):
+                    end = offset
+                    break
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def _rating(headers: Dict[str, str], tag: str) -> Optional[int]:
+    try:
+        return int(headers.get(tag, ""))
+    except ValueError:
+        return None
+
+class _OpeningVisitor(chess.pgn.BaseVisitor):
+    """Keeps the headers and the first plies of the mainline; skips everything else unparsed"""
+    def __init__(self, max_plies: int, min_rating: int):
+        self.max_plies = max_plies
+        self.min_rating = min_rating
+        self.headers: Dict[str, str] = {}
+        self.moves: List[chess.Move] = []
+        self.planes: List[Tuple[int, ...]] = []  # Bitboards after each kept move
+        self.skipped = False
+
+    def visit_header(self, tagname: str, tagvalue: str):
+        self.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        # Variants and set-up positions can't reach the systems from the normal start
+        ratings = (_rating(self.headers, "WhiteElo"), _rating(self.headers, "BlackElo"))
+        if ("FEN" in self.headers or "Variant" in self.headers
+                or self.headers.get("Result") not in RESULTS
+                or (self.min_rating and not all(rating and rating >= self.min_rating for rating in ratings))):
+            self.skipped = True
+            return chess.pgn.SKIP
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def begin_parse_san(self, board: chess.Board, san: str):
+        if len(board.move_stack) >= self.max_plies:
+            return chess.pgn.SKIP
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        self.moves.append(move)
+
+    def visit_board(self, board: chess.Board):
+        # Also called for skipped tokens, so only record boards a kept move led to
+        if len(self.planes) < len(self.moves):
+            self.planes.append(board_planes(board))
+
+    def handle_error(self, error: Exception):
+        # Keep the plies before the bad move; the parser skips the rest of the game
+        pass
+
+    def result(self) -> "_OpeningVisitor":
+        return self
+
+def matched_games(path: str, start: int, end: int, max_plies: int,
+                  min_rating: int = 0) -> Tuple[List[Tuple[_OpeningVisitor, int]], int]:
+    """Parse one byte range of a PGN file; returns ``([(game, system), ...], games read)``.
+
+    Every position is classified in one NumPy batch per chunk, and only the
+    games that reach a system within ``max_plies`` are returned.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        handle = io.StringIO(f.read(end - start).decode("utf-8", errors="replace"))
+
+    games: List[_OpeningVisitor] = []
+    planes: List[Tuple[int, ...]] = []
+    bounds: List[Tuple[int, int]] = []
+    read = 0
+    while True:
+        game = chess.pgn.read_game(handle, Visitor=lambda: _OpeningVisitor(max_plies, min_rating))
+        if game is None:
+            break
+        read += 1
+        if game.skipped or not game.moves:
+            continue
+        first = len(planes)
+        planes.extend(game.planes)
+        games.append(game)
+        bounds.append((first, len(planes)))
+
+    if not planes:
+        return [], read
+    systems, _ = classify_array(np.array(planes, dtype=np.uint64))
+    matched = []
+    for game, (first, last) in zip(games, bounds):
+        reached = systems[first:last]
+        reached = reached[reached != NONE]
+        if len(reached):
+            # The structure a game settles into, not whatever it passed through on the way
+            matched.append((game, int(reached[-1])))
+    return matched, read
+
+def process_chunk(path: str, start: int, end: int, max_plies: int, min_rating: int = 0) -> Tuple[ChunkStats, int, int]:
+    """Parse one byte range of a PGN file; returns ``(stats, games read, games that reached a system)``.
+
+    Runs in a worker process. Only games that reach a system are replayed to
+    hash their positions.
+    """
+    games, read = matched_games(path, start, end, max_plies, min_rating)
+    stats: ChunkStats = {}
+    for game, system in games:
+        outcome = RESULTS[game.headers["Result"]]
+        ratings = (_rating(game.headers, "WhiteElo"), _rating(game.headers, "BlackElo"))
+        rated = all(ratings)
+        rating = (ratings[0] + ratings[1]) // 2 if rated else 0
+        board = chess.Board()
+        for move in game.moves:
+            key = (position_key(board), move.uci())
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = [system, 0, 0, 0, 0, 0, 0]
+            entry[1] += 1
+            entry[2 + outcome] += 1
+            entry[5] += rating
+            entry[6] += rated
+            board.push(move)
+    return stats, read, len(games)
+
+def _upsert(db: Session):
+    """``INSERT ... ON CONFLICT`` that adds a chunk's counts to the stored ones"""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(ExplorerMove)
+    return statement.on_conflict_do_update(
+        index_elements=[ExplorerMove.position_hash, ExplorerMove.move],
+        set_={column: getattr(ExplorerMove, column) + getattr(statement.excluded, column) for column in COUNTERS}
+    )
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class PgnImporter:
+    """Streams a PGN file through a process pool into ``explorer_moves``.
+
+    The file is cut into chunks at game boundaries; each worker parses one chunk
+    and returns aggregated per-move statistics, so memory is bounded by the
+    chunk size times the number of chunks in flight, not by the file. Every
+    chunk's statistics are merged with a bulk upsert in the same transaction
+    that marks it done, so an interrupted import resumes by skipping the chunks
+    already recorded for the same file, chunk size and filters.
+    """
+    def __init__(self, db: Session, workers: Optional[int] = None, chunk_mb: Optional[int] = None,
+                 max_plies: Optional[int] = None, min_rating: int = 0):
+        self.db = db
+        self.workers = workers or settings.pgn_import_workers or os.cpu_count() or 1
+        self.chunk_size = (chunk_mb or settings.pgn_import_chunk_mb) * 1024 * 1024
+        self.max_plies = max_plies or settings.pgn_import_max_plies
+        self.min_rating = min_rating
+        self.games = 0
+        self.matched = 0
+        self.rows = 0
+
+    def _import_record(self, path: str, chunks: int) -> PgnImport:
+        stat = os.stat(path)
+        key = dict(path=path, size=stat.st_size, mtime=int(stat.st_mtime), chunk_size=self.chunk_size,
+                   max_plies=self.max_plies, min_rating=self.min_rating)
+        record = self.db.query(PgnImport).filter_by(**key).one_or_none()
+        if record is None:
+            record = PgnImport(**key, chunks=chunks, started_at=_utcnow())
+            self.db.add(record)
+            self.db.commit()
+        return record
+
+    def _merge(self, record: PgnImport, offset: int, stats: ChunkStats, games: int, matched: int):
+        rows = [
+            {"position_hash": _to_signed(key), "move": move, "system": SYSTEM_NAMES[entry[0]],
+             **dict(zip(COUNTERS, entry[1:]))}
+            for (key, move), entry in stats.items()
+        ]
+        if rows:
+            self.db.execute(_upsert(self.db), rows)
+        self.db.add(PgnImportChunk(import_id=record.id, offset=offset, games=games, matched=matched))
+        self.db.commit()
+        self.games += games
+        self.matched += matched
+        self.rows += len(rows)
+
+    def run(self, path: str, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        path = os.path.abspath(path)
+        chunks = find_chunks(path, self.chunk_size)
+        record = self._import_record(path, len(chunks))
+        done = {offset for (offset,) in self.db.query(PgnImportChunk.offset).filter_by(import_id=record.id)}
+        pending = [(start, end) for start, end in chunks if start not in done]
+        total_bytes = sum(end - start for start, end in pending)
+        started = time.monotonic()
+        processed = 0
+        merged = len(done)
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            queue = iter(pending)
+            running = {}
+
+            def submit():
+                # Two chunks per worker keeps every process busy without reading ahead unboundedly
+                for start, end in queue:
+                    future = pool.submit(process_chunk, path, start, end, self.max_plies, self.min_rating)
+                    running[future] = (start, end)
+                    if len(running) >= self.workers * 2:
+                        return
+
+            submit()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end = running.pop(future)
+                    self._merge(record, start, *future.result())
+                    processed += end - start
+                    merged += 1
+                    if progress is not None:
+                        elapsed = time.monotonic() - started
+                        rate = processed / elapsed if elapsed else 0.0
+                        progress({"chunks_done": merged, "chunks": len(chunks),
+                                  "games": self.games, "matched": self.matched,
+                                  "mb_per_second": rate / 1024 / 1024,
+                                  "eta": (total_bytes - processed) / rate if rate else None})
+                submit()
+
+        record.finished_at = _utcnow()
+        self.db.commit()
+        return {"chunks": len(chunks), "resumed_chunks": len(done), "games": self.games,
+                "matched": self.matched, "rows": self.rows, "elapsed": time.monotonic() - started}
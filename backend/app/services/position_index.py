@@ -0,0 +1,350 @@
+"""Nearest-neighbour search over chess positions.
+
+Positions are compared on their 12 piece bitboards, where the Hamming
+distance counts misplaced pieces (a piece standing elsewhere costs 2), plus
+pawn-structure features: pawns per file and doubled, isolated and passed
+pawns. Large corpora are clustered on a coarse embedding (pieces per board
+region plus the pawn features), and a query only scores the rows of its
+nearest clusters. A million positions are searched in a few milliseconds
+that way. Indexes are saved as plain ``.npy`` files and memory-mapped, so
+opening one reads nothing up front and worker processes share the OS page
+cache.
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import chess
+import numpy as np
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.analysis_cache import position_key
+from app.services.opening_service import OpeningService, catalog_cache
+from app.services.pgn_import import matched_games
+from app.services.structure import PLANES, board_planes, boards_to_array
+
+WHITE_PAWNS, BLACK_PAWNS = 0, len(chess.PIECE_TYPES)
+FILES = np.array(chess.BB_FILES, dtype=np.uint64)
+# Queen side and king side, by pairs of ranks
+REGIONS = np.array([
+    side & (chess.BB_RANKS[rank] | chess.BB_RANKS[rank + 1])
+    for side in (chess.BB_FILE_A | chess.BB_FILE_B | chess.BB_FILE_C | chess.BB_FILE_D,
+                 chess.BB_FILE_E | chess.BB_FILE_F | chess.BB_FILE_G | chess.BB_FILE_H)
+    for rank in range(0, 8, 2)
+], dtype=np.uint64)
+# Pawns per file for each side, then doubled, isolated and passed pawns for each side
+PAWN_FEATURES = 22
+EMBEDDING_DIMENSIONS = len(PLANES) * len(REGIONS) + PAWN_FEATURES
+# Up to this many positions every row is scored; clustering would only cost recall
+EXHAUSTIVE_LIMIT = 20000
+# A different side to move counts as much as one misplaced piece
+TURN_PENALTY = 2
+ARRAYS = ("planes", "pawns", "flags", "keys", "refs", "centroids", "offsets")
+
+_M1, _M2, _M4 = np.uint64(0x5555555555555555), np.uint64(0x3333333333333333), np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+_NOT_FILE_A, _NOT_FILE_H = np.uint64(~chess.BB_FILE_A & chess.BB_ALL), np.uint64(~chess.BB_FILE_H & chess.BB_ALL)
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Set bits of every uint64 (SWAR, since NumPy 1.x has no bitwise_count)"""
+    values = values - ((values >> np.uint64(1)) & _M1)
+    values = (values & _M2) + ((values >> np.uint64(2)) & _M2)
+    values = (values + (values >> np.uint64(4))) & _M4
+    return ((values * _H01) >> np.uint64(56)).astype(np.int16)
+
+def _fill(bitboards: np.ndarray, north: bool) -> np.ndarray:
+    for shift in (8, 16, 32):
+        bitboards = bitboards | (bitboards << np.uint64(shift) if north else bitboards >> np.uint64(shift))
+    return bitboards
+
+def _with_adjacent_files(bitboards: np.ndarray) -> np.ndarray:
+    return bitboards | ((bitboards << np.uint64(1)) & _NOT_FILE_A) | ((bitboards >> np.uint64(1)) & _NOT_FILE_H)
+
+def pawn_features(planes: np.ndarray) -> np.ndarray:
+    """``(n, PAWN_FEATURES)`` int8 pawn-structure features of an ``(n, 12)`` bitboard array"""
+    white, black = planes[:, WHITE_PAWNS], planes[:, BLACK_PAWNS]
+    features = []
+    counts = []
+    for pawns in (white, black):
+        per_file = popcount(pawns[:, None] & FILES[None, :])
+        features.append(per_file)
+        counts.append(per_file)
+    for per_file in counts:
+        features.append(np.maximum(per_file - 1, 0).sum(axis=1, keepdims=True))
+    for per_file in counts:
+        occupied = per_file > 0
+        neighbours = np.zeros_like(occupied)
+        neighbours[:, 1:] |= occupied[:, :-1]
+        neighbours[:, :-1] |= occupied[:, 1:]
+        features.append((per_file * ~neighbours).sum(axis=1, keepdims=True))
+    # Passed: no enemy pawn ahead on the same or an adjacent file
+    features.append(popcount(white & ~_with_adjacent_files(_fill(black, north=False)))[:, None])
+    features.append(popcount(black & ~_with_adjacent_files(_fill(white, north=True)))[:, None])
+    return np.hstack(features).astype(np.int8)
+
+def embed(planes: np.ndarray, pawns: np.ndarray) -> np.ndarray:
+    """Coarse float32 embedding used to pick clusters: pieces per region plus pawn features"""
+    regions = popcount(planes[:, :, None] & REGIONS[None, None, :]).reshape(len(planes), -1)
+    return np.hstack([regions, pawns]).astype(np.float32)
+
+def board_flags(board: chess.Board) -> int:
+    """Side to move in bit 0 and castling rights (K, Q, k, q) in bits 1-4"""
+    return (int(board.turn)
+            | board.has_kingside_castling_rights(chess.WHITE) << 1
+            | board.has_queenside_castling_rights(chess.WHITE) << 2
+            | board.has_kingside_castling_rights(chess.BLACK) << 3
+            | board.has_queenside_castling_rights(chess.BLACK) << 4)
+
+def board_from_row(planes: Sequence[int], flags: int) -> chess.Board:
+    """Rebuild a position from its bitboards and flags (without en passant and move counters)"""
+    board = chess.Board.empty()
+    for (color, piece_type), bitboard in zip(PLANES, planes):
+        for square in chess.scan_forward(int(bitboard)):
+            board.set_piece_at(square, chess.Piece(piece_type, color))
+    board.turn = bool(flags & 1)
+    castling = "".join(symbol for bit, symbol in enumerate("KQkq", 1) if flags & (1 << bit))
+    board.set_castling_fen(castling or "-")
+    return board
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+    norms = (centroids ** 2).sum(axis=1)
+    nearest = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        # |v - c|^2 without the |v|^2 term, which is the same for every centroid
+        distances = norms[None, :] - 2 * vectors[start:start + chunk] @ centroids.T
+        nearest[start:start + chunk] = distances.argmin(axis=1)
+    return nearest
+
+def _kmeans(sample: np.ndarray, clusters: int, rng: np.random.Generator, iterations: int = 8) -> np.ndarray:
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroids(sample, centroids)
+        counts = np.bincount(assignment, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Restart empty clusters from random positions rather than losing them
+        centroids[~filled] = sample[rng.choice(len(sample), int((~filled).sum()))]
+    return centroids
+
+class PositionIndex:
+    """Similarity search over a fixed set of positions.
+
+    Rows are stored ordered by cluster, so a cluster is a contiguous slice of
+    the (possibly memory-mapped) arrays and a query reads only the slices of
+    the ``position_index_probes`` clusters nearest to it. ``refs`` points each
+    row into ``references`` (lesson metadata), or is -1.
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray], references: List[Dict]):
+        self.planes = arrays["planes"]
+        self.pawns = arrays["pawns"]
+        self.flags = arrays["flags"]
+        self.keys = arrays["keys"]
+        self.refs = arrays["refs"]
+        self.centroids = arrays["centroids"]
+        self.offsets = arrays["offsets"]
+        self.references = references
+
+    def __len__(self) -> int:
+        return len(self.planes)
+
+    @classmethod
+    def build(cls, planes: np.ndarray, flags: np.ndarray, keys: np.ndarray, refs: Optional[np.ndarray] = None,
+              references: Optional[List[Dict]] = None, clusters: Optional[int] = None, seed: int = 0) -> "PositionIndex":
+        count = len(planes)
+        pawns = pawn_features(planes)
+        if clusters is None:
+            clusters = 1 if count <= EXHAUSTIVE_LIMIT else int(np.sqrt(count))
+        if clusters <= 1:
+            clusters = 1
+            centroids = np.zeros((1, EMBEDDING_DIMENSIONS), dtype=np.float32)
+            assignment = np.zeros(count, dtype=np.int32)
+        else:
+            rng = np.random.default_rng(seed)
+            # Forty positions per cluster train the centroids well enough to route queries
+            sample = np.sort(rng.choice(count, min(count, clusters * 40), replace=False))
+            centroids = _kmeans(embed(planes[sample], pawns[sample]), clusters, rng)
+            assignment = np.concatenate([
+                _nearest_centroids(embed(planes[start:start + 65536], pawns[start:start + 65536]), centroids)
+                for start in range(0, count, 65536)
+            ])
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(clusters + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=clusters))
+        return cls({
+            "planes": planes[order],
+            "pawns": pawns[order],
+            "flags": flags[order],
+            "keys": keys[order],
+            "refs": refs[order].astype(np.int32) if refs is not None else np.full(count, -1, dtype=np.int32),
+            "centroids": centroids,
+            "offsets": offsets
+        }, references or [])
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        # Each file is written aside and renamed over the old one, so a server that
+        # has the previous index memory-mapped keeps reading intact files
+        for name in ARRAYS:
+            target = os.path.join(path, f"{name}.npy")
+            with open(target + ".tmp", "wb") as f:
+                np.save(f, getattr(self, name))
+            os.replace(target + ".tmp", target)
+        # Written last: an index without it is incomplete and won't be opened, and
+        # servers reload the index when it changes
+        target = os.path.join(path, "meta.json")
+        with open(target + ".tmp", "w") as f:
+            json.dump({"count": len(self), "clusters": len(self.centroids), "references": self.references}, f)
+        os.replace(target + ".tmp", target)
+
+    @classmethod
+    def load(cls, path: str) -> "PositionIndex":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        return cls(arrays, meta["references"])
+
+    def search(self, board: chess.Board, k: int = 5, probes: Optional[int] = None) -> List[Tuple[int, int]]:
+        """``(row, distance)`` of the ``k`` nearest positions, nearest first"""
+        if not len(self):
+            return []
+        query = np.array([board_planes(board)], dtype=np.uint64)
+        query_pawns = pawn_features(query)
+        clusters = len(self.centroids)
+        probes = min(probes or settings.position_index_probes, clusters)
+        if clusters == 1:
+            probed = [0]
+        else:
+            distances = ((self.centroids - embed(query, query_pawns)) ** 2).sum(axis=1)
+            probed = np.argpartition(distances, probes - 1)[:probes]
+        rows, scores = [], []
+        turn = board_flags(board) & 1
+        for cluster in probed:
+            start, end = int(self.offsets[cluster]), int(self.offsets[cluster + 1])
+            if start == end:
+                continue
+            score = popcount(self.planes[start:end] ^ query).sum(axis=1, dtype=np.int32)
+            score += np.abs(self.pawns[start:end].astype(np.int16) - query_pawns).sum(axis=1)
+            score += TURN_PENALTY * ((self.flags[start:end] & 1) != turn)
+            rows.append(np.arange(start, end))
+            scores.append(score)
+        if not rows:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        k = min(k, len(scores))
+        top = np.argpartition(scores, k - 1)[:k]
+        top = top[np.argsort(scores[top], kind="stable")]
+        return [(int(rows[i]), int(scores[i])) for i in top]
+
+    def neighbours(self, board: chess.Board, k: int = 5) -> List[Dict]:
+        results = []
+        for row, distance in self.search(board, k):
+            ref = int(self.refs[row])
+            results.append({
+                "fen": board_from_row(self.planes[row], int(self.flags[row])).fen(),
+                "distance": distance,
+                "key": int(self.keys[row]),
+                "lesson": self.references[ref] if ref >= 0 else None
+            })
+        return results
+
+def lesson_index(opening_service: OpeningService) -> PositionIndex:
+    """Every position of every lesson, each referring back to its lesson and ply"""
+    boards, references = [], []
+    for lesson in opening_service.get_all_lessons():
+        for position in opening_service.get_lesson_positions(lesson["system"], lesson["id"]):
+            boards.append(chess.Board(position["fen"]))
+            references.append({"system": lesson["system"], "lesson": lesson["id"], "title": lesson["title"],
+                               "ply": position["ply"], "move": position["move"], "comment": position["comment"]})
+    return PositionIndex.build(
+        boards_to_array(boards),
+        np.array([board_flags(board) for board in boards], dtype=np.uint8),
+        np.array([position_key(board) for board in boards], dtype=np.uint64),
+        refs=np.arange(len(boards)),
+        references=references
+    )
+
+def game_positions(path: str, start: int, end: int, max_plies: int,
+                   min_rating: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(planes, flags, keys)`` of the distinct positions reached by games in one byte
+    range of a PGN file that settle into a system; runs in a worker process"""
+    games, _ = matched_games(path, start, end, max_plies, min_rating)
+    planes, flags, keys = [], [], []
+    for game, _ in games:
+        board = chess.Board()
+        for move, bitboards in zip(game.moves, game.planes):
+            board.push(move)
+            planes.append(bitboards)
+            flags.append(board_flags(board))
+            keys.append(position_key(board))
+    return distinct(np.array(planes, dtype=np.uint64).reshape(-1, len(PLANES)),
+                    np.array(flags, dtype=np.uint8), np.array(keys, dtype=np.uint64))
+
+def distinct(planes: np.ndarray, flags: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Keep one row per position key"""
+    _, first = np.unique(keys, return_index=True)
+    return planes[first], flags[first], keys[first]
+
+class PositionSearch:
+    """Lesson positions, rebuilt when the catalog changes, plus the master-game index on disk.
+
+    The master-game index is built offline with ``app.commands.build_position_index``
+    and memory-mapped from ``position_index_path`` if it exists. It is reopened
+    whenever its ``meta.json`` changes, i.e. after every rebuild.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.position_index_path
+        self.lessons: Optional[PositionIndex] = None
+        self.games: Optional[PositionIndex] = None
+        self.catalog_version: Optional[int] = None
+        self.games_version: Optional[int] = None  # meta.json mtime of the games index in use
+        self._lock = threading.Lock()
+
+    def _stored_games_version(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self):
+        with self._lock:
+            version = catalog_cache.version
+            if self.catalog_version != version:
+                with SessionLocal() as db:
+                    self.lessons = lesson_index(OpeningService(db))
+                self.catalog_version = version
+            games_version = self._stored_games_version()
+            if games_version != self.games_version:
+                games = None
+                if games_version is not None:
+                    try:
+                        games = PositionIndex.load(self.path)
+                    except (OSError, KeyError, ValueError) as e:
+                        print(f"Warning: ignoring unreadable position index {self.path}: {e}")
+                # Recorded even when unreadable, so the warning isn't repeated until the next rebuild
+                self.games, self.games_version = games, games_version
+
+    @property
+    def stale(self) -> bool:
+        """Never built, the catalog was written to, or the games index was rebuilt since"""
+        return self.catalog_version != catalog_cache.version or self._stored_games_version() != self.games_version
+
+    def similar(self, board: chess.Board, k: int = 5, max_distance: Optional[int] = None) -> List[Dict]:
+        """The ``k`` nearest known positions; a lesson position wins over the same game position"""
+        found: Dict[int, Dict] = {}
+        for source, index in (("lesson", self.lessons), ("game", self.games)):
+            if index is None:
+                continue
+            for neighbour in index.neighbours(board, k):
+                if max_distance is None or neighbour["distance"] <= max_distance:
+                    found.setdefault(neighbour["key"], {**neighbour, "source": source})
+        return sorted(found.values(), key=lambda neighbour: neighbour["distance"])[:k]
+
+    def stats(self) -> Dict:
+        return {
+            "lesson_positions": len(self.lessons) if self.lessons is not None else 0,
+            "game_positions": len(self.games) if self.games is not None else 0
+        }
+
+position_search = PositionSearch()
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+import chess
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.analysis_cache import position_key
+from app.services.chess_service import ChessService
+from app.services.opening_service import OpeningService
+from app.services.scheduler import PRECOMPUTE, EngineOverloadedError
+
+class PrecomputeJob:
+    """Walks every lesson's position tree and stores engine analysis for each node.
+
+    Children of a node are its book continuations plus whichever of the lesson's
+    ``key_moves`` are legal there. Results go through the persistent analysis
+    cache, so a node already stored at the target depth is skipped; rerunning
+    the job resumes where a previous run stopped.
+    """
+    def __init__(self, chess_service: ChessService, plies: Optional[int] = None,
+                 depth: Optional[int] = None, concurrency: Optional[int] = None):
+        self.chess_service = chess_service
+        self.plies = plies if plies is not None else settings.precompute_plies
+        self.depth = depth or settings.precompute_depth
+        self.concurrency = concurrency or chess_service.engine_pool.size
+        self.total = 0
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def collect_positions(self) -> List[chess.Board]:
+        """Breadth-first walk of every lesson tree, deduplicated across transpositions"""
+        with SessionLocal() as db:
+            lessons = OpeningService(db).get_all_lessons()
+        book = self.chess_service.opening_book
+        seen: Set[int] = set()
+        positions: List[chess.Board] = []
+        frontier = deque((chess.Board(lesson["starting_fen"]), lesson["key_moves"], 0) for lesson in lessons)
+        while frontier:
+            board, key_moves, ply = frontier.popleft()
+            key = position_key(board)
+            if key in seen or board.is_game_over():
+                continue
+            seen.add(key)
+            positions.append(board)
+            if ply >= self.plies:
+                continue
+            children = [entry["move"] for entry in book.lookup(board)]
+            for san in key_moves:
+                try:
+                    children.append(board.parse_san(san).uci())
+                except ValueError:
+                    continue
+            for move in dict.fromkeys(children):
+                child = board.copy(stack=False)
+                child.push_uci(move)
+                frontier.append((child, key_moves, ply + 1))
+        return positions
+
+    async def run(self) -> Dict:
+        self.started_at, self.finished_at = time.monotonic(), None
+        positions = await asyncio.to_thread(self.collect_positions)
+        self.total, self.done, self.skipped, self.failed = len(positions), 0, 0, 0
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def analyze(board: chess.Board):
+            async with slots:
+                if await self.chess_service.analysis_cache.get(board, self.depth) is not None:
+                    self.skipped += 1
+                else:
+                    try:
+                        await self._analyze(board)
+                    except Exception as e:
+                        print(f"Warning: precompute failed for {board.fen()}: {e}")
+                        self.failed += 1
+                self.done += 1
+
+        await asyncio.gather(*(analyze(board) for board in positions))
+        self.finished_at = time.monotonic()
+        return self.progress()
+
+    async def _analyze(self, board: chess.Board):
+        while True:
+            try:
+                return await self.chess_service.analyze_board(board, self.depth, use_book=False,
+                                                              priority=PRECOMPUTE)
+            except EngineOverloadedError as e:
+                # Interactive traffic has the engines; come back when it has drained
+                await asyncio.sleep(e.retry_after)
+
+    def progress(self) -> Dict:
+        if self.started_at is None:
+            return {"state": "idle"}
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        analyzed = self.done - self.skipped
+        remaining = self.total - self.done
+        # Skipped nodes cost nothing, so the rate only counts real searches
+        rate = analyzed / elapsed if elapsed > 0 and analyzed else None
+        return {
+            "state": "finished" if self.finished_at else "running",
+            "total": self.total,
+            "done": self.done,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed": elapsed,
+            "eta": remaining / rate if rate else None
+        }
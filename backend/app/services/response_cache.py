@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import time
+from typing import Dict, Hashable, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.ai import AIResponseCacheEntry
+from app.utils.ttl_cache import TTLCache
+
+def _digest(key: Tuple[Hashable, ...]) -> str:
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+class ResponseCache:
+    """Per-process TTL cache of AI answers, backed by the ``ai_response_cache`` table.
+
+    The table is what makes an answer generated by one server worker a hit in
+    every other worker; the in-memory layer keeps repeated hits off the database.
+    """
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 persist: Optional[bool] = None):
+        self.memory = TTLCache(max_entries or settings.ollama_cache_size, ttl or settings.ollama_cache_ttl)
+        self.persist = settings.ollama_cache_persist if persist is None else persist
+        self.db_hits = 0
+
+    def _load(self, digest: str) -> Optional[Tuple[str, float]]:
+        with SessionLocal() as db:
+            row = db.get(AIResponseCacheEntry, digest)
+            remaining = row.expires_at - time.time() if row is not None else 0
+            if remaining <= 0:
+                return None
+            return row.response, remaining
+
+    def _save(self, digest: str, model: str, response: str):
+        with SessionLocal() as db:
+            db.merge(AIResponseCacheEntry(cache_key=digest, model=model, response=response,
+                                          expires_at=time.time() + self.memory.ttl))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker stored the same answer at the same moment
+                db.rollback()
+
+    async def get(self, key: Tuple[Hashable, ...]) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None or not self.persist:
+            return value
+        stored = await asyncio.to_thread(self._load, _digest(key))
+        if stored is None:
+            return None
+        self.db_hits += 1
+        self.memory.set(key, stored[0], ttl=stored[1])
+        return stored[0]
+
+    async def set(self, key: Tuple[Hashable, ...], value: str):
+        self.memory.set(key, value)
+        if self.persist:
+            # Keys start with the model name
+            await asyncio.to_thread(self._save, _digest(key), str(key[0]), value)
+
+    def stats(self) -> Dict:
+        stats = self.memory.stats()
+        lookups = stats["hits"] + stats["misses"]
+        # A database hit first shows up as a miss of the in-memory layer
+        stats["misses"] -= self.db_hits
+        stats["db_hits"] = self.db_hits
+        stats["hit_rate"] = (stats["hits"] + self.db_hits) / lookups if lookups else 0.0
+        stats["shared"] = self.persist
+        return stats
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.opening import System
+from app.services.opening_service import OpeningService, catalog_cache
+
+# Hashed feature space; collisions are rare at this size for a lesson catalog
+DIMENSIONS = 4096
+_WORDS = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_STOP_WORDS = frozenset("a an and are as at be by for from how i in is it of on or the this to what when where "
+                        "which who why with you your do does should can my me".split())
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English and SAN)"""
+    return len(text) // 4 + 1
+
+def _features(text: str) -> List[str]:
+    words = [word for word in _WORDS.findall(text.lower()) if word not in _STOP_WORDS]
+    # Bigrams keep "pawn chain" apart from "pawn" and "chain" used separately
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def _term_counts(texts: List[str]) -> np.ndarray:
+    counts = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            # crc32 rather than hash(): str hashes change with every interpreter
+            bucket = zlib.crc32(feature.encode())
+            counts[row, bucket % DIMENSIONS] += 1.0 if bucket & 0x80000000 else -1.0
+    return counts
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def lesson_title(title: str, system: str, lesson_id: int) -> str:
+    return f"{title} ({system} lesson {lesson_id})"
+
+def position_text(title: str, position: Dict) -> str:
+    """Snippet text of a commented lesson position; ``title`` comes from lesson_title"""
+    after = f" after {position['move']}" if position["move"] else ""
+    return f"{title}, ply {position['ply']}{after}: {position['comment']}"
+
+def catalog_snippets(opening_service: OpeningService) -> List[Dict]:
+    """Systems, lessons, objectives and annotated positions, one snippet each"""
+    snippets = []
+    for system in opening_service.db.query(System).order_by(System.id):
+        snippets.append({"system": system.slug, "lesson": None, "kind": "system",
+                         "text": f"{system.name}: {system.description}. Key moves: {', '.join(system.key_moves)}."})
+    for lesson in opening_service.get_all_lessons():
+        title = lesson_title(lesson["title"], lesson["system"], lesson["id"])
+        base = {"system": lesson["system"], "lesson": lesson["id"]}
+        snippets.append({**base, "kind": "lesson",
+                         "text": f"{title}: {lesson['description']}. Key moves: {', '.join(lesson['key_moves'])}."})
+        for objective in lesson["objectives"]:
+            snippets.append({**base, "kind": "objective", "text": f"{title} objective: {objective}."})
+        for position in opening_service.get_lesson_positions(lesson["system"], lesson["id"]):
+            if position["comment"]:
+                snippets.append({**base, "kind": "position", "text": position_text(title, position)})
+    return snippets
+
+def _embed(texts: List[str], idf: np.ndarray) -> np.ndarray:
+    weighted = _term_counts(texts)
+    weighted = np.sign(weighted) * np.log1p(np.abs(weighted)) * idf
+    return _normalize(weighted)
+
+class _Embedded(NamedTuple):
+    """Everything a search reads, swapped in as one object so searches never mix two builds"""
+    idf: np.ndarray
+    vectors: np.ndarray
+    snippets: List[Dict]
+    systems: np.ndarray  # Each snippet's system slug, "" for general ones
+
+    @classmethod
+    def of(cls, idf: np.ndarray, vectors: np.ndarray, snippets: List[Dict]) -> "_Embedded":
+        return cls(idf, vectors, snippets, np.array([snippet["system"] or "" for snippet in snippets]))
+
+class RetrievalIndex:
+    """In-process cosine search over lesson snippets.
+
+    Snippets are embedded locally as signed, hashed unigram and bigram counts
+    weighted by IDF, so no model or network call is needed and the same text
+    always gets the same vector. The index is saved to ``path`` with a
+    fingerprint of the snippets and only re-embedded when the catalog changes.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.retrieval_index_path
+        self._embedded = _Embedded.of(np.ones(DIMENSIONS, dtype=np.float32),
+                                      np.zeros((0, DIMENSIONS), dtype=np.float32), [])
+        self.catalog_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def snippets(self) -> List[Dict]:
+        return self._embedded.snippets
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return _embed(texts, self._embedded.idf)
+
+    def build(self, snippets: List[Dict]):
+        texts = [snippet["text"] for snippet in snippets]
+        document_frequency = (_term_counts(texts) != 0).sum(axis=0)
+        idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self._embedded = _Embedded.of(idf, _embed(texts, idf), snippets)
+
+    def refresh(self):
+        """Load the saved index, rebuilding and saving it if the catalog changed since"""
+        with self._lock:
+            version = catalog_cache.version
+            with SessionLocal() as db:
+                snippets = catalog_snippets(OpeningService(db))
+            fingerprint = hashlib.sha256(json.dumps(snippets, sort_keys=True).encode()).hexdigest()
+            if not self._load(fingerprint):
+                self.build(snippets)
+                self._save(fingerprint)
+            self.catalog_version = version
+
+    def _load(self, fingerprint: str) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path, allow_pickle=False) as saved:
+                if str(saved["fingerprint"]) != fingerprint:
+                    return False
+                self._embedded = _Embedded.of(saved["idf"], saved["vectors"], json.loads(str(saved["snippets"])))
+            return True
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Warning: ignoring unreadable retrieval index {self.path}: {e}")
+            return False
+
+    def _save(self, fingerprint: str):
+        embedded = self._embedded
+        try:
+            with open(self.path, "wb") as f:
+                np.savez(f, vectors=embedded.vectors, idf=embedded.idf, fingerprint=np.array(fingerprint),
+                         snippets=np.array(json.dumps(embedded.snippets)))
+        except OSError as e:
+            print(f"Warning: could not save retrieval index to {self.path}: {e}")
+
+    @property
+    def stale(self) -> bool:
+        """Never built, or the catalog was written to since"""
+        return self.catalog_version != catalog_cache.version
+
+    def search(self, query: str, k: int = 4, system: Optional[str] = None) -> List[Tuple[float, Dict]]:
+        """Best ``k`` snippets by cosine similarity, limited to ``system`` plus general ones if given"""
+        # One read: a concurrent refresh swaps in a new build without touching this one
+        embedded = self._embedded
+        if not embedded.snippets:
+            return []
+        scores = embedded.vectors @ _embed([query], embedded.idf)[0]
+        if system:
+            allowed = (embedded.systems == system) | (embedded.systems == "")
+            scores = np.where(allowed, scores, -1.0)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(float(scores[i]), embedded.snippets[i]) for i in top[np.argsort(-scores[top])] if scores[i] > 0]
+
+    def context(self, query: str, system: Optional[str] = None, token_budget: Optional[int] = None,
+                k: Optional[int] = None) -> List[str]:
+        """Texts of the most relevant snippets that fit in ``token_budget``, best first"""
+        budget = token_budget if token_budget is not None else settings.retrieval_token_budget
+        notes = []
+        for score, snippet in self.search(query, k or settings.retrieval_top_k, system):
+            if score < settings.retrieval_min_score:
+                break
+            cost = estimate_tokens(snippet["text"])
+            if cost > budget:
+                continue
+            notes.append(snippet["text"])
+            budget -= cost
+        return notes
+
+retrieval_index = RetrievalIndex()
@@ -0,0 +1,165 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
+import chess.engine
+from app.core.config import settings
+from app.services.engine_pool import EnginePool
+
+# Priority classes, most urgent first
+INTERACTIVE = 0  # board evaluation while a user is waiting
+BATCH = 1  # game review
+PRECOMPUTE = 2  # background warming
+PRIORITY_NAMES = ("interactive", "batch", "precompute")
+
+class EngineOverloadedError(Exception):
+    """Raised instead of queueing work that can't start in time; maps to HTTP 429"""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class EngineScheduler:
+    """Admission control and priority queueing in front of an engine pool.
+
+    At most one search per engine runs at a time; the rest wait in a heap
+    ordered by priority class, then arrival. New work is refused with
+    ``EngineOverloadedError`` when the queue ahead of it is full, when its
+    client already has too many searches queued or running, or when the
+    expected wait is longer than its deadline. Whatever is left of the deadline
+    after queueing becomes the engine's time limit.
+    """
+    def __init__(self, engine_pool: EnginePool, max_queue: Optional[int] = None,
+                 max_per_client: Optional[int] = None):
+        self.engine_pool = engine_pool
+        self.max_queue = max_queue or settings.scheduler_max_queue
+        self.max_per_client = max_per_client or settings.scheduler_max_per_client
+        self.deadlines = (settings.interactive_deadline, settings.batch_deadline, None)
+        self._running = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued = [0] * len(PRIORITY_NAMES)
+        self._clients: Counter = Counter()
+        self._order = itertools.count()
+        # Moving average of search time, used for Retry-After and admission estimates
+        self.average_search = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.engine_pool.size
+
+    def deadline_for(self, priority: int) -> Optional[float]:
+        return self.deadlines[priority]
+
+    def _retry_after(self) -> float:
+        backlog = self._running + sum(self._queued)
+        return max(1.0, backlog / self.capacity * self.average_search)
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise EngineOverloadedError(f"Engine busy: {reason}", self._retry_after())
+
+    def _admit(self, priority: int, client: Optional[Hashable], timeout: Optional[float]):
+        if client is not None and self._clients[client] >= self.max_per_client:
+            self._reject("too many analyses in progress for this client")
+        ahead = sum(self._queued[:priority + 1])
+        if ahead >= self.max_queue:
+            self._reject("analysis queue is full")
+        if timeout is not None and self._running >= self.capacity:
+            expected_wait = (ahead // self.capacity + 1) * self.average_search
+            if expected_wait > timeout:
+                self._reject("expected wait exceeds the request deadline")
+
+    @asynccontextmanager
+    async def acquire(self, priority: int = INTERACTIVE, client: Optional[Hashable] = None,
+                      deadline: Optional[float] = None) -> AsyncIterator[Tuple[chess.engine.UciProtocol, Optional[float]]]:
+        """Yield ``(engine, seconds left before the deadline)``; ``deadline`` defaults per class"""
+        async with self.reserve(priority, client, deadline) as remaining:
+            async with self.engine_pool.acquire() as engine:
+                yield engine, remaining
+
+    @asynccontextmanager
+    async def reserve(self, priority: int = INTERACTIVE, client: Optional[Hashable] = None,
+                      deadline: Optional[float] = None) -> AsyncIterator[Optional[float]]:
+        """Hold a search slot without a pool engine, for searches on a caller-owned engine.
+
+        Game sessions search on their own engines but still take a slot here, so
+        they share the per-core budget and queue with every other search.
+        """
+        timeout = deadline if deadline is not None else self.deadline_for(priority)
+        expires = time.monotonic() + timeout if timeout is not None else None
+        self._admit(priority, client, timeout)
+        if client is not None:
+            self._clients[client] += 1
+        try:
+            await self._wait_turn(priority, timeout)
+            self.admitted += 1
+            try:
+                started = time.monotonic()
+                yield expires - started if expires is not None else None
+                self.average_search = 0.8 * self.average_search + 0.2 * (time.monotonic() - started)
+            finally:
+                self._release()
+        finally:
+            if client is not None:
+                self._clients[client] -= 1
+                if not self._clients[client]:
+                    del self._clients[client]
+
+    async def _wait_turn(self, priority: int, timeout: Optional[float]):
+        if self._running < self.capacity and not any(self._queued):
+            self._running += 1
+            return
+        turn = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), turn))
+        self._queued[priority] += 1
+        try:
+            await asyncio.wait_for(turn, timeout)
+        except BaseException as e:
+            if turn.done() and not turn.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("deadline passed while queued")
+            raise
+        finally:
+            self._queued[priority] -= 1
+
+    def _release(self):
+        # Hand the slot straight to the most urgent live waiter, if any
+        while self._waiters:
+            _, _, turn = heapq.heappop(self._waiters)
+            if not turn.done():
+                turn.set_result(None)
+                return
+        self._running -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "running": self._running,
+            "queued": dict(zip(PRIORITY_NAMES, self._queued)),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "average_search_seconds": self.average_search
+        }
+
+def engine_limit(depth: Optional[int], nodes: Optional[int], time_limit: Optional[float],
+                 remaining: Optional[float]) -> chess.engine.Limit:
+    """Clamp a requested search to the configured caps and the time left before the deadline.
+
+    The depth and node caps bound a single search and are the same for every
+    client; what one client can use in total is limited by ``max_per_client``.
+    """
+    if depth is not None:
+        depth = min(depth, settings.analysis_max_depth)
+    nodes = min(nodes or settings.analysis_max_nodes, settings.analysis_max_nodes)
+    if remaining is not None:
+        # Even a request out of time gets a token search rather than none at all
+        remaining = max(remaining, 0.05)
+        time_limit = min(time_limit, remaining) if time_limit is not None else remaining
+    return chess.engine.Limit(depth=depth, nodes=nodes, time=time_limit)
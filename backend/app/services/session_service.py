@@ -0,0 +1,170 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+import chess
+from app.core.config import settings
+from app.services.chess_service import ChessService
+from app.services.engine_pool import EnginePool
+from app.services.scheduler import EngineOverloadedError
+
+class SessionNotFoundError(Exception):
+    """Raised for unknown or expired session ids"""
+
+class GameSession:
+    """A board with its move stack, plus an engine pinned to it on first analysis"""
+    def __init__(self, board: chess.Board):
+        self.id = uuid.uuid4().hex
+        self.board = board
+        self.engine_pool: Optional[EnginePool] = None
+        self.searches = 0  # Analyses running on engine_pool; it is never closed under them
+        self.last_used = time.monotonic()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def state(self) -> Dict:
+        replay = chess.Board(self.board.root().fen())
+        moves = []
+        for move in self.board.move_stack:
+            moves.append(replay.san(move))
+            replay.push(move)
+        return {
+            "session_id": self.id,
+            "starting_fen": self.board.root().fen(),
+            "fen": self.board.fen(),
+            "moves": moves,
+            "legal_moves": [move.uci() for move in self.board.legal_moves],
+            "is_check": self.board.is_check(),
+            "is_game_over": self.board.is_game_over()
+        }
+
+class SessionManager:
+    """In-memory game sessions, evicted when idle or when over the memory budget.
+
+    At most ``session_max_engines`` sessions hold a dedicated engine at a time;
+    asking for another takes the engine of the least recently used idle session,
+    or is refused with ``EngineOverloadedError`` while every one is searching.
+    Session searches also take a scheduler slot, so the extra engine processes
+    never search beyond the per-core budget.
+    """
+    def __init__(self, chess_service: ChessService):
+        self.chess_service = chess_service
+        self.max_sessions = settings.session_max_count
+        self.max_engines = settings.session_max_engines
+        self.idle_ttl = settings.session_idle_ttl
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for session in list(self._sessions.values()):
+            await self._release_engine(session, force=True)
+        self._sessions.clear()
+
+    async def create(self, fen: str = chess.STARTING_FEN) -> GameSession:
+        board = chess.Board(fen)
+        if not board.is_valid():
+            raise ValueError(f"Invalid position: {fen}")
+        await self.expire_idle()
+        while len(self._sessions) >= self.max_sessions:
+            _, evicted = self._sessions.popitem(last=False)
+            await self._release_engine(evicted)
+        session = GameSession(board)
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> GameSession:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Session '{session_id}' not found")
+        session.touch()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def delete(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFoundError(f"Session '{session_id}' not found")
+        await self._release_engine(session)
+
+    def push_move(self, session_id: str, move: str) -> Dict:
+        """Apply a move given in UCI or SAN; returns the new state"""
+        session = self.get(session_id)
+        try:
+            parsed = session.board.parse_uci(move)
+        except ValueError:
+            parsed = session.board.parse_san(move)
+        session.board.push(parsed)
+        return session.state()
+
+    def undo(self, session_id: str) -> Dict:
+        session = self.get(session_id)
+        if session.board.move_stack:
+            session.board.pop()
+        return session.state()
+
+    async def analyze(self, session_id: str, depth: int = 15, multipv: int = 1,
+                      client: Optional[Hashable] = None) -> Dict:
+        session = self.get(session_id)
+        # Snapshot so moves posted during the search don't change what is analyzed
+        board = session.board.copy()
+        session.searches += 1
+        try:
+            pool = await self._engine_for(session)
+            return await self.chess_service.analyze_board(board, depth, multipv, engine_pool=pool,
+                                                          game=session.id, client=client)
+        finally:
+            session.searches -= 1
+            if session.id not in self._sessions:
+                # Deleted or evicted mid-search: its engine was left running until now
+                await self._release_engine(session)
+
+    async def _engine_for(self, session: GameSession) -> EnginePool:
+        while session.engine_pool is None:
+            pinned = [other for other in self._sessions.values() if other.engine_pool is not None]
+            if len(pinned) < self.max_engines:
+                session.engine_pool = EnginePool(size=1)
+                break
+            # Sessions are kept in LRU order, so the first idle one is the stalest
+            idle = [other for other in pinned if not other.searches]
+            if not idle:
+                raise EngineOverloadedError("Engine busy: every session engine is searching",
+                                            max(1.0, self.chess_service.scheduler.average_search))
+            await self._release_engine(idle[0])
+        return session.engine_pool
+
+    async def _release_engine(self, session: GameSession, force: bool = False):
+        if session.engine_pool is not None and (force or not session.searches):
+            pool, session.engine_pool = session.engine_pool, None
+            await pool.close()
+
+    async def expire_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = [session for session in self._sessions.values() if session.last_used < cutoff]
+        for session in expired:
+            del self._sessions[session.id]
+            await self._release_engine(session)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(max(self.idle_ttl / 4, 1))
+            await self.expire_idle()
+
+    def stats(self) -> Dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "engines": sum(1 for session in self._sessions.values() if session.engine_pool is not None),
+            "max_engines": self.max_engines
+        }
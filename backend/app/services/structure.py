@@ -0,0 +1,98 @@
+"""Vectorized Stonewall/Torre/Colle structure classifier.
+
+Positions are turned into rows of 12 piece bitboards (white pawn..king, then
+black pawn..king) and classified in bulk with NumPy bit operations, so the
+cost per position is the bitboard extraction plus a few nanoseconds. Because
+it looks at where pawns and pieces stand rather than at the move list, every
+move-order transposition into a system is recognized.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import chess
+import numpy as np
+
+SYSTEM_NAMES: Tuple[Optional[str], ...] = (None, "stonewall", "torre", "colle")
+NONE, STONEWALL, TORRE, COLLE = range(4)
+
+# Column of each piece bitboard in a position row
+WHITE_PAWNS, WHITE_KNIGHTS, WHITE_BISHOPS = 0, 1, 2
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+def _mask(*squares: int) -> np.uint64:
+    return np.uint64(sum(chess.BB_SQUARES[square] for square in squares))
+
+# Typical placements of each system; a missing one is reported as a deviation.
+# A placement is satisfied when the plane has a piece on any of its squares.
+TYPICAL_SETUP: Dict[int, List[Tuple[str, int, np.uint64]]] = {
+    STONEWALL: [
+        ("no_c3_pawn", WHITE_PAWNS, _mask(chess.C3)),
+        ("no_bishop_d3", WHITE_BISHOPS, _mask(chess.D3)),
+        ("no_knight_f3_or_e5", WHITE_KNIGHTS, _mask(chess.F3, chess.E5)),
+        ("no_knight_d2", WHITE_KNIGHTS, _mask(chess.D2)),
+    ],
+    TORRE: [
+        ("no_e3_pawn", WHITE_PAWNS, _mask(chess.E3)),
+        ("no_c3_pawn", WHITE_PAWNS, _mask(chess.C3)),
+        ("no_knight_d2", WHITE_KNIGHTS, _mask(chess.D2)),
+    ],
+    COLLE: [
+        ("no_c3_pawn", WHITE_PAWNS, _mask(chess.C3)),
+        ("no_bishop_d3", WHITE_BISHOPS, _mask(chess.D3)),
+        ("no_knight_d2", WHITE_KNIGHTS, _mask(chess.D2)),
+    ],
+}
+
+def board_planes(board: chess.Board) -> Tuple[int, ...]:
+    """The 12 piece bitboards of a position, in ``PLANES`` order"""
+    return tuple(board.pieces_mask(piece_type, color) for color, piece_type in PLANES)
+
+def boards_to_array(boards: Iterable[chess.Board]) -> np.ndarray:
+    """Stack positions into an ``(n, 12)`` uint64 array"""
+    rows = [board_planes(board) for board in boards]
+    return np.array(rows, dtype=np.uint64).reshape(len(rows), len(PLANES))
+
+def _has(plane: np.ndarray, mask: np.uint64) -> np.ndarray:
+    return (plane & mask) == mask
+
+def _none(plane: np.ndarray, mask: np.uint64) -> np.ndarray:
+    return (plane & mask) == 0
+
+def classify_array(planes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Classify an ``(n, 12)`` bitboard array.
+
+    Returns ``(systems, deviations)``: an int8 index into ``SYSTEM_NAMES`` and a
+    bit set over the system's ``TYPICAL_SETUP`` entries that are missing.
+    """
+    pawns, knights, bishops = planes[:, WHITE_PAWNS], planes[:, WHITE_KNIGHTS], planes[:, WHITE_BISHOPS]
+    d4 = _has(pawns, _mask(chess.D4))
+    no_f4 = _none(pawns, _mask(chess.F4))
+    stonewall = d4 & _has(pawns, _mask(chess.E3, chess.F4))
+    torre = d4 & no_f4 & _has(bishops, _mask(chess.G5)) & _has(knights, _mask(chess.F3))
+    # The queen's bishop stays inside the pawn chain (or goes to b2 in the Colle-Zukertort)
+    colle = (d4 & no_f4 & _has(pawns, _mask(chess.E3)) & _has(knights, _mask(chess.F3))
+             & ~_none(bishops, _mask(chess.C1, chess.B2)) & _none(bishops, _mask(chess.G5)))
+
+    systems = np.select([stonewall, torre, colle], [STONEWALL, TORRE, COLLE], NONE).astype(np.int8)
+    deviations = np.zeros(len(planes), dtype=np.uint16)
+    for system, setup in TYPICAL_SETUP.items():
+        missing = np.zeros(len(planes), dtype=np.uint16)
+        for bit, (_, plane, mask) in enumerate(setup):
+            missing |= _none(planes[:, plane], mask).astype(np.uint16) << np.uint16(bit)
+        deviations = np.where(systems == system, missing, deviations)
+    return systems, deviations
+
+def describe(system: int, deviations: int) -> Dict:
+    setup = TYPICAL_SETUP.get(system, [])
+    return {
+        "system": SYSTEM_NAMES[system],
+        "deviations": [name for bit, (name, _, _) in enumerate(setup) if deviations >> bit & 1]
+    }
+
+def classify_boards(boards: Sequence[chess.Board]) -> List[Dict]:
+    """Library entry point: ``{"system": ..., "deviations": [...]}`` for each position"""
+    if not boards:
+        return []
+    systems, deviations = classify_array(boards_to_array(boards))
+    return [describe(int(system), int(missing)) for system, missing in zip(systems, deviations)]
+
+def classify_board(board: chess.Board) -> Dict:
+    return classify_boards([board])[0]
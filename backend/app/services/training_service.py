@@ -0,0 +1,171 @@
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+import chess
+import chess.polyglot
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+from app.models.opening import System
+from app.models.training import ReviewAnswer, ReviewCard
+from app.services.opening_book import OpeningBook, opening_book as default_opening_book
+from app.services.structure import classify_board
+
+# Grades follow SM-2: 0-2 is a failed recall, 3-5 a successful one
+GRADE_CORRECT = 4
+GRADE_WRONG = 1
+# A failed card comes back in the same session instead of tomorrow
+RELEARN_DELAY = timedelta(minutes=10)
+MIN_EASE = 1.3
+
+class CardState(NamedTuple):
+    ease: float
+    interval_days: float
+    repetitions: int
+    lapses: int
+
+def sm2(state: CardState, grade: int) -> CardState:
+    """Next SM-2 state after answering with quality ``grade`` (0-5)"""
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    if grade < 3:
+        return CardState(ease, 0.0, 0, state.lapses + 1)
+    if state.repetitions == 0:
+        interval = 1.0
+    elif state.repetitions == 1:
+        interval = 6.0
+    else:
+        interval = round(state.interval_days * ease, 2)
+    return CardState(ease, interval, state.repetitions + 1, state.lapses)
+
+def _utcnow() -> datetime:
+    # Stored naive, in UTC, like the rest of the database
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class TrainingService:
+    """Repertoire drills: a card per position where the user must find the book move"""
+    def __init__(self, db: Session, opening_book: Optional[OpeningBook] = None):
+        self.db = db
+        self.opening_book = opening_book or default_opening_book
+
+    def enroll(self, user_id: str, system: str, plies: int = 16) -> int:
+        """Create cards for every book position of a system up to ``plies``; returns how many were added"""
+        slug = system.lower()
+        owner = self.db.query(System).filter(System.slug == slug).one_or_none()
+        if owner is None:
+            raise ValueError(f"System '{system}' not found")
+        # The same position may be drilled in several systems, with each system's move
+        existing = {fen for (fen,) in self.db.query(ReviewCard.fen)
+                    .filter(ReviewCard.user_id == user_id, ReviewCard.system == slug)}
+        now = _utcnow()
+        rows = [
+            {"user_id": user_id, "system": slug, "fen": fen, "expected_move": move, "ease": 2.5,
+             "interval_days": 0.0, "repetitions": 0, "lapses": 0, "due_at": now}
+            for fen, move in self._drill_positions(chess.Board(owner.starting_fen), slug, plies)
+            if fen not in existing
+        ]
+        if rows:
+            self.db.execute(insert(ReviewCard), rows)
+            self.db.commit()
+        return len(rows)
+
+    def _drill_positions(self, start: chess.Board, slug: str, plies: int):
+        """White-to-move positions of the system's book lines under ``start`` with the system's move.
+
+        A book that tags its lines with systems (the bundled repertoire) is walked
+        along that system's moves only. An untagged book is walked in full, keeping
+        the positions whose pawn structure classifies as the system.
+        """
+        tagged = slug in self.opening_book.systems
+        seen = set()
+        frontier = deque([(start, 0)])
+        while frontier:
+            board, ply = frontier.popleft()
+            # Transpositions are one card, whatever their move counters
+            key = chess.polyglot.zobrist_hash(board)
+            if key in seen or ply > plies:
+                continue
+            seen.add(key)
+            moves = self.opening_book.lookup(board)
+            if tagged:
+                moves = [entry for entry in moves if slug in entry["systems"]]
+            if moves and board.turn == chess.WHITE and (tagged or classify_board(board)["system"] == slug):
+                yield board.fen(), moves[0]["move"]
+            for entry in moves:
+                child = board.copy(stack=False)
+                child.push_uci(entry["move"])
+                frontier.append((child, ply + 1))
+
+    def next_due(self, user_id: str, limit: int = 10) -> List[Dict]:
+        cards = (
+            self.db.query(ReviewCard.id, ReviewCard.system, ReviewCard.fen, ReviewCard.due_at)
+            .filter(ReviewCard.user_id == user_id, ReviewCard.due_at <= _utcnow())
+            .order_by(ReviewCard.due_at)
+            .limit(limit)
+        )
+        return [{"card_id": card.id, "system": card.system, "fen": card.fen, "due_at": card.due_at}
+                for card in cards]
+
+    def record_answers(self, user_id: str, answers: List[Dict]) -> List[Dict]:
+        """Grade a batch of answers, reschedule their cards and log them, in one transaction.
+
+        Each answer has ``card_id`` and either the ``move`` played (UCI or SAN) or an
+        explicit SM-2 ``grade``.
+        """
+        ids = [answer["card_id"] for answer in answers]
+        cards = {
+            card.id: card
+            for card in self.db.query(ReviewCard.id, ReviewCard.fen, ReviewCard.expected_move, ReviewCard.ease,
+                                      ReviewCard.interval_days, ReviewCard.repetitions, ReviewCard.lapses)
+            .filter(ReviewCard.user_id == user_id, ReviewCard.id.in_(ids))
+        }
+        states = {card.id: CardState(card.ease, card.interval_days, card.repetitions, card.lapses)
+                  for card in cards.values()}
+        now = _utcnow()
+        updates, log, results = {}, [], []
+        for answer in answers:
+            card = cards.get(answer["card_id"])
+            if card is None:
+                raise KeyError(f"Card {answer['card_id']} not found")
+            board = chess.Board(card.fen)
+            move = _parse_move(board, answer.get("move"))
+            correct = move == card.expected_move
+            grade = answer.get("grade")
+            if grade is None:
+                grade = GRADE_CORRECT if correct else GRADE_WRONG
+            # Later answers in the same batch build on earlier ones for the same card
+            state = states[card.id] = sm2(states[card.id], grade)
+            due_at = now + (timedelta(days=state.interval_days) if grade >= 3 else RELEARN_DELAY)
+            updates[card.id] = {"id": card.id, **state._asdict(), "due_at": due_at, "last_reviewed_at": now}
+            log.append({"card_id": card.id, "user_id": user_id, "move": move, "correct": correct,
+                        "grade": grade, "answered_at": now})
+            results.append({"card_id": card.id, "correct": correct, "grade": grade,
+                            "expected_move": card.expected_move,
+                            "expected_san": board.san(chess.Move.from_uci(card.expected_move)),
+                            "due_at": due_at, "interval_days": state.interval_days})
+        if log:
+            # One executemany per table instead of a statement per answer
+            self.db.execute(update(ReviewCard), list(updates.values()))
+            self.db.execute(insert(ReviewAnswer), log)
+            self.db.commit()
+        return results
+
+    def stats(self, user_id: str) -> Dict:
+        now = _utcnow()
+        total, due, learned = self.db.query(
+            func.count(ReviewCard.id),
+            func.count(ReviewCard.id).filter(ReviewCard.due_at <= now),
+            func.count(ReviewCard.id).filter(ReviewCard.repetitions > 0)
+        ).filter(ReviewCard.user_id == user_id).one()
+        answered = self.db.query(func.count(ReviewAnswer.id)).filter(ReviewAnswer.user_id == user_id).scalar()
+        return {"cards": total, "due": due, "learned": learned, "answers": answered}
+
+def _parse_move(board: chess.Board, move: Optional[str]) -> Optional[str]:
+    if move is None:
+        return None
+    try:
+        return board.parse_uci(move).uci()
+    except ValueError:
+        try:
+            return board.parse_san(move).uci()
+        except ValueError:
+            # An illegal answer is simply a wrong one
+            return move
@@ -0,0 +1,37 @@
+import hashlib
+from typing import Any, Tuple
+import orjson
+from fastapi import Request, Response
+
+# For responses whose content can never change, e.g. analysis of a (FEN, depth)
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def etag_for(data: bytes) -> str:
+    # Weak, because the same representation is also served gzip-compressed
+    return f'W/"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+def encode(content: Any) -> Tuple[bytes, str]:
+    """JSON body and its ETag"""
+    body = orjson.dumps(content)
+    return body, etag_for(body)
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names ``etag`` (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def conditional_response(request: Request, body: bytes, etag: str, cache_control: str) -> Response:
+    """200 with the body, or an empty 304 when the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def cached_json(request: Request, content: Any, cache_control: str) -> Response:
+    body, etag = encode(content)
+    return conditional_response(request, body, etag, cache_control)
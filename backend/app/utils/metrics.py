@@ -0,0 +1,153 @@
+import bisect
+import math
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Seconds; spans a cached lookup (~100us) up to a deep engine search or LLM answer
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Counter:
+    """Monotonic counter, optionally split by a tuple of label values"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Tuple[str, ...] = ()):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, dict(zip(self.labelnames, labels)), value)
+                for labels, value in self._values.items()]
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight"""
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, labels: Tuple[str, ...] = ()):
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, labels: Tuple[str, ...] = ()):
+        self._values[labels] = value
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect and two additions"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        for labels, (counts, total) in self._values.items():
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", base, total))
+            samples.append((f"{self.name}_count", base, cumulative))
+        return samples
+
+class Timer:
+    """``with timer:`` observes the block's wall time into a histogram"""
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...] = ()):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Metrics are only touched from the event loop, so updates take no locks.
+    ``collect`` registers a ``stats()``-style callable whose numeric values are
+    exported as gauges at scrape time, so existing counters cost nothing extra.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Tuple[str, str, Callable[[], Dict]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self, prefix: str, documentation: str, stats: Callable[[], Dict]):
+        self._collectors.append((prefix, documentation, stats))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(_format_sample(name, labels, value))
+        for prefix, documentation, stats in self._collectors:
+            for key, value in _flatten(stats()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(_format_sample(name, {}, value))
+        return "\n".join(lines) + "\n"
+
+def _flatten(stats: Dict, prefix: str = ""):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        else:
+            yield f"{prefix}{key}", value
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    rendered = ",".join(
+        '{}="{}"'.format(key, str(label).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, label in labels.items()
+    )
+    return f"{name}{{{rendered}}} {_format_value(value)}"
+
+metrics = MetricsRegistry()
@@ -0,0 +1,9 @@
+"""Reproducible benchmarks for the backend.
+
+Every benchmark prints a JSON report (or writes it with ``--output``) so two
+runs can be diffed before and after a change:
+
+    python -m benchmarks.micro              # move validation, legal moves, FEN parsing
+    python -m benchmarks.engine --depth 12  # engine throughput over the opening corpus
+    python -m benchmarks.load               # in-process load test with mocked engine and Ollama
+"""
@@ -0,0 +1,62 @@
+import json
+import platform
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+import chess
+import chess.pgn
+from app.data.catalog import LESSONS, SYSTEMS
+
+def load_corpus(limit: Optional[int] = None) -> List[str]:
+    """Stonewall/Torre/Colle positions: system and lesson starts plus every repertoire node.
+
+    The order is fixed, so the same ``limit`` always selects the same positions.
+    """
+    # Imported here: it loads the settings, which the load generator configures first
+    from app.services.opening_book import DEFAULT_BOOK_PATH
+    fens = [system["starting_fen"] for system in SYSTEMS]
+    fens += [lesson["starting_fen"] for lessons in LESSONS.values() for lesson in lessons]
+    with open(DEFAULT_BOOK_PATH) as pgn:
+        while True:
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                break
+            nodes = [game]
+            while nodes:
+                node = nodes.pop(0)
+                fens.append(node.board().fen())
+                nodes.extend(node.variations)
+    corpus = [fen for fen in dict.fromkeys(fens) if not chess.Board(fen).is_game_over()]
+    return corpus[:limit] if limit else corpus
+
+def percentiles(samples: List[float]) -> Dict:
+    """Nearest-rank p50/p95/p99 plus mean and max, in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": rank(50),
+        "p95_ms": rank(95),
+        "p99_ms": rank(99),
+        "max_ms": ordered[-1] * 1000
+    }
+
+def write_report(name: str, results: Dict, output: Optional[str] = None):
+    report = {
+        "benchmark": name,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "chess": chess.__version__,
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
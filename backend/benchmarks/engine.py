@@ -0,0 +1,69 @@
+"""Engine throughput over the opening corpus at a fixed depth or node budget.
+
+Talks to the engine pool directly, so neither the analysis cache nor the
+opening book hides engine time. Needs STOCKFISH_PATH (or a fake engine).
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+import chess
+import chess.engine
+from app.services.engine_pool import EnginePool
+from benchmarks.common import load_corpus, percentiles, write_report
+
+async def run(fens: List[str], depth: Optional[int], nodes: Optional[int], pool_size: Optional[int],
+              multipv: int) -> Dict:
+    pool = EnginePool(size=pool_size)
+    limit = chess.engine.Limit(depth=depth, nodes=nodes)
+    latencies: List[float] = []
+    searched_nodes = 0
+
+    async def search(fen: str):
+        nonlocal searched_nodes
+        async with pool.acquire() as engine:
+            started = time.perf_counter()
+            infos = await engine.analyse(chess.Board(fen), limit, multipv=multipv)
+            latencies.append(time.perf_counter() - started)
+            searched_nodes += infos[0].get("nodes", 0)
+
+    try:
+        await pool.start()
+        # One warm-up search per engine so process start-up isn't measured
+        await asyncio.gather(*(search(fens[0]) for _ in range(pool.size)))
+        latencies.clear()
+        searched_nodes = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(search(fen) for fen in fens))
+        elapsed = time.perf_counter() - started
+    finally:
+        await pool.close()
+
+    return {
+        "positions": len(fens),
+        "depth": depth,
+        "nodes": nodes,
+        "multipv": multipv,
+        "engines": pool.size,
+        "elapsed_s": elapsed,
+        "positions_per_second": len(fens) / elapsed,
+        "nodes_per_second": searched_nodes / elapsed,
+        "latency": percentiles(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine throughput over the opening corpus")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--multipv", type=int, default=1)
+    parser.add_argument("--engines", type=int, default=None, help="Pool size (default: ENGINE_POOL_SIZE)")
+    parser.add_argument("--positions", type=int, default=None, help="Limit the corpus size")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.depth is None and args.nodes is None:
+        args.depth = 12
+    results = asyncio.run(run(load_corpus(args.positions), args.depth, args.nodes, args.engines, args.multipv))
+    write_report("engine", results, args.output)
+
+if __name__ == "__main__":
+    main()
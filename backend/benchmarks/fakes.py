@@ -0,0 +1,91 @@
+"""In-process stand-ins for the engine pool and the Ollama client.
+
+They answer with fixed latency and deterministic output, so a load test
+measures the web, caching and coalescing layers rather than the engine or
+the model.
+"""
+import asyncio
+import contextlib
+from typing import AsyncIterator, Dict, List, Optional
+import chess
+import chess.engine
+
+class FakeEngine:
+    def __init__(self, latency: float, nps: int):
+        self.latency = latency
+        self.nps = nps
+
+    async def analyse(self, board: chess.Board, limit: chess.engine.Limit, multipv: Optional[int] = None,
+                      game: object = None):
+        await asyncio.sleep(self.latency)
+        moves = list(board.legal_moves)
+        infos = []
+        for rank, move in enumerate(moves[:multipv or 1], start=1):
+            infos.append({
+                "multipv": rank,
+                "depth": limit.depth or 1,
+                "score": chess.engine.PovScore(chess.engine.Cp(30 - 10 * rank), chess.WHITE),
+                "pv": [move],
+                "nodes": int(self.nps * self.latency),
+                "nps": self.nps
+            })
+        return infos if multipv is not None else infos[0]
+
+class FakeEnginePool:
+    """Quacks like ``EnginePool``: ``size`` engines behind an ``acquire()`` context manager"""
+    def __init__(self, size: int = 4, latency: float = 0.05, nps: int = 1_000_000):
+        self.size = size
+        self.restarts = 0
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(FakeEngine(latency, nps))
+
+    async def start(self):
+        pass
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        engine = await self._idle.get()
+        try:
+            yield engine
+        finally:
+            self._idle.put_nowait(engine)
+
+    async def health_check(self) -> Dict:
+        return {"size": self.size, "alive": self.size, "restarts": 0}
+
+    async def close(self):
+        pass
+
+class FakeOllamaClient:
+    """Quacks like ``ollama.AsyncClient`` for ``list`` and ``generate``"""
+    def __init__(self, latency: float = 0.2, tokens: int = 50):
+        self.latency = latency
+        self.tokens = tokens
+        self._client = self  # OllamaService.close() closes the underlying HTTP client
+
+    async def aclose(self):
+        pass
+
+    async def list(self) -> Dict:
+        return {"models": []}
+
+    async def generate(self, model: str, prompt: str, stream: bool = False, options: Optional[Dict] = None,
+                       context: Optional[List[int]] = None, keep_alive: Optional[str] = None):
+        words = self._answer(prompt)
+        # Like Ollama, return the conversation so far as token ids
+        tokens = list(context or []) + list(range(len(prompt.split()) + len(words)))
+        if stream:
+            return self._stream(words, tokens)
+        await asyncio.sleep(self.latency)
+        return {"response": "".join(words), "context": tokens, "prompt_eval_count": len(prompt.split()),
+                "eval_count": len(words), "eval_duration": int(self.latency * 1e9)}
+
+    async def _stream(self, words: List[str], tokens: List[int]) -> AsyncIterator[Dict]:
+        for word in words:
+            await asyncio.sleep(self.latency / len(words))
+            yield {"response": word, "done": False}
+        yield {"response": "", "done": True, "context": tokens}
+
+    def _answer(self, prompt: str) -> List[str]:
+        return [f"token{(len(prompt) + i) % 97} " for i in range(self.tokens)]
@@ -0,0 +1,147 @@
+"""In-process load generator for the FastAPI app.
+
+Drives the ASGI app directly over httpx (no sockets) with a fake engine pool
+and a fake Ollama client, so results reflect routing, validation, caching and
+coalescing. With ``--external`` the configured engine and Ollama are used
+instead; point them at ``mock_engine.py`` and ``mock_server.py --ollama`` to
+include process and HTTP overhead while staying offline.
+
+The request mix is drawn from a seeded RNG, so two runs with the same
+arguments send the same requests in the same order.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+import chess
+from benchmarks.common import load_corpus, percentiles, write_report
+
+QUESTIONS = [
+    "What is the main plan in the Stonewall?",
+    "When should I play Bg5 in the Torre?",
+    "How do I prepare e4 in the Colle?",
+    "Where does the queen's knight go?",
+]
+
+# (name, relative weight)
+SCENARIOS = [
+    ("validate_move", 25),
+    ("move", 15),
+    ("analyze", 20),
+    ("book", 10),
+    ("lessons", 15),
+    ("systems", 5),
+    ("ai_ask", 10),
+]
+
+def build_plan(fens: List[str], requests: int, seed: int) -> List[Tuple[str, str, str, Dict]]:
+    """(scenario, method, url, json body) for every request, in send order"""
+    rng = random.Random(seed)
+    names = [name for name, _ in SCENARIOS]
+    weights = [weight for _, weight in SCENARIOS]
+    plan = []
+    for name in rng.choices(names, weights, k=requests):
+        fen = rng.choice(fens)
+        move = rng.choice(list(chess.Board(fen).legal_moves)).uci()
+        if name == "validate_move":
+            plan.append((name, "POST", "/api/chess/validate-move", {"fen": fen, "move": move}))
+        elif name == "move":
+            plan.append((name, "POST", "/api/chess/move", {"fen": fen, "move": move}))
+        elif name == "analyze":
+            plan.append((name, "POST", "/api/chess/analyze", {"fen": fen, "depth": rng.choice([10, 15])}))
+        elif name == "book":
+            plan.append((name, "GET", "/api/openings/book", {"fen": fen}))
+        elif name == "lessons":
+            plan.append((name, "GET", f"/api/openings/lessons/{rng.choice(['stonewall', 'torre', 'colle'])}", None))
+        elif name == "systems":
+            plan.append((name, "GET", "/api/openings/systems", None))
+        else:
+            plan.append((name, "POST", "/api/ai/ask", {"question": rng.choice(QUESTIONS),
+                                                       "opening_system": "general"}))
+    return plan
+
+async def run(args) -> Dict:
+    # Settings are read at import time, so configure before importing the app
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(args.workdir, 'load.db')}"
+    # Likewise the on-disk indexes, so a run neither reads nor overwrites the developer's
+    os.environ["RETRIEVAL_INDEX_PATH"] = os.path.join(args.workdir, "retrieval_index.npz")
+    os.environ["POSITION_INDEX_PATH"] = os.path.join(args.workdir, "position_index")
+    os.environ.setdefault("OLLAMA_HEALTH_INTERVAL", "3600")
+    # Every simulated user shares one client address
+    os.environ.setdefault("SCHEDULER_MAX_PER_CLIENT", str(args.concurrency))
+    import httpx
+    from app.main import app, startup
+    from app.api import ai, chess as chess_api
+    from benchmarks.fakes import FakeEnginePool, FakeOllamaClient
+
+    if not args.external:
+        pool = FakeEnginePool(args.engines, args.engine_latency)
+        chess_api.chess_service.engine_pool = chess_api.chess_service.scheduler.engine_pool = pool
+        ai.ollama_service.client = FakeOllamaClient(args.ollama_latency, args.tokens)
+
+    plan = build_plan(load_corpus(), args.requests, args.seed)
+    latencies: Dict[str, List[float]] = {name: [] for name, _ in SCENARIOS}
+    errors: Dict[str, int] = {name: 0 for name, _ in SCENARIOS}
+    cursor = iter(plan)
+
+    async with app.router.lifespan_context(app):
+        if not await startup.wait():
+            raise RuntimeError(f"App did not become ready: {startup.status()}")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                for name, method, url, body in cursor:
+                    started = time.perf_counter()
+                    if method == "GET":
+                        response = await client.get(url, params=body)
+                    else:
+                        response = await client.post(url, json=body)
+                    latencies[name].append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors[name] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    everything = [latency for samples in latencies.values() for latency in samples]
+    return {
+        "requests": len(plan),
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "external": args.external,
+        "engine_latency_s": args.engine_latency,
+        "ollama_latency_s": args.ollama_latency,
+        "elapsed_s": elapsed,
+        "rps": len(plan) / elapsed,
+        "errors": sum(errors.values()),
+        "latency": percentiles(everything),
+        "scenarios": {
+            name: {**percentiles(samples), "errors": errors[name]}
+            for name, samples in latencies.items() if samples
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test with mocked engine and Ollama")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--engines", type=int, default=4, help="Fake engine pool size")
+    parser.add_argument("--engine-latency", type=float, default=0.05, help="Seconds per fake search")
+    parser.add_argument("--ollama-latency", type=float, default=0.2, help="Seconds per fake generation")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per fake generation")
+    parser.add_argument("--external", action="store_true",
+                        help="Use STOCKFISH_PATH and OLLAMA_URL instead of in-process fakes")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        results = asyncio.run(run(args))
+    write_report("load", results, args.output)
+
+if __name__ == "__main__":
+    main()
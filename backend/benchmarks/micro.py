@@ -0,0 +1,70 @@
+"""Microbenchmarks for the move hot path: FEN parsing, legal moves and validation"""
+import argparse
+import time
+from typing import Callable, Dict, List
+import chess
+from app.services.chess_service import ChessService
+from benchmarks.common import load_corpus, write_report
+
+def measure(work: Callable[[], None], repeat: int, inner: int) -> Dict:
+    """Best-of-``repeat`` time per call, in microseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(inner):
+            work()
+        timings.append((time.perf_counter() - started) / inner)
+    return {"best_us": min(timings) * 1e6, "median_us": sorted(timings)[len(timings) // 2] * 1e6}
+
+def run(fens: List[str], repeat: int) -> Dict:
+    # No engine is touched: the pool only spawns processes on first analysis
+    service = ChessService()
+    boards = [chess.Board(fen) for fen in fens]
+    moves = [next(iter(board.legal_moves)).uci() for board in boards]
+    pairs = list(zip(fens, moves))
+
+    def parse_fens():
+        for fen in fens:
+            chess.Board(fen)
+
+    def legal_moves_uncached():
+        for board in boards:
+            [move.uci() for move in board.legal_moves]
+
+    def legal_moves_cached():
+        for fen in fens:
+            service.get_legal_moves(fen)
+
+    def validate_cold():
+        service.board_entry.cache_clear()
+        for fen, move in pairs:
+            service.validate_move(fen, move)
+
+    def validate_warm():
+        for fen, move in pairs:
+            service.validate_move(fen, move)
+
+    def play_move():
+        for fen, move in pairs:
+            service.play_move(fen, move)
+
+    per_position = len(fens)
+    results = {}
+    for name, work in [("fen_parse", parse_fens), ("legal_moves_uncached", legal_moves_uncached),
+                       ("legal_moves_cached", legal_moves_cached), ("validate_move_cold", validate_cold),
+                       ("validate_move_warm", validate_warm), ("play_move", play_move)]:
+        work()  # warm up
+        timing = measure(work, repeat, 10)
+        results[name] = {key: value / per_position for key, value in timing.items()}
+    return {"positions": per_position, "repeat": repeat, "per_position": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--positions", type=int, default=None, help="Limit the corpus size")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    write_report("micro", run(load_corpus(args.positions), args.repeat), args.output)
+
+if __name__ == "__main__":
+    main()
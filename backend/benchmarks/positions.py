@@ -0,0 +1,82 @@
+"""Similar-position search: build time, query latency and recall against an exhaustive scan.
+
+The corpus is synthetic but shaped like real openings: Stonewall/Torre/Colle
+positions with one extra piece dropped on a random empty square, so many rows
+sit close to each query. Queries are corpus positions after one legal move,
+like a student who has just left a lesson's line.
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict
+import chess
+import numpy as np
+from app.services.analysis_cache import position_key
+from app.services.position_index import PositionIndex, board_flags
+from app.services.structure import boards_to_array
+from benchmarks.common import load_corpus, percentiles, write_report
+
+def synthetic_corpus(size: int, rng: np.random.Generator):
+    boards = [chess.Board(fen) for fen in load_corpus()]
+    base = boards_to_array(boards)
+    rows = rng.integers(0, len(boards), size)
+    planes = base[rows]
+    # Any piece but a king, on a square that is still empty
+    planes_hit = rng.choice([plane for plane in range(12) if plane not in (5, 11)], size)
+    squares = np.left_shift(np.uint64(1), rng.integers(0, 64, size).astype(np.uint64))
+    empty = (np.bitwise_or.reduce(planes, axis=1) & squares) == 0
+    planes[np.arange(size), planes_hit] |= np.where(empty, squares, np.uint64(0))
+    flags = np.array([board_flags(board) for board in boards], dtype=np.uint8)[rows]
+    keys = rng.integers(0, 2 ** 63, size, dtype=np.int64).astype(np.uint64)
+    return boards, planes, flags, keys
+
+def run(size: int, queries: int, probes: int, seed: int) -> Dict:
+    rng = np.random.default_rng(seed)
+    boards, planes, flags, keys = synthetic_corpus(size, rng)
+    started = time.perf_counter()
+    index = PositionIndex.build(planes, flags, keys)
+    built = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        stored = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        started = time.perf_counter()
+        index = PositionIndex.load(directory)
+        opened = time.perf_counter() - started
+
+        samples, exact_samples, exact = [], [], 0
+        for query in range(queries):
+            board = boards[query % len(boards)].copy()
+            board.push(list(board.legal_moves)[rng.integers(board.legal_moves.count())])
+            index.search(board, 5, probes)  # The first touch of a cluster pages it in
+            started = time.perf_counter()
+            found = index.search(board, 5, probes)
+            samples.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            best = index.search(board, 5, len(index.centroids))
+            exact_samples.append(time.perf_counter() - started)
+            exact += max(distance for _, distance in found) <= max(distance for _, distance in best)
+        return {
+            "positions": len(index),
+            "clusters": len(index.centroids),
+            "probes": probes,
+            "index_mb": stored / 1024 / 1024,
+            "build_s": built,
+            "open_s": opened,
+            "query": percentiles(samples),
+            "exhaustive_query": percentiles(exact_samples),
+            "top5_exact_rate": exact / queries
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--positions", type=int, default=1_000_000, help="Corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=8, help="Clusters scored per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    write_report("positions", run(args.positions, args.queries, args.probes, args.seed), args.output)
+
+if __name__ == "__main__":
+    main()
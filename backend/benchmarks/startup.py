@@ -0,0 +1,68 @@
+"""Cold start: import time, time to /ready and time until every startup step is done.
+
+Each run is a fresh interpreter, the way a restarted or autoscaled worker
+starts. Set PREWARM_ON_STARTUP=true (and STOCKFISH_PATH) to include engine
+spawning; OLLAMA_URL pointing nowhere shows that an unreachable AI assistant
+doesn't delay readiness.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+async def child() -> Dict:
+    started = time.perf_counter()
+    from app.main import app, startup
+    imported = time.perf_counter() - started
+    async with app.router.lifespan_context(app):
+        serving = time.perf_counter() - started
+        await startup.wait()
+        status = startup.status()
+    return {"import_s": imported, "serving_s": serving, "ready_s": serving + (status["ready_seconds"] or 0.0),
+            "startup_s": serving + (status["startup_seconds"] or 0.0), "ready": status["ready"],
+            "steps": {name: step.get("seconds") for name, step in status["steps"].items()}}
+
+def run(repeat: int) -> Dict:
+    runs: List[Dict] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}"}
+        for _ in range(repeat):
+            # The first run also creates and seeds the database, like a fresh deployment
+            output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"], env=env,
+                                    check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+
+    def summary(key: str) -> Dict:
+        values = sorted(run[key] for run in runs)
+        return {"best_s": values[0], "median_s": values[len(values) // 2], "first_s": runs[0][key]}
+
+    return {
+        "repeat": repeat,
+        "prewarm": os.environ.get("PREWARM_ON_STARTUP", "false"),
+        "import": summary("import_s"),
+        "serving": summary("serving_s"),
+        "ready": summary("ready_s"),
+        "all_steps_done": summary("startup_s"),
+        "runs": runs
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and startup time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(child())))
+        return
+    # Imported here so the child's import time covers everything the app pulls in
+    from benchmarks.common import write_report
+    write_report("startup", run(args.repeat), args.output)
+
+if __name__ == "__main__":
+    main()
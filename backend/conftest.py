@@ -0,0 +1,30 @@
+"""
+Shared test setup: an isolated database and index files, and the fake UCI engine
+"""
+
+import os
+import tempfile
+from pathlib import Path
+import pytest_asyncio
+
+MOCK_ENGINE = str(Path(__file__).resolve().parent / "mock_engine.py")
+
+# Settings are read when the app is first imported, so point everything that
+# touches disk somewhere disposable before any test module imports it
+_workdir = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir.name, 'test.db')}")
+os.environ.setdefault("RETRIEVAL_INDEX_PATH", os.path.join(_workdir.name, "retrieval_index.npz"))
+os.environ.setdefault("POSITION_INDEX_PATH", os.path.join(_workdir.name, "position_index"))
+os.environ.setdefault("STOCKFISH_PATH", MOCK_ENGINE)
+os.environ.setdefault("ENGINE_POOL_SIZE", "2")
+os.environ.setdefault("OLLAMA_URL", "http://127.0.0.1:9")
+os.environ.setdefault("OLLAMA_PRELOAD", "false")
+
+@pytest_asyncio.fixture
+async def engine_pool(monkeypatch):
+    from app.services.engine_pool import EnginePool
+    # Each search depth takes 20 ms on the fake engine
+    monkeypatch.setenv("MOCK_ENGINE_LATENCY", "0.02")
+    pool = EnginePool(path=MOCK_ENGINE, size=1, options={})
+    yield pool
+    await pool.close()
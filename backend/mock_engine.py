@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Scriptable fake UCI engine for offline and load testing
+
+Point the backend at it with STOCKFISH_PATH=/path/to/backend/mock_engine.py.
+Every search iteration takes --latency seconds and reports --nps, so results
+and timings are deterministic. Positions listed in a --script JSON file get
+the scripted score and PV. STOCKFISH_PATH can't carry arguments, so every
+option can also be set as MOCK_ENGINE_<OPTION>, e.g. MOCK_ENGINE_LATENCY=0.05.
+
+Script format:
+
+    {"rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq -": {"score": 25, "pv": ["d7d5", "e2e3"]},
+     "<fen>": {"mate": 3, "pv": [...]}}
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import chess
+
+class MockEngine:
+    def __init__(self, args):
+        self.name = args.name
+        self.latency = args.latency
+        self.nps = args.nps
+        self.score = args.score
+        self.max_depth = args.max_depth
+        self.crash_after = args.crash_after
+        self.script = {}
+        if args.script:
+            with open(args.script) as f:
+                self.script = {" ".join(fen.split()[:4]): entry for fen, entry in json.load(f).items()}
+        self.multipv = 1
+        self.board = chess.Board()
+        self.searches = 0
+        self.stop = threading.Event()
+        self.search_thread = None
+        self.output_lock = threading.Lock()
+
+    def send(self, line):
+        with self.output_lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def run(self):
+        for line in sys.stdin:
+            parts = line.split()
+            if not parts:
+                continue
+            command = parts[0]
+            if command == "uci":
+                self.send(f"id name {self.name}")
+                self.send("id author opening_trainer")
+                self.send("option name Threads type spin default 1 min 1 max 512")
+                self.send("option name Hash type spin default 16 min 1 max 33554432")
+                self.send("option name MultiPV type spin default 1 min 1 max 500")
+                self.send("uciok")
+            elif command == "isready":
+                self.send("readyok")
+            elif command == "setoption":
+                if "name" in parts and parts[parts.index("name") + 1] == "MultiPV":
+                    self.multipv = int(parts[-1])
+            elif command == "ucinewgame":
+                self.board = chess.Board()
+            elif command == "position":
+                self.set_position(parts[1:])
+            elif command == "go":
+                self.finish_search()
+                self.searches += 1
+                if self.crash_after and self.searches > self.crash_after:
+                    # Simulates an engine crash so pool restarts can be exercised
+                    sys.exit(1)
+                self.stop.clear()
+                self.search_thread = threading.Thread(target=self.search, args=(self.board.copy(), parts[1:]))
+                self.search_thread.start()
+            elif command == "stop":
+                self.stop.set()
+                self.finish_search()
+            elif command == "quit":
+                self.stop.set()
+                self.finish_search()
+                break
+
+    def finish_search(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def set_position(self, parts):
+        moves_at = parts.index("moves") if "moves" in parts else len(parts)
+        if parts[0] == "fen":
+            self.board = chess.Board(" ".join(parts[1:moves_at]))
+        else:
+            self.board = chess.Board()
+        for move in parts[moves_at + 1:]:
+            self.board.push_uci(move)
+
+    def search(self, board, go):
+        limits = {}
+        for key in ("depth", "nodes", "movetime"):
+            if key in go:
+                limits[key] = int(go[go.index(key) + 1])
+        infinite = "infinite" in go
+        max_depth = limits.get("depth", self.max_depth if not infinite else 245)
+        nodes_per_depth = max(int(self.nps * self.latency), 1)
+        started = time.monotonic()
+
+        moves = sorted(board.legal_moves, key=lambda move: move.uci())
+        if not moves:
+            self.send("info depth 0 score " + ("mate 0" if board.is_check() else "cp 0"))
+            self.send("bestmove (none)")
+            return
+
+        best = moves[0].uci()
+        depth = 0
+        while depth < max_depth or infinite:
+            if self.stop.wait(self.latency):
+                break
+            depth += 1
+            nodes = depth * nodes_per_depth
+            elapsed_ms = int((time.monotonic() - started) * 1000)
+            for rank in range(1, min(self.multipv, len(moves)) + 1):
+                score, pv = self.line(board, moves, rank, depth)
+                if rank == 1:
+                    best = pv[0]
+                self.send(f"info depth {depth} seldepth {depth} multipv {rank} score {score} "
+                          f"nodes {nodes} nps {self.nps} time {elapsed_ms} pv {' '.join(pv)}")
+            if "nodes" in limits and nodes >= limits["nodes"]:
+                break
+            if "movetime" in limits and elapsed_ms + self.latency * 1000 >= limits["movetime"]:
+                break
+        self.send(f"bestmove {best}")
+
+    def line(self, board, moves, rank, depth):
+        scripted = self.script.get(" ".join(board.fen().split()[:4]))
+        if scripted and rank == 1:
+            score = f"mate {scripted['mate']}" if "mate" in scripted else f"cp {scripted.get('score', self.score)}"
+            return score, scripted["pv"]
+
+        # Deterministic line: the rank-th move, then the first legal reply each ply
+        walk = board.copy(stack=False)
+        first = moves[rank - 1]
+        pv = [first.uci()]
+        walk.push(first)
+        while len(pv) < min(depth, 8):
+            reply = min(walk.legal_moves, key=lambda move: move.uci(), default=None)
+            if reply is None:
+                break
+            pv.append(reply.uci())
+            walk.push(reply)
+        return f"cp {self.score - 10 * (rank - 1)}", pv
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake UCI engine")
+    env = lambda option, default: os.environ.get(f"MOCK_ENGINE_{option}", default)
+    parser.add_argument("--name", default=env("NAME", "MockEngine"))
+    parser.add_argument("--latency", type=float, default=env("LATENCY", 0.01), help="Seconds per search depth")
+    parser.add_argument("--nps", type=int, default=env("NPS", 1000000), help="Reported nodes per second")
+    parser.add_argument("--score", type=int, default=env("SCORE", 20),
+                        help="Centipawns reported for unscripted positions")
+    parser.add_argument("--max-depth", type=int, default=env("MAX_DEPTH", 20),
+                        help="Depth searched when go has no depth")
+    parser.add_argument("--crash-after", type=int, default=env("CRASH_AFTER", 0),
+                        help="Exit on this many searches plus one")
+    parser.add_argument("--script", default=env("SCRIPT", None), help="JSON file of scripted scores and PVs by FEN")
+    MockEngine(parser.parse_args()).run()
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 """
 Mock server for testing backend structure without dependencies
+
+    python mock_server.py                    # mock Chess API on :8000
+    python mock_server.py --ollama           # stub Ollama daemon on :11434
+    python mock_server.py --ollama --prefill 0.2 --token-rate 40 --tokens 120
+    python mock_server.py --ollama --load 3 --prefill-per-token 0.002
 """
 
+import argparse
+import hashlib
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import time
+from datetime import datetime, timezone
+from http.server import HTTPServer, BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, parse_qs
 
 class MockChessHandler(BaseHTTPRequestHandler):
@@ -44,12 +53,154 @@ class MockChessHandler(BaseHTTPRequestHandler):
         response = {"error": "Mock server - POST not implemented"}
         self.wfile.write(json.dumps(response).encode())
 
+WORDS = ("the", "knight", "supports", "e5", "outpost", "while", "bishop", "aims", "at", "h7",
+         "kingside", "pawn", "storm", "with", "f4", "and", "g4", "keeps", "center", "closed")
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Speaks enough of the Ollama API for the backend: /api/tags and /api/generate.
+    
+    Answers are derived from a hash of the prompt, so they are deterministic,
+    and are produced at a fixed token rate after a prefill delay that grows
+    with the prompt. Like Ollama, the first request loads the model, an empty
+    prompt only loads it, and a ``context`` sent back is not prefilled again.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real daemon
+    model = "llama3.2:3b"
+    prefill = 0.05
+    prefill_per_token = 0.0
+    load = 0.0
+    loaded = False
+    token_rate = 50.0
+    tokens = 60
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        
+        if path == "/api/tags":
+            self.send_json(200, {"models": [{"name": self.model, "model": self.model, "size": 0,
+                                             "digest": "mock", "modified_at": _now()}]})
+        elif path == "/api/version":
+            self.send_json(200, {"version": "0.0.0-mock"})
+        else:
+            self.send_json(404, {"error": "not found"})
+    
+    def do_POST(self):
+        path = urlparse(self.path).path
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        
+        if path != "/api/generate":
+            self.send_json(404, {"error": "not found"})
+            return
+        
+        num_predict = (request.get("options") or {}).get("num_predict") or self.tokens
+        words = self.answer(request.get("prompt", ""), min(self.tokens, num_predict))
+        # Only the new prompt is evaluated; the tokens in ``context`` are already in the KV cache
+        prompt_tokens = len(request.get("prompt", "").split())
+        started = time.perf_counter()
+        if not MockOllamaHandler.loaded:
+            time.sleep(self.load)
+            MockOllamaHandler.loaded = True
+        loaded = time.perf_counter()
+        if not request.get("prompt"):
+            self.send_json(200, {"model": request.get("model"), "created_at": _now(), "response": "",
+                                 "done": True, "done_reason": "load",
+                                 "load_duration": int((loaded - started) * 1e9)})
+            return
+        time.sleep(self.prefill + self.prefill_per_token * prompt_tokens)
+        prefilled = time.perf_counter()
+        
+        # Ollama streams unless the request says otherwise
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header('Content-type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for word in words:
+                time.sleep(1 / self.token_rate)
+                self.write_chunk({"model": request.get("model"), "created_at": _now(),
+                                  "response": word, "done": False})
+            self.write_chunk(self.summary(request, "", prompt_tokens, len(words), started, loaded, prefilled))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(len(words) / self.token_rate)
+            self.send_json(200, self.summary(request, "".join(words), prompt_tokens, len(words),
+                                             started, loaded, prefilled))
+    
+    def write_chunk(self, body):
+        line = (json.dumps(body) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+    
+    def answer(self, prompt, count):
+        seed = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        return [WORDS[(seed >> i) % len(WORDS)] + " " for i in range(count)]
+    
+    def summary(self, request, response, prompt_tokens, eval_count, started, loaded, prefilled):
+        finished = time.perf_counter()
+        context = (request.get("context") or []) + list(range(prompt_tokens + eval_count))
+        return {
+            "model": request.get("model"),
+            "created_at": _now(),
+            "response": response,
+            "done": True,
+            "done_reason": "stop",
+            "context": context,
+            "total_duration": int((finished - started) * 1e9),
+            "load_duration": int((loaded - started) * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prefilled - loaded) * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int((finished - prefilled) * 1e9)
+        }
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
 if __name__ == "__main__":
-    server = HTTPServer(('localhost', 8000), MockChessHandler)
-    print("Mock Chess API server running on http://localhost:8000")
-    print("Available endpoints:")
-    print("  GET  /")
-    print("  GET  /api/openings/systems")
+    parser = argparse.ArgumentParser(description="Mock backend services")
+    parser.add_argument("--ollama", action="store_true", help="Serve a stub Ollama API instead of the chess API")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=None, help="Default 8000, or 11434 with --ollama")
+    parser.add_argument("--model", default=MockOllamaHandler.model)
+    parser.add_argument("--prefill", type=float, default=MockOllamaHandler.prefill,
+                        help="Seconds before the first token")
+    parser.add_argument("--prefill-per-token", type=float, default=MockOllamaHandler.prefill_per_token,
+                        help="Extra prefill seconds per prompt token")
+    parser.add_argument("--load", type=float, default=MockOllamaHandler.load,
+                        help="Seconds the first request spends loading the model")
+    parser.add_argument("--token-rate", type=float, default=MockOllamaHandler.token_rate, help="Tokens per second")
+    parser.add_argument("--tokens", type=int, default=MockOllamaHandler.tokens, help="Tokens per answer")
+    args = parser.parse_args()
+    
+    if args.ollama:
+        MockOllamaHandler.model = args.model
+        MockOllamaHandler.prefill = args.prefill
+        MockOllamaHandler.prefill_per_token = args.prefill_per_token
+        MockOllamaHandler.load = args.load
+        MockOllamaHandler.token_rate = args.token_rate
+        MockOllamaHandler.tokens = args.tokens
+        server = ThreadingHTTPServer((args.host, args.port or 11434), MockOllamaHandler)
+        print(f"Mock Ollama server running on http://{args.host}:{server.server_port}")
+        print("Available endpoints:")
+        print("  GET  /api/tags")
+        print("  POST /api/generate")
+    else:
+        server = HTTPServer((args.host, args.port or 8000), MockChessHandler)
+        print(f"Mock Chess API server running on http://{args.host}:{server.server_port}")
+        print("Available endpoints:")
+        print("  GET  /")
+        print("  GET  /api/openings/systems")
     try:
         server.serve_forever()
     except KeyboardInterrupt:
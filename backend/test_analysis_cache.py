@@ -0,0 +1,93 @@
+"""
+Analysis cache reuse by depth and lines, byte-capped LRU eviction and the SQLite write-through
+"""
+
+import chess
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+from app.core.database import Base
+from app.services import analysis_cache
+from app.services.analysis_cache import AnalysisCache
+from app.services.chess_service import ChessService
+
+# Out of the repertoire, so every answer comes from the cache or the engine
+AFTER_E4_E5 = chess.Board("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+AFTER_E4_C5 = chess.Board("rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+AFTER_E4_E6 = chess.Board("rnbqkbnr/pppp1ppp/4p3/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    # Write-through goes to a throwaway SQLite file instead of the app database
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(analysis_cache, "SessionLocal", sessionmaker(bind=engine))
+
+@pytest.mark.asyncio
+async def test_deeper_result_answers_shallower_requests(engine_pool):
+    cache = AnalysisCache(persist=False)
+    service = ChessService(engine_pool=engine_pool, analysis_cache=cache)
+
+    searched = await service.analyze_board(AFTER_E4_E5, depth=8)
+    assert searched["depth"] == 8
+    assert cache.stats()["misses"] == 1
+
+    # A shallower request is answered by the depth 8 search
+    shallower = await service.analyze_board(AFTER_E4_E5, depth=4)
+    assert shallower == searched
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    # A deeper one is not, and its result replaces the depth 8 entry
+    deeper = await service.analyze_board(AFTER_E4_E5, depth=10)
+    assert deeper["depth"] == 10
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+    assert cache.stats()["entries"] == 1
+    assert (await cache.get(AFTER_E4_E5, 9))["depth"] == 10
+
+    # More lines than were searched is a miss too
+    assert await cache.get(AFTER_E4_E5, 4, multipv=2) is None
+    lines = await service.analyze_board(AFTER_E4_E5, depth=6, multipv=2)
+    assert len(lines["lines"]) == 2
+    # Two lines at depth 6 don't displace one line at depth 10
+    assert (await cache.get(AFTER_E4_E5, 10))["depth"] == 10
+
+@pytest.mark.asyncio
+async def test_byte_cap_evicts_least_recently_used(engine_pool):
+    cache = AnalysisCache(persist=False)
+    service = ChessService(engine_pool=engine_pool, analysis_cache=cache)
+    await service.analyze_board(AFTER_E4_E5, depth=4)
+    entry_bytes = cache.stats()["bytes"]
+    # Room for two entries of this size, not three
+    cache.max_bytes = entry_bytes * 5 // 2
+
+    await service.analyze_board(AFTER_E4_C5, depth=4)
+    # Reading the first position makes the second the oldest
+    assert await cache.get(AFTER_E4_E5, 4) is not None
+    await service.analyze_board(AFTER_E4_E6, depth=4)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert await cache.get(AFTER_E4_C5, 4) is None
+    assert await cache.get(AFTER_E4_E5, 4) is not None
+    assert await cache.get(AFTER_E4_E6, 4) is not None
+
+@pytest.mark.asyncio
+async def test_write_through_survives_a_restart(engine_pool, stored):
+    service = ChessService(engine_pool=engine_pool, analysis_cache=AnalysisCache(persist=True))
+    searched = await service.analyze_board(AFTER_E4_E5, depth=8)
+    # A shallower result arriving later doesn't overwrite the stored row
+    await service.analysis_cache.put(AFTER_E4_E5, 4, 1, {**searched, "depth": 4})
+
+    # A fresh cache, as in another worker or after a restart, reads the row back
+    restarted = AnalysisCache(persist=True)
+    assert await restarted.get(AFTER_E4_E5, 8) == searched
+    assert restarted.stats()["db_hits"] == 1
+    # It is now held in memory
+    assert await restarted.get(AFTER_E4_E5, 6) == searched
+    assert restarted.stats()["hits"] == 1
+    # Deeper than the stored search is still a miss
+    assert await restarted.get(AFTER_E4_E5, 12) is None
+    assert restarted.stats()["misses"] == 1
+    assert await restarted.lookup_keys([analysis_cache.position_key(AFTER_E4_C5)]) == {}
@@ -0,0 +1,59 @@
+"""
+HTTP behaviour of the API against the fake UCI engine: caching headers and response shapes
+"""
+
+import time
+import chess
+import pytest
+from fastapi.testclient import TestClient
+from app.api.chess import chess_service
+from app.main import app
+from app.utils.http_cache import IMMUTABLE
+
+AFTER_E4_E5 = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        for _ in range(500):
+            if client.get("/ready").status_code == 200:
+                break
+            time.sleep(0.01)
+        else:
+            raise AssertionError("startup did not finish")
+        yield client
+
+def test_get_analysis_is_immutable_and_revalidates(client):
+    params = {"fen": AFTER_E4_E5, "depth": 6}
+    response = client.get("/api/chess/analyze", params=params)
+    assert response.status_code == 200
+    assert response.json()["depth"] == 6
+    assert response.headers["cache-control"] == IMMUTABLE
+    etag = response.headers["etag"]
+
+    # The ETag names the (position, depth, lines) key, so revalidation needs no lookup
+    lookups = chess_service.analysis_cache.stats()
+    revalidated = client.get("/api/chess/analyze", params=params, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.headers["cache-control"] == IMMUTABLE
+    assert chess_service.analysis_cache.stats() == lookups
+
+    # Another depth is another resource
+    deeper = client.get("/api/chess/analyze", params={**params, "depth": 7}, headers={"If-None-Match": etag})
+    assert deeper.status_code == 200
+    assert deeper.headers["etag"] != etag
+
+def test_similar_positions_flag_engine_results_as_not_book(client):
+    start = client.get("/api/chess/similar", params={"fen": chess.STARTING_FEN, "k": 1}).json()["positions"]
+    fen = start[0]["fen"]
+    # Store an engine result for the neighbour; the bundled book has no results to answer it
+    assert client.get("/api/chess/analyze", params={"fen": fen, "depth": 4}).status_code == 200
+
+    positions = client.get("/api/chess/similar", params={"fen": fen, "k": 5}).json()["positions"]
+    analysis = next(position["analysis"] for position in positions if position["fen"] == fen)
+    assert analysis["book"] is False
+    assert analysis["depth"] >= 4
+    assert all(position["analysis"] is None or position["analysis"]["book"] in (True, False)
+               for position in positions)
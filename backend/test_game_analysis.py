@@ -0,0 +1,86 @@
+"""
+Game review (``/analyze-batch``): book and engine sources, move classification and mate at the end
+"""
+
+import json
+import chess
+import chess.engine
+import pytest
+from conftest import MOCK_ENGINE
+from app.services.analysis_cache import AnalysisCache
+from app.services.chess_service import ChessService
+from app.services.engine_pool import EnginePool
+from app.services.opening_book import OpeningBook
+
+# Scholar's mate: book for a move each, then out of the book into 3...Nf6?? 4.Qxf7#
+MOVES = ["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7#"]
+BOOK = '[Event "Book"]\n[Result "1-0"]\n\n1. e4 e5 2. Nf3 Nc6 1-0\n'
+
+@pytest.fixture
+def boards():
+    board = chess.Board()
+    boards = [board.copy()]
+    for san in MOVES:
+        board.push_san(san)
+        boards.append(board.copy())
+    return boards
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / "book.pgn"
+    path.write_text(BOOK)
+    book = OpeningBook(str(path))
+    book.load()
+    return book
+
+@pytest.mark.asyncio
+async def test_review_classifies_book_blunder_and_mate(boards, book, tmp_path, monkeypatch):
+    script = tmp_path / "script.json"
+    script.write_text(json.dumps({
+        # Black is fine after 3.Qh5 if it defends f7...
+        boards[5].fen(): {"score": 0, "pv": ["g7g6", "h5f3"]},
+        # ...and mated in one after 3...Nf6
+        boards[6].fen(): {"mate": 1, "pv": ["h5f7"]},
+    }))
+    monkeypatch.setenv("MOCK_ENGINE_SCRIPT", str(script))
+    monkeypatch.setenv("MOCK_ENGINE_LATENCY", "0.01")
+
+    searches = []
+    analyse = chess.engine.UciProtocol.analyse
+    async def record(engine, board, *args, **kwargs):
+        searches.append((id(engine), board.fen()))
+        return await analyse(engine, board, *args, **kwargs)
+    monkeypatch.setattr(chess.engine.UciProtocol, "analyse", record)
+
+    pool = EnginePool(path=MOCK_ENGINE, size=2, options={})
+    service = ChessService(engine_pool=pool, analysis_cache=AnalysisCache(persist=False), opening_book=book)
+    try:
+        review = await service.analyze_game(moves=MOVES, depth=4)
+    finally:
+        await pool.close()
+
+    plies = review["plies"]
+    assert [ply["move"] for ply in plies] == MOVES
+    assert [ply["classification"] for ply in plies] == ["book", "book", None, None, None, "blunder", None]
+
+    # The start and 1.e4 come from the book's results; everything from the position
+    # the book is left in onwards is searched, except the mate on the board
+    searched = [fen for _, fen in searches]
+    assert sorted(searched) == sorted(board.fen() for board in boards[2:7])
+    assert plies[0]["evaluation"] > 0 and review["initial_evaluation"] > 0
+
+    # Two engines, two contiguous runs: 2.Bc4's two positions, then the last three
+    engines = {}
+    for engine, fen in searches:
+        engines.setdefault(engine, []).append(fen)
+    assert sorted(engines.values(), key=len) == [[boards[2].fen(), boards[3].fen()],
+                                                 [boards[4].fen(), boards[5].fen(), boards[6].fen()]]
+
+    blunder = plies[5]
+    assert blunder["best_move"] == "g7g6"
+    assert blunder["mate_in"] == 1
+    assert blunder["centipawn_loss"] >= 300
+    mate = plies[6]
+    # The engine's move, so nothing is lost; the final position is mate on the board
+    assert (mate["best_move"], mate["centipawn_loss"]) == ("h5f7", 0)
+    assert (mate["mate_in"], mate["evaluation"]) == (0, 0)
@@ -8,7 +8,8 @@ def test_imports():
         'fastapi': False,
         'uvicorn': False,
         'chess': False,
-        'stockfish': False,
+        'numpy': False,
+        'orjson': False,
         'sqlalchemy': False,
         'requests': False,
         'pydantic_settings': False
@@ -62,8 +63,8 @@ if __name__ == "__main__":
         print("   sudo apt update && sudo apt install python3-pip")
         print("\n2. Install backend dependencies:")
         print("   cd backend && pip3 install -r requirements.txt")
-        print("\n3. Install Stockfish engine:")
-        print("   sudo apt install stockfish")
+        print("\n3. Install the Stockfish engine binary (python-chess drives it over UCI):")
+        print("   sudo apt install stockfish  # or set STOCKFISH_PATH")
         print("\n4. Start the backend:")
         print("   python3 -m uvicorn app.main:app --reload --host 0.0.0.0 --port 8000")
     else:
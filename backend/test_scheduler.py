@@ -0,0 +1,104 @@
+"""
+EngineScheduler admission, priority order and deadlines against the fake UCI engine
+"""
+
+import asyncio
+import chess
+import chess.engine
+import pytest
+from app.core.config import settings
+from app.services.scheduler import (BATCH, INTERACTIVE, PRECOMPUTE, EngineOverloadedError, EngineScheduler,
+                                    engine_limit)
+
+async def _until(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+async def _hold(scheduler: EngineScheduler, release: asyncio.Event, **kwargs):
+    async with scheduler.acquire(**kwargs):
+        await release.wait()
+
+@pytest.mark.asyncio
+async def test_admission_limits_clients_and_queue(engine_pool):
+    scheduler = EngineScheduler(engine_pool, max_queue=2, max_per_client=2)
+    release = asyncio.Event()
+    holders = [asyncio.create_task(_hold(scheduler, release, client="a")),
+               asyncio.create_task(_hold(scheduler, release, client="a"))]
+    await _until(lambda: scheduler.stats()["queued"]["interactive"] == 1)
+
+    with pytest.raises(EngineOverloadedError, match="this client"):
+        async with scheduler.acquire(client="a"):
+            pass
+    holders.append(asyncio.create_task(_hold(scheduler, release, client="b")))
+    await _until(lambda: scheduler.stats()["queued"]["interactive"] == 2)
+    with pytest.raises(EngineOverloadedError, match="queue is full") as overloaded:
+        async with scheduler.acquire(client="c"):
+            pass
+    assert overloaded.value.retry_after >= 1.0
+
+    release.set()
+    await asyncio.gather(*holders)
+    stats = scheduler.stats()
+    assert (stats["admitted"], stats["rejected"], stats["running"]) == (3, 2, 0)
+
+@pytest.mark.asyncio
+async def test_queued_work_runs_by_priority_then_arrival(engine_pool):
+    scheduler = EngineScheduler(engine_pool, max_queue=10, max_per_client=10)
+    scheduler.deadlines = (None, None, None)
+    order = []
+
+    async def search(name: str, priority: int):
+        async with scheduler.acquire(priority) as (engine, _):
+            order.append(name)
+            await engine.analyse(chess.Board(), chess.engine.Limit(depth=1))
+
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(scheduler, release))
+    await _until(lambda: scheduler.stats()["running"] == 1)
+    tasks = []
+    for name, priority in [("precompute", PRECOMPUTE), ("batch 1", BATCH), ("interactive", INTERACTIVE),
+                           ("batch 2", BATCH)]:
+        tasks.append(asyncio.create_task(search(name, priority)))
+        await _until(lambda: sum(scheduler.stats()["queued"].values()) == len(tasks))
+
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    assert order == ["interactive", "batch 1", "batch 2", "precompute"]
+
+@pytest.mark.asyncio
+async def test_deadline_expires_while_queued(engine_pool):
+    scheduler = EngineScheduler(engine_pool)
+    # A short average search lets the request past admission, so it expires in the queue
+    scheduler.average_search = 0.01
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(scheduler, release))
+    await _until(lambda: scheduler.stats()["running"] == 1)
+
+    with pytest.raises(EngineOverloadedError, match="deadline passed"):
+        async with scheduler.acquire(deadline=0.1):
+            pass
+    assert scheduler.stats()["queued"]["interactive"] == 0
+
+    release.set()
+    await holder
+    assert scheduler.stats()["running"] == 0
+
+@pytest.mark.asyncio
+async def test_remaining_deadline_limits_the_search(engine_pool):
+    scheduler = EngineScheduler(engine_pool)
+    async with scheduler.acquire(deadline=0.2) as (engine, remaining):
+        assert 0 < remaining <= 0.2
+        info = await engine.analyse(chess.Board(), engine_limit(settings.analysis_max_depth, None, None, remaining))
+    # 20 ms per depth: the time limit stops the search long before the depth cap
+    assert info["depth"] < settings.analysis_max_depth
+
+def test_engine_limit_clamps_to_the_global_caps():
+    limit = engine_limit(settings.analysis_max_depth + 10, settings.analysis_max_nodes * 2, 60.0, 5.0)
+    assert limit.depth == settings.analysis_max_depth
+    assert limit.nodes == settings.analysis_max_nodes
+    assert limit.time == 5.0
+    # Even a request out of time gets a token search
+    assert engine_limit(10, None, None, -1.0).time == 0.05
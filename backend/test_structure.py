@@ -0,0 +1,52 @@
+"""
+Pawn-structure classification of Stonewall, Torre and Colle positions and /api/openings/classify
+"""
+
+import chess
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.structure import classify_board
+
+def _play(*moves: str) -> chess.Board:
+    board = chess.Board()
+    for move in moves:
+        board.push_san(move)
+    return board
+
+# (position, system, deviations) as /api/openings/classify reports them
+POSITIONS = {
+    "stonewall": (_play("d4", "d5", "e3", "Nf6", "Bd3", "c5", "c3", "Nc6", "f4", "Bg4", "Nf3", "e6", "Nbd2"),
+                  "stonewall", []),
+    "stonewall_early": (_play("d4", "d5", "e3", "Nf6", "f4"),
+                        "stonewall", ["no_c3_pawn", "no_bishop_d3", "no_knight_f3_or_e5", "no_knight_d2"]),
+    "torre": (_play("d4", "Nf6", "Nf3", "e6", "Bg5", "c5", "e3"), "torre", ["no_c3_pawn", "no_knight_d2"]),
+    # Reached from a Reti move order: the structure decides, not the moves
+    "torre_transposed": (_play("Nf3", "d5", "d4", "Nf6", "Bg5", "e6", "Nbd2", "c5", "e3"),
+                         "torre", ["no_c3_pawn"]),
+    "colle": (_play("d4", "d5", "Nf3", "Nf6", "e3", "e6", "Bd3", "c5", "c3", "Nc6", "Nbd2", "Bd6"), "colle", []),
+    "colle_zukertort": (_play("d4", "Nf6", "Nf3", "e6", "e3", "b6", "Bd3", "Bb7", "O-O", "c5", "b3", "Be7", "Bb2"),
+                        "colle", ["no_c3_pawn", "no_knight_d2"]),
+    "london": (_play("d4", "d5", "Bf4", "Nf6", "e3", "e6", "Nf3"), None, []),
+    "kings_pawn": (_play("e4", "e5", "Nf3", "Nc6"), None, []),
+    "starting_position": (chess.Board(), None, []),
+}
+
+@pytest.mark.parametrize("name", POSITIONS)
+def test_classify_board(name):
+    board, system, deviations = POSITIONS[name]
+    assert classify_board(board) == {"system": system, "deviations": deviations}
+
+def test_classify_endpoint():
+    fens = [board.fen() for board, _, _ in POSITIONS.values()]
+    response = TestClient(app).post("/api/openings/classify", json={"fens": fens})
+    assert response.status_code == 200
+    assert response.json()["positions"] == [
+        {"fen": board.fen(), "system": system, "deviations": deviations}
+        for board, system, deviations in POSITIONS.values()
+    ]
+
+def test_classify_endpoint_rejects_bad_fens():
+    client = TestClient(app)
+    assert client.post("/api/openings/classify", json={"fens": ["not a fen"]}).status_code == 400
+    assert client.post("/api/openings/classify", json={"fens": []}).status_code == 422
@@ -0,0 +1,97 @@
+"""
+Repertoire drills: enrollment per system, SM-2 scheduling and the due-card query
+"""
+
+from datetime import timedelta
+import chess
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app import models  # noqa: F401 - registers the tables on Base.metadata
+from app.commands.seed import seed_catalog
+from app.core.database import Base
+from app.models.training import ReviewCard
+from app.services import training_service
+from app.services.opening_book import OpeningBook
+from app.services.training_service import RELEARN_DELAY, CardState, TrainingService, sm2
+
+@pytest.fixture(scope="module")
+def book():
+    book = OpeningBook()
+    book.load()
+    return book
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        seed_catalog(session)
+        yield session
+
+def test_enroll_creates_cards_per_system(db, book):
+    service = TrainingService(db, book)
+    added = {system: service.enroll("alice", system) for system in ("stonewall", "torre", "colle")}
+    assert all(added.values()), added
+    # Enrolling again adds nothing
+    assert service.enroll("alice", "stonewall") == 0
+
+    for card in db.query(ReviewCard).filter(ReviewCard.user_id == "alice"):
+        board = chess.Board(card.fen)
+        assert board.turn == chess.WHITE
+        # Every expected move is a book move of the card's own system
+        system_moves = {entry["move"] for entry in book.lookup(board) if card.system in entry["systems"]}
+        assert card.expected_move in system_moves
+
+    # After 1.d4 d5 the Stonewall plays e3 and the Colle Nf3: one card each
+    after_d5 = chess.Board("rnbqkbnr/ppp1pppp/8/3p4/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 0 2").fen()
+    expected = dict(db.query(ReviewCard.system, ReviewCard.expected_move).filter(ReviewCard.fen == after_d5))
+    assert expected == {"stonewall": "e2e3", "colle": "g1f3"}
+
+def test_enroll_unknown_system(db, book):
+    with pytest.raises(ValueError):
+        TrainingService(db, book).enroll("alice", "london")
+
+def test_sm2_intervals():
+    state = CardState(2.5, 0.0, 0, 0)
+    state = sm2(state, 4)
+    assert (state.interval_days, state.repetitions) == (1.0, 1)
+    state = sm2(state, 4)
+    assert (state.interval_days, state.repetitions) == (6.0, 2)
+    state = sm2(state, 5)
+    assert state.interval_days == round(6.0 * state.ease, 2) and state.ease == pytest.approx(2.6)
+    lapsed = sm2(state, 1)
+    assert (lapsed.interval_days, lapsed.repetitions, lapsed.lapses) == (0.0, 0, 1)
+    assert lapsed.ease < state.ease
+    # Repeated failures never push the ease below the floor
+    for _ in range(20):
+        lapsed = sm2(lapsed, 0)
+    assert lapsed.ease == training_service.MIN_EASE
+
+def test_answers_reschedule_due_cards(db, book, monkeypatch):
+    service = TrainingService(db, book)
+    service.enroll("bob", "colle", plies=4)
+    due = service.next_due("bob", limit=100)
+    assert due and all(card["system"] == "colle" for card in due)
+    assert service.next_due("alice") == []
+
+    right, wrong = due[0]["card_id"], due[1]["card_id"]
+    expected = db.get(ReviewCard, right).expected_move
+    results = service.record_answers("bob", [{"card_id": right, "move": expected},
+                                             {"card_id": wrong, "move": "a2a3"}])
+    assert [result["correct"] for result in results] == [True, False]
+    assert results[0]["interval_days"] == 1.0
+
+    now = training_service._utcnow()
+    still_due = {card["card_id"] for card in service.next_due("bob", limit=100)}
+    assert right not in still_due and wrong not in still_due
+    # The missed card comes back after the relearn delay, the known one a day later
+    monkeypatch.setattr(training_service, "_utcnow", lambda: now + RELEARN_DELAY + timedelta(seconds=1))
+    later = [card["card_id"] for card in service.next_due("bob", limit=100)]
+    assert wrong in later and right not in later
+    monkeypatch.setattr(training_service, "_utcnow", lambda: now + timedelta(days=1, seconds=1))
+    assert right in {card["card_id"] for card in service.next_due("bob", limit=100)}
+
+    stats = service.stats("bob")
+    assert (stats["answers"], stats["learned"]) == (2, 1)
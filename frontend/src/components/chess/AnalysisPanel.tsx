@@ -3,14 +3,20 @@ import { useChessStore } from '@/stores/chess';
 import { chessApi } from '@/services/api';
 import { Button } from '@/components/ui/button';
 import { Activity, Loader2 } from 'lucide-react';
+import { SimilarPosition } from '@/types/chess';
 
 export const AnalysisPanel: React.FC = () => {
   const { position, analysis, setAnalysis, isAnalyzing, setAnalyzing } = useChessStore();
   const [error, setError] = useState<string | null>(null);
+  const [similar, setSimilar] = useState<SimilarPosition[]>([]);
 
   const analyzePosition = async () => {
     setAnalyzing(true);
     setError(null);
+    // Known positions nearby answer instantly, while the engine may still be searching
+    chessApi.getSimilarPositions(position.fen)
+      .then(setSimilar)
+      .catch(() => setSimilar([]));
     
     try {
       const result = await chessApi.analyzePosition(position.fen);
@@ -107,6 +113,30 @@ export const AnalysisPanel: React.FC = () => {
           )}
         </div>
       )}
+
+      {similar.length > 0 && (
+        <div className="mt-4 pt-3 border-t border-gray-100">
+          <span className="text-sm text-gray-600 block mb-2">Similar positions:</span>
+          <ul className="space-y-1">
+            {similar.map((item) => (
+              <li key={`${item.source}-${item.fen}`} className="flex items-center justify-between text-sm">
+                <span className="text-gray-700 truncate" title={item.lesson?.comment ?? item.fen}>
+                  {item.lesson ? item.lesson.title : 'Master games'}
+                  <span className="text-gray-400 ml-1">
+                    ({item.distance === 0 ? 'same position' : `${item.distance} apart`})
+                  </span>
+                </span>
+                {item.evaluation !== null && (
+                  <span className="font-mono text-gray-600 ml-2">
+                    {formatEvaluation(item.evaluation)}
+                    {item.bestMove && ` ${item.bestMove}`}
+                  </span>
+                )}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
     </div>
   );
 };
\ No newline at end of file
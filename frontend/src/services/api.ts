@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { AnalysisResult, OpeningSystem, Lesson } from '@/types/chess';
+import { AnalysisResult, OpeningSystem, Lesson, SimilarPosition } from '@/types/chess';
 
 const API_BASE_URL = 'http://localhost:8000/api';
 
@@ -25,6 +25,18 @@ export const chessApi = {
     const response = await api.get(`/chess/legal-moves/${encodeURIComponent(fen)}`);
     return response.data;
   },
+
+  getSimilarPositions: async (fen: string, k: number = 3): Promise<SimilarPosition[]> => {
+    const response = await api.get('/chess/similar', { params: { fen, k } });
+    return response.data.positions.map((position: any) => ({
+      fen: position.fen,
+      distance: position.distance,
+      source: position.source,
+      lesson: position.lesson,
+      evaluation: position.analysis?.evaluation ?? null,
+      bestMove: position.analysis?.best_move ?? null,
+    }));
+  },
 };
 
 export const openingsApi = {
@@ -17,6 +17,21 @@ export interface AnalysisResult {
   mateIn: number | null;
 }
 
+export interface SimilarPosition {
+  fen: string;
+  distance: number;
+  source: 'lesson' | 'game';
+  lesson: {
+    system: string;
+    lesson: number;
+    title: string;
+    ply: number;
+    comment: string | null;
+  } | null;
+  evaluation: number | null;
+  bestMove: string | null;
+}
+
 export interface OpeningSystem {
   name: string;
   description: string;